@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'btentregables_notificaciones.settings')
 
 application = get_asgi_application()
+
+# Después de get_asgi_application: el stream importa modelos
+from notificaciones.stream import con_listener  # noqa: E402
+
+application = con_listener(application)
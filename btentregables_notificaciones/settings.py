@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 import os
+import sys
 from datetime import timedelta
 from pathlib import Path
 
@@ -87,6 +88,13 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'btentregables_notificaciones.wsgi.application'
 
+# Servidor del API en producción (manage.py start_api): wsgi con workers gthread; asgi solo para el stream SSE.
+# API_THREADS aplica solo a wsgi (por defecto 4), UvicornWorker no usa hilos
+API_SERVER = env('API_SERVER', default='wsgi')
+API_WORKERS = env.int('API_WORKERS', default=os.cpu_count() or 1)
+API_THREADS = env.int('API_THREADS', default=None)
+API_GRACEFUL_TIMEOUT = env.int('API_GRACEFUL_TIMEOUT', default=30)
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
@@ -94,6 +102,16 @@ WSGI_APPLICATION = 'btentregables_notificaciones.wsgi.application'
 # DATABASES = { 'default': { 'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'db.sqlite3', }, }
 DATABASES = { 'default': env.db(), }
 
+# Conexiones por rol del proceso: api o worker; manage.py fija DB_ROLE=worker para start_worker y start_scheduler.
+# Bajo ASGI Django no reutiliza conexiones persistentes entre requests; si abrirlas pesa, usar un pooler externo
+# (PgBouncer en modo session: el stream y el líder usan LISTEN y advisory locks).
+DB_ROLE = env('DB_ROLE', default='api')
+_DB_PREFIJO = f'DB_{DB_ROLE.upper()}'
+DATABASES['default']['CONN_MAX_AGE'] = env.int(
+    f'{_DB_PREFIJO}_CONN_MAX_AGE', default=300 if DB_ROLE == 'worker' else (0 if API_SERVER == 'asgi' else 60)
+)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = env.bool('DB_CONN_HEALTH_CHECKS', default=True)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -122,6 +140,26 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Paginación por cursor del listado de notificaciones (?page_size=, ?cursor=, ?since_id=); siempre activa,
+# con NOTIFICACIONES_PAGE_SIZE por defecto y page_size acotado a NOTIFICACIONES_MAX_PAGE_SIZE
+NOTIFICACIONES_PAGE_SIZE = env.int('NOTIFICACIONES_PAGE_SIZE', default=20)
+NOTIFICACIONES_MAX_PAGE_SIZE = env.int('NOTIFICACIONES_MAX_PAGE_SIZE', default=100)
+
+# Listado desde la bandeja materializada por usuario (EPMT_BANDEJA_NOTIFICACIONES). La llena el trigger de la
+# migración 0003 al insertar; las notificaciones anteriores a él se distribuyen con `manage.py backfill_inbox`
+NOTIFICACIONES_BANDEJA = env.bool('NOTIFICACIONES_BANDEJA', default=False)
+
+# Stream SSE (/notificaciones/stream/): requiere ASGI y `manage.py install_notify_trigger`
+NOTIFICACIONES_STREAM_HEARTBEAT = env.int('NOTIFICACIONES_STREAM_HEARTBEAT', default=25)
+NOTIFICACIONES_STREAM_QUEUE_SIZE = env.int('NOTIFICACIONES_STREAM_QUEUE_SIZE', default=100)
+
+# EPMT_NOTIFICACIONES particionada por STP_ALTA_REGISTRO (day | week): requiere `manage.py partition_notifications`.
+# La retención cubre la baja lógica (5 días) más la eliminación (7 días después)
+NOTIFICACIONES_PARTICIONADA = env.bool('NOTIFICACIONES_PARTICIONADA', default=False)
+NOTIFICACIONES_PARTITION_INTERVAL = env.str('NOTIFICACIONES_PARTITION_INTERVAL', default='day')
+NOTIFICACIONES_PARTITIONS_AHEAD = env.int('NOTIFICACIONES_PARTITIONS_AHEAD', default=7)
+NOTIFICACIONES_RETENTION_DAYS = env.int('NOTIFICACIONES_RETENTION_DAYS', default=12)
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -148,6 +186,11 @@ STATICFILES_DIRS = [
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Las migraciones de la app solo crean sus tablas propias (las compartidas ya existen en la base);
+# `manage.py test` crea todas a partir de los modelos
+if sys.argv[1:2] == ['test']:
+    MIGRATION_MODULES = {'notificaciones': None}
+
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = env('EMAIL_HOST', default='logger')
 EMAIL_PORT = env('EMAIL_PORT')
@@ -156,12 +199,45 @@ EMAIL_HOST_USER = env('EMAIL_USER')
 EMAIL_HOST_PASSWORD = env('EMAIL_USER_PWD')
 DEFAULT_FROM_EMAIL = env('EMAIL_FROM')
 EMAIL_USE_SSL = False
+EMAIL_TIMEOUT = env.int('EMAIL_TIMEOUT', default=30)
+
+# Pool de conexiones SMTP de send_mails: hilos/conexiones simultáneas y correos por conexión antes de reconectar
+MAIL_CONCURRENCY = env.int('MAIL_CONCURRENCY', default=4)
+MAIL_MAX_MESSAGES_PER_CONNECTION = env.int('MAIL_MAX_MESSAGES_PER_CONNECTION', default=100)
+# Las conexiones se conservan entre corridas de send_mails (cada 5 minutos); se reabren tras este tiempo sin uso
+MAIL_CONNECTION_IDLE_SECONDS = env.int('MAIL_CONNECTION_IDLE_SECONDS', default=360)
+
+# Cola de correos: notificaciones reclamadas por lote y segundos que dura el lease de cada lote
+MAIL_QUEUE_BATCH_SIZE = env.int('MAIL_QUEUE_BATCH_SIZE', default=200)
+MAIL_QUEUE_LEASE_SECONDS = env.int('MAIL_QUEUE_LEASE_SECONDS', default=600)
+
+# Resumen por destinatario: las notificaciones de un mismo template esperan la ventana y se envían en un solo
+# correo cuando son al menos MAIL_DIGEST_MIN_ITEMS; los templates excluidos se envían de inmediato
+MAIL_DIGEST = env.bool('MAIL_DIGEST', default=False)
+MAIL_DIGEST_WINDOW_MINUTES = env.int('MAIL_DIGEST_WINDOW_MINUTES', default=15)
+MAIL_DIGEST_MIN_ITEMS = env.int('MAIL_DIGEST_MIN_ITEMS', default=2)
+MAIL_DIGEST_EXCLUDE = env.list('MAIL_DIGEST_EXCLUDE', default=['mail/reset-passwd.html', 'mail/nueva-orden.html'])
+# Asunto del resumen; {total} se reemplaza por el número de notificaciones agrupadas
+MAIL_DIGEST_SUBJECT = env.str('MAIL_DIGEST_SUBJECT', default='Resumen de {total} notificaciones')
+
+# Cache LRU de adjuntos codificados: tamaño total y tamaño máximo de un archivo para guardarse en ella;
+# los archivos más grandes se codifican desde el disco mientras se envían
+MAIL_ATTACHMENT_CACHE_BYTES = env.int('MAIL_ATTACHMENT_CACHE_BYTES', default=64 * 1024 * 1024)
+MAIL_ATTACHMENT_MAX_CACHED_BYTES = env.int('MAIL_ATTACHMENT_MAX_CACHED_BYTES', default=16 * 1024 * 1024)
 
 MEDIA_ROOT = env('PATH_FS', default='./media')
 
 if not os.path.exists(MEDIA_ROOT + '/logs/notificaciones'):
     os.makedirs(MEDIA_ROOT + '/logs/notificaciones')
 
+# Nivel del logger raíz y por logger, p. ej. LOG_LEVELS=notificaciones.tasks.sla_task=DEBUG,django.db.backends=DEBUG
+LOG_LEVEL = env('LOG_LEVEL', default='INFO')
+LOG_LEVELS = env.dict('LOG_LEVELS', default={})
+# Mensajes por fila de los jobs: línea de avance cada N ocurrencias (notificaciones/log_sampling.py)
+LOG_SAMPLE_EVERY = env.int('LOG_SAMPLE_EVERY', default=1000)
+
+# Los hilos solo encolan los registros; el QueueListener (lo inicia el propio handler, notificaciones/log_queue.py)
+# escribe a disco
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -180,6 +256,11 @@ LOGGING = {
             'class': 'logging.StreamHandler',
             'formatter': 'standard',
         },
+        'queue': {
+            'class': 'notificaciones.log_queue.QueueHandlerIniciado',
+            'handlers': ['file', 'console'],
+            'respect_handler_level': True,
+        },
     },
     'formatters': {
         'standard': {
@@ -188,15 +269,14 @@ LOGGING = {
     },
     'loggers': {
         '': {  # Root logger
-            'handlers': ['file', 'console'],
-            'level': 'DEBUG',
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
             'propagate': True,
         },
         'django_apscheduler': {
-            'handlers': ['file', 'console'],
-            'level': 'DEBUG',
-            'propagate': False,
+            'level': LOG_LEVEL,
         },
+        **{nombre: {'level': nivel.upper()} for nombre, nivel in LOG_LEVELS.items()},
         # 'django.db.backends': {
         #     'handlers': ['console'],
         #     'level': 'DEBUG',
@@ -207,6 +287,25 @@ LOGGING = {
 APSCHEDULER_DATETIME_FORMAT = "N j, Y, f:s a"
 SCHEDULER_DEFAULT = True
 
+# Con varias réplicas del worker solo el líder (advisory lock de Postgres) ejecuta las tareas
+SCHEDULER_LEADER_ELECTION = env.bool('SCHEDULER_LEADER_ELECTION', default=False)
+SCHEDULER_LEADER_LOCK_ID = env.int('SCHEDULER_LEADER_LOCK_ID', default=480051)
+SCHEDULER_LEADER_INTERVAL = env.int('SCHEDULER_LEADER_INTERVAL', default=2)
+# Segundos que el líder depuesto espera a que terminen sus tareas en curso antes de volver a competir
+SCHEDULER_DEMOTION_TIMEOUT = env.int('SCHEDULER_DEMOTION_TIMEOUT', default=300)
+# Segundos de retraso con los que todavía se ejecuta una tarea perdida; las perdidas se juntan en una ejecución
+SCHEDULER_MISFIRE_GRACE_TIME = env.int('SCHEDULER_MISFIRE_GRACE_TIME', default=300)
+
+# Limpiezas de EPMT_NOTIFICACIONES: filas por transacción y pausa entre transacciones
+PURGE_CHUNK_SIZE = env.int('PURGE_CHUNK_SIZE', default=5000)
+PURGE_SLEEP_SECONDS = env.float('PURGE_SLEEP_SECONDS', default=0.1)
+
+# Puerto de /metrics de start_worker (0 para no exponerlas); el API las sirve en /metrics
+METRICS_PORT = env.int('METRICS_PORT', default=9105)
+
+# Solo reescribe y notifica los entregables cuyo color de SLA cambió desde la última corrida
+SLA_INCREMENTAL = env.bool('SLA_INCREMENTAL', default=False)
+
 CORS_ALLOWED_ORIGINS = [
     "http://10.166.0.120:9090",
     "http://localhost:4200",
@@ -16,6 +16,9 @@ Including another URLconf
 """
 from django.urls import path, include
 
+from notificaciones.metrics import metrics_view
+
 urlpatterns = [
+    path('metrics', metrics_view, name='metrics'),
     path('notificaciones/', include('notificaciones.urls')),
 ]
@@ -7,6 +7,9 @@ import sys
 def main():
     """Run administrative tasks."""
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'btentregables_notificaciones.settings')
+    # Los procesos de tareas programadas usan las conexiones del rol worker; se fija antes de cargar settings
+    if sys.argv[1:2] in (['start_worker'], ['start_scheduler']):
+        os.environ['DB_ROLE'] = 'worker'
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -0,0 +1,154 @@
+import base64
+import hashlib
+import logging
+import mimetypes
+import mmap
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from email.mime.base import MIMEBase
+
+from django.conf import settings
+
+from notificaciones.metrics import MAIL_CACHE
+
+logger = logging.getLogger(__name__)
+
+# Múltiplo de 57 bytes para que cada bloque codificado termine en una línea base64 completa de 76 caracteres
+TAMANO_BLOQUE = 57 * 16 * 1024
+
+
+class AttachmentCache:
+    """
+    Cache LRU, acotada en bytes, de adjuntos ya codificados en base64.
+
+    La llave es la ruta más el hash del contenido; el hash se recalcula solo cuando cambian el mtime o el
+    tamaño del archivo. Los archivos se leen con mmap y se codifican por bloques, y los que exceden
+    ``max_archivo`` no se guardan ni se codifican en memoria: se adjuntan como ``AdjuntoEnDisco``.
+    """
+
+    def __init__(self, max_bytes: int = None, max_archivo: int = None):
+        self.max_bytes = max_bytes or getattr(settings, 'MAIL_ATTACHMENT_CACHE_BYTES', 64 * 1024 * 1024)
+        self.max_archivo = max_archivo or getattr(settings, 'MAIL_ATTACHMENT_MAX_CACHED_BYTES', 16 * 1024 * 1024)
+        self._partes = OrderedDict()
+        self._hashes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def part(self, path: str):
+        """Parte MIME del adjunto, o None si es de tipo text/* (esos los arma Django con su charset)"""
+        mimetype, _ = mimetypes.guess_type(path)
+        maintype, subtype = (mimetype or 'application/octet-stream').split('/', 1)
+        if maintype == 'text':
+            return None
+
+        filename = os.path.basename(path)
+        try:
+            filename.encode('ascii')
+        except UnicodeEncodeError:
+            filename = ('utf-8', '', filename)
+
+        stat = os.stat(path)
+        if stat.st_size > self.max_archivo:
+            parte = AdjuntoEnDisco(maintype, subtype, path, stat.st_size)
+        else:
+            parte = MIMEBase(maintype, subtype)
+            parte.set_payload(self._payload(path, stat))
+            parte['Content-Transfer-Encoding'] = 'base64'
+        parte.add_header('Content-Disposition', 'attachment', filename=filename)
+        return parte
+
+    def _payload(self, path: str, stat) -> str:
+        llave = (path, self._hash(path, stat))
+        with self._lock:
+            payload = self._partes.get(llave)
+            if payload is not None:
+                self._partes.move_to_end(llave)
+                MAIL_CACHE.labels('adjuntos', 'hit').inc()
+                return payload
+        MAIL_CACHE.labels('adjuntos', 'miss').inc()
+
+        payload = _codifica(path, stat.st_size)
+
+        with self._lock:
+            if llave not in self._partes:
+                self._partes[llave] = payload
+                self._bytes += len(payload)
+                while self._bytes > self.max_bytes and len(self._partes) > 1:
+                    _, expulsado = self._partes.popitem(last=False)
+                    self._bytes -= len(expulsado)
+
+        return payload
+
+    def _hash(self, path: str, stat) -> str:
+        firma = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            conocido = self._hashes.get(path)
+        if conocido and conocido[0] == firma:
+            return conocido[1]
+
+        # El archivo se lee fuera del lock; si dos hilos lo calculan a la vez, ambos obtienen el mismo hash
+        digest = hashlib.sha256()
+        for bloque in _bloques(path, stat.st_size):
+            digest.update(bloque)
+
+        with self._lock:
+            self._hashes[path] = (firma, digest.hexdigest())
+        return digest.hexdigest()
+
+
+class AdjuntoEnDisco(MIMEBase):
+    """
+    Adjunto que se codifica desde el disco al momento de enviarlo, sin tenerlo completo en memoria.
+
+    En el mensaje serializado queda solo ``marca``; ``SMTPConnectionPool`` envía el resto del mensaje y, en el
+    lugar de la marca, el base64 del archivo por bloques. Fuera del pool (``EmailMessage.send()``) el payload
+    se codifica completo, como cualquier otro adjunto.
+    """
+
+    def __init__(self, maintype: str, subtype: str, path: str, tamano: int):
+        super().__init__(maintype, subtype)
+        self.path = path
+        self.tamano = tamano
+        self.marca = f'adjunto-en-disco-{uuid.uuid4().hex}'
+        self.por_partes = False
+        self.set_payload(self.marca)
+        self['Content-Transfer-Encoding'] = 'base64'
+
+    def get_payload(self, i=None, decode=False):
+        if self.por_partes:
+            return self.marca
+        if decode:
+            return b''.join(_bloques(self.path, self.tamano))
+        return _codifica(self.path, self.tamano)
+
+    def lineas_base64(self):
+        """Base64 del archivo en bloques de líneas terminadas en CRLF, sin el CRLF final"""
+        for indice, bloque in enumerate(_bloques(self.path, self.tamano)):
+            lineas = base64.encodebytes(bloque).replace(b'\n', b'\r\n')
+            yield lineas[:-2] if indice * TAMANO_BLOQUE + len(bloque) >= self.tamano else lineas
+
+
+def _bloques(path: str, tamano: int):
+    """Recorre el archivo por bloques sobre un mmap, sin cargarlo completo en memoria"""
+    if not tamano:
+        return
+
+    with open(path, 'rb') as archivo, mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as contenido:
+        for inicio in range(0, tamano, TAMANO_BLOQUE):
+            yield contenido[inicio:inicio + TAMANO_BLOQUE]
+
+
+def _codifica(path: str, tamano: int) -> str:
+    return ''.join(base64.encodebytes(bloque).decode('ascii') for bloque in _bloques(path, tamano))
+
+
+__attachment_cache = None
+
+
+def get_attachment_cache() -> AttachmentCache:
+    global __attachment_cache
+    if __attachment_cache is None:
+        __attachment_cache = AttachmentCache()
+    return __attachment_cache
@@ -0,0 +1,88 @@
+from bisect import bisect_left
+from datetime import date, timedelta
+
+
+class BusinessCalendar:
+    """
+    Calendario de días hábiles (lunes a viernes menos EPMC_DIAS_INHABILES).
+
+    Mantiene un arreglo de sumas prefijas donde ``_acumulados[i]`` es el número de
+    días hábiles en ``[inicio, inicio + i)``, por lo que cualquier conteo entre dos
+    fechas del rango es una resta. El rango crece solo si se consulta una fecha fuera de él.
+    """
+
+    def __init__(self, dias_inhabiles, inicio: date = None, fin: date = None):
+        self.dias_inhabiles = frozenset(dias_inhabiles)
+        hoy = date.today()
+        self._inicio = None
+        self._acumulados = []
+        self._construye(
+            inicio or min(self.dias_inhabiles, default=hoy),
+            fin or max(self.dias_inhabiles | {hoy}),
+        )
+
+    @classmethod
+    def from_db(cls, cursor):
+        cursor.execute('''
+            SELECT "FEC_INHABIL"
+            FROM "EPMC_DIAS_INHABILES"
+            WHERE "STP_BAJA_REGISTRO" IS NULL
+        ''')
+        return cls(row[0] for row in cursor.fetchall())
+
+    def es_habil(self, dia: date) -> bool:
+        return dia.weekday() < 5 and dia not in self.dias_inhabiles
+
+    def business_days_between(self, inicio: date, fin: date) -> int:
+        """Días hábiles en [inicio, fin], ambos inclusive; 0 si inicio > fin"""
+        if inicio > fin:
+            return 0
+
+        self._cubre(inicio, fin)
+        return self._acumulados[self._indice(fin) + 1] - self._acumulados[self._indice(inicio)]
+
+    def business_days_since(self, inicios, fin: date) -> list:
+        """Conteo de días hábiles de cada fecha de ``inicios`` hasta ``fin``; None se conserva como None"""
+        inicios = list(inicios)
+        validos = [inicio for inicio in inicios if inicio is not None]
+        if not validos:
+            return [None] * len(inicios)
+
+        self._cubre(min(validos), fin)
+        acumulados = self._acumulados
+        tope = acumulados[self._indice(fin) + 1]
+        base = self._inicio
+
+        return [
+            None if inicio is None else (tope - acumulados[(inicio - base).days] if inicio <= fin else 0)
+            for inicio in inicios
+        ]
+
+    def date_for_business_day(self, inicio: date, n: int) -> date:
+        """Fecha en la que el conteo de días hábiles desde ``inicio`` llega a ``n`` (n >= 1)"""
+        self._cubre(inicio, inicio)
+        objetivo = self._acumulados[self._indice(inicio)] + n
+
+        while self._acumulados[-1] < objetivo:
+            fin_actual = self._inicio + timedelta(days=len(self._acumulados) - 2)
+            self._cubre(inicio, fin_actual + timedelta(days=(objetivo - self._acumulados[-1]) * 2 + 7))
+
+        return self._inicio + timedelta(days=bisect_left(self._acumulados, objetivo) - 1)
+
+    def _indice(self, dia: date) -> int:
+        return (dia - self._inicio).days
+
+    def _cubre(self, inicio: date, fin: date):
+        fin_actual = self._inicio + timedelta(days=len(self._acumulados) - 2)
+        if inicio < self._inicio or fin > fin_actual:
+            self._construye(min(inicio, self._inicio), max(fin, fin_actual))
+
+    def _construye(self, inicio: date, fin: date):
+        acumulados = [0]
+        dia = inicio
+        while dia <= fin:
+            acumulados.append(acumulados[-1] + (1 if self.es_habil(dia) else 0))
+            dia += timedelta(days=1)
+
+        self._inicio = inicio
+        self._acumulados = acumulados
@@ -0,0 +1,9 @@
+from django.db import connection
+
+
+def parametros_conexion_dedicada() -> dict:
+    """
+    Parámetros de psycopg2 para las conexiones que viven fuera del ORM (LISTEN del stream, advisory lock del
+    líder), que no deben cerrarse con CONN_MAX_AGE
+    """
+    return connection.get_connection_params()
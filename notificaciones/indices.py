@@ -0,0 +1,222 @@
+"""
+Índices opcionales para las rutas de acceso más frecuentes.
+
+Las tablas no las crean migraciones de esta app, así que los índices se construyen con
+``manage.py create_indexes`` (CREATE INDEX CONCURRENTLY, sin bloquear escrituras) y
+``manage.py explain_hot_queries`` verifica con EXPLAIN (ANALYZE, BUFFERS) que las consultas que arma el código
+(querysets del ORM y SQL de los jobs) los usen y que los predicados de los índices parciales coincidan con ellas.
+"""
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+# (nombre, tabla, definición)
+INDICES = [
+    # Cola de correos: pendientes y leases vencidos (tasks/mail_queue.py)
+    (
+        'EPMT_NOTIFICACIONES_PENDIENTES_IDX', 'EPMT_NOTIFICACIONES',
+        '("ID_NOTIFICACION") WHERE "STP_MODIFICA_REGISTRO" IS NULL',
+    ),
+    # Misma expresión que el filtro usuario_modifica__startswith de mail_queue.pendientes()
+    (
+        'EPMT_NOTIFICACIONES_LEASE_IDX', 'EPMT_NOTIFICACIONES',
+        '("STP_MODIFICA_REGISTRO") WHERE "CVE_USUARIO_MODIFICA"::text LIKE \'LEASE:%\'',
+    ),
+    # Listado de notificaciones: directas y por rol, en el orden de la paginación por cursor
+    (
+        'EPMT_NOTIFICACIONES_USUARIO_IDX', 'EPMT_NOTIFICACIONES',
+        '("ID_USUARIO", "ID_NOTIFICACION" DESC) WHERE "STP_BAJA_REGISTRO" IS NULL',
+    ),
+    (
+        'EPMT_NOTIFICACIONES_ROL_ORDEN_IDX', 'EPMT_NOTIFICACIONES',
+        '("ID_ROL", "ID_ORDEN", "ID_NOTIFICACION" DESC) WHERE "STP_BAJA_REGISTRO" IS NULL',
+    ),
+    (
+        'EPMT_USUARIO_ORDEN_USUARIO_IDX', 'EPMT_USUARIO_ORDEN_SERVICIO',
+        '("ID_USUARIO", "ID_ORDEN")',
+    ),
+    # Jobs de SLA
+    (
+        'EPMT_ENTREGABLES_ESTATUS_IDX', 'EPMT_ENTREGABLES',
+        '("ID_ESTATUS") WHERE "STP_BAJA_REGISTRO" IS NULL',
+    ),
+    (
+        'EPMT_ENTREGABLE_ARCHIVO_ULTIMO_IDX', 'EPMT_ENTREGABLE_ARCHIVO',
+        '("ID_ENTREGABLE", "CVE_MAJOR_VERSION" DESC, "STP_ALTA_REGISTRO" DESC)',
+    ),
+    # Versionado de entregables
+    (
+        'EPMT_ENTREGABLE_ARCHIVO_VERSION_IDX', 'EPMT_ENTREGABLE_ARCHIVO',
+        '("ID_ENTREGABLE", "CVE_MAJOR_VERSION" DESC, "CVE_MINOR_VERSION" DESC) WHERE "STP_BAJA_REGISTRO" IS NULL',
+    ),
+]
+
+
+def consultas_frecuentes(usuario) -> list:
+    """
+    (nombre, índices esperados, consulta) de las rutas frecuentes, armadas con el mismo código que las ejecuta.
+
+    La consulta es un queryset o el par (sql, parámetros) de los jobs con SQL propio. Son solo lecturas, porque
+    EXPLAIN ANALYZE ejecuta la sentencia; las purgas se revisan con el SELECT de su predicado.
+    """
+    from notificaciones.tasks import mail_queue
+    from notificaciones.tasks.entrega_documentos_task import archivos_actuales
+    from notificaciones.tasks.scheduler_manager import notificaciones_por_dar_de_baja, notificaciones_por_eliminar
+    from notificaciones.tasks.sla_task import SQL_ENTREGABLES_CLIENTES
+
+    consultas = [
+        (
+            'cola de correos', {'EPMT_NOTIFICACIONES_PENDIENTES_IDX', 'EPMT_NOTIFICACIONES_LEASE_IDX'},
+            mail_queue.pendientes().order_by('id').values_list('id', flat=True)[:settings.MAIL_QUEUE_BATCH_SIZE],
+        ),
+        (
+            'listado de notificaciones', {'EPMT_NOTIFICACIONES_USUARIO_IDX', 'EPMT_NOTIFICACIONES_ROL_ORDEN_IDX'},
+            _listado(usuario, bandeja=False),
+        ),
+    ]
+    if settings.NOTIFICACIONES_BANDEJA:
+        consultas.append(('listado de la bandeja', {'EPMT_BANDEJA_USUARIO_NOTIF_UNIQUE'}, _listado(usuario, bandeja=True)))
+
+    return consultas + [
+        ('baja de notificaciones', set(), notificaciones_por_dar_de_baja().values('id')),
+        ('eliminación de notificaciones', set(), notificaciones_por_eliminar().values('id')),
+        (
+            'SLA de clientes', {'EPMT_ENTREGABLES_ESTATUS_IDX', 'EPMT_ENTREGABLE_ARCHIVO_ULTIMO_IDX'},
+            (SQL_ENTREGABLES_CLIENTES, []),
+        ),
+        (
+            'última versión vigente', {'EPMT_ENTREGABLE_ARCHIVO_VERSION_IDX'},
+            archivos_actuales(timezone.now().date() - timedelta(days=1)),
+        ),
+    ]
+
+
+def _listado(usuario, bandeja: bool):
+    """
+    Primera página de NotificacionesViewSet.list para ``usuario``, con las mismas consultas de la vista y el
+    LIMIT de página + 1 que aplica NotificacionesCursorPagination.acota a cada parte del UNION
+    """
+    from notificaciones.views import bandeja_de, notificaciones_del_buzon
+
+    limite = settings.NOTIFICACIONES_PAGE_SIZE + 1
+    if bandeja:
+        return bandeja_de(usuario.id).order_by('-id')[:limite]
+
+    directas, por_rol = notificaciones_del_buzon(usuario)
+    return directas.order_by('-id')[:limite].union(por_rol.order_by('-id')[:limite]).order_by('-id')
+
+
+def sql_de(consulta) -> str:
+    if isinstance(consulta, QuerySet):
+        return str(consulta.query)
+    return consulta[0]
+
+
+def ddl_indice(nombre: str, tabla: str, definicion: str, concurrente: bool = True) -> str:
+    # Postgres no admite CONCURRENTLY sobre una tabla particionada (ver tasks/particiones_task.py)
+    return f'CREATE INDEX {"CONCURRENTLY " if concurrente else ""}IF NOT EXISTS "{nombre}" ON "{tabla}" {definicion}'
+
+
+def tablas_particionadas(cursor) -> set:
+    cursor.execute('''
+        SELECT relname FROM pg_class WHERE relkind = 'p' AND relname = ANY(%s)
+    ''', [list({tabla for _, tabla, _ in INDICES})])
+    return {row[0] for row in cursor.fetchall()}
+
+
+def indices_invalidos(cursor) -> list:
+    """Índices de la lista que quedaron INVALID porque falló un CREATE INDEX CONCURRENTLY anterior"""
+    cursor.execute('''
+        SELECT c.relname
+        FROM pg_class c
+        JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE NOT i.indisvalid AND c.relname = ANY(%s)
+    ''', [[nombre for nombre, _, _ in INDICES]])
+    return [row[0] for row in cursor.fetchall()]
+
+
+def explica(cursor, consulta) -> dict:
+    """Ejecuta EXPLAIN (ANALYZE, BUFFERS) y resume índices usados, tiempo y buffers del plan"""
+    plan = _plan(cursor, consulta, analyze=True)
+
+    return {
+        'indices': sorted(_indices_padre(cursor, _indices_del_plan(plan['Plan']))),
+        'milisegundos': plan['Execution Time'],
+        'buffers_hit': plan['Plan'].get('Shared Hit Blocks', 0),
+        'buffers_read': plan['Plan'].get('Shared Read Blocks', 0),
+    }
+
+
+def predicados_sin_coincidencia(cursor, consulta, indices: set) -> list:
+    """
+    Índices parciales de ``indices`` cuyo predicado no aparece en los filtros de la consulta.
+
+    El predicado (pg_get_expr de pg_index.indpred) y los filtros del plan los escribe Postgres con la misma
+    normalización, así que se comparan como texto: por ejemplo, el ``startswith`` del ORM produce
+    ``"CVE_USUARIO_MODIFICA"::text LIKE 'LEASE:%'`` y el índice debe declararse sobre esa misma expresión.
+    Los filtros se toman de un plan sin índices para que el planner no los absorba en un Index Scan.
+    """
+    cursor.execute('''
+        SELECT c.relname, pg_get_expr(i.indpred, i.indrelid)
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indpred IS NOT NULL AND c.relname = ANY(%s)
+    ''', [list(indices)])
+    predicados = dict(cursor.fetchall())
+    if not predicados:
+        return []
+
+    with transaction.atomic():
+        cursor.execute('SET LOCAL enable_indexscan = off')
+        cursor.execute('SET LOCAL enable_bitmapscan = off')
+        cursor.execute('SET LOCAL enable_indexonlyscan = off')
+        filtros = ' '.join(_filtros_del_plan(_plan(cursor, consulta, analyze=False)['Plan']))
+
+    return sorted(nombre for nombre, predicado in predicados.items() if predicado not in filtros)
+
+
+def _plan(cursor, consulta, analyze: bool) -> dict:
+    if isinstance(consulta, QuerySet):
+        plan = consulta.explain(format='json', **({'analyze': True, 'buffers': True} if analyze else {}))
+    else:
+        sql, parametros = consulta
+        cursor.execute(f'EXPLAIN ({"ANALYZE, BUFFERS, " if analyze else ""}FORMAT JSON) {sql}', parametros)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def _filtros_del_plan(nodo: dict) -> list:
+    filtros = [nodo[clave] for clave in ('Filter', 'Join Filter') if clave in nodo]
+    for hijo in nodo.get('Plans', ()):
+        filtros += _filtros_del_plan(hijo)
+    return filtros
+
+
+def _indices_del_plan(nodo: dict) -> set:
+    indices = {nodo['Index Name']} if 'Index Name' in nodo else set()
+    for hijo in nodo.get('Plans', ()):
+        indices |= _indices_del_plan(hijo)
+    return indices
+
+
+def _indices_padre(cursor, indices: set) -> set:
+    """En tablas particionadas el plan nombra el índice de cada partición; se reporta el índice de la tabla"""
+    if not indices:
+        return indices
+
+    cursor.execute('''
+        SELECT c.relname, p.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE c.relkind = 'i' AND c.relname = ANY(%s)
+    ''', [list(indices)])
+    padres = dict(cursor.fetchall())
+    return {padres.get(indice, indice) for indice in indices}
@@ -0,0 +1,44 @@
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+
+class QueueHandlerIniciado(QueueHandler):
+    """
+    QueueHandler que inicia su QueueListener en cuanto dictConfig se lo asigna y lo detiene en ``close()``.
+
+    dictConfig crea el listener pero no lo inicia; ``logging.shutdown`` cierra los handlers al salir, así que
+    los registros encolados se escriben antes de terminar. En un proceso hijo de fork (workers de gunicorn) el
+    hilo del listener no existe y la cola pudo quedar con su lock tomado, por lo que se reemplazan ambos.
+    """
+
+    def __init__(self, queue):
+        self._listener = None
+        super().__init__(queue)
+        os.register_at_fork(after_in_child=self._reinicia_en_hijo)
+
+    @property
+    def listener(self):
+        return self._listener
+
+    @listener.setter
+    def listener(self, listener):
+        self._listener = listener
+        if listener is not None:
+            listener.start()
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        super().close()
+
+    def _reinicia_en_hijo(self):
+        if self._listener is None:
+            return
+
+        anterior = self._listener
+        self.queue = queue.Queue()
+        self.listener = QueueListener(
+            self.queue, *anterior.handlers, respect_handler_level=anterior.respect_handler_level
+        )
@@ -0,0 +1,47 @@
+import logging
+from collections import Counter
+
+from django.conf import settings
+
+
+class LogMuestreado:
+    """
+    Agrega los mensajes que un job emite por fila.
+
+    Si el logger tiene DEBUG activo (``LOG_LEVELS=notificaciones.tasks.sla_task=DEBUG``) cada mensaje se emite
+    completo. Si no, solo se emite completa la primera ocurrencia de cada clave, una línea de avance cada
+    ``cada`` ocurrencias y, al llamar ``resumen()``, una línea con el total de cada clave.
+    """
+
+    def __init__(self, logger: logging.Logger, cada: int = None):
+        self.logger = logger
+        self.cada = cada or settings.LOG_SAMPLE_EVERY
+        self.detalle = logger.isEnabledFor(logging.DEBUG)
+        self._conteos = Counter()
+
+    def warning(self, clave: str, mensaje: str, *args):
+        self.log(logging.WARNING, clave, mensaje, *args)
+
+    def error(self, clave: str, mensaje: str, *args):
+        self.log(logging.ERROR, clave, mensaje, *args)
+
+    def log(self, nivel: int, clave: str, mensaje: str, *args):
+        if self.detalle:
+            self.logger.log(nivel, mensaje, *args)
+            return
+
+        self._conteos[(nivel, clave)] += 1
+        total = self._conteos[(nivel, clave)]
+        if total == 1:
+            self.logger.log(nivel, mensaje, *args)
+        elif total % self.cada == 0:
+            self.logger.log(nivel, '%s: %s filas hasta ahora', clave, total)
+
+    def resumen(self):
+        if self.detalle:
+            return
+
+        for (nivel, clave), total in self._conteos.items():
+            if total > 1:
+                self.logger.log(nivel, '%s: %s filas en total', clave, total)
+        self._conteos.clear()
@@ -0,0 +1,68 @@
+import json
+import logging
+import time
+
+from django.template.loader import get_template
+
+from notificaciones.metrics import MAIL_RENDER, MAIL_RENDER_DEDUPLICADOS, MAIL_RENDER_ERRORES
+
+logger = logging.getLogger(__name__)
+
+
+class MailRenderer:
+    """
+    Render de cuerpos de correo con los Template compilados en memoria.
+
+    ``render_batch`` renderiza una sola vez cada combinación (template, datos) repetida dentro del lote.
+    El tiempo de cada render, los errores y los renders evitados se registran por template en metrics.
+    """
+
+    def __init__(self):
+        self._templates = {}
+
+    def template(self, template_name):
+        template = self._templates.get(template_name)
+        if template is None:
+            template = self._templates[template_name] = get_template(template_name)
+        return template
+
+    def render(self, template_name, datos) -> str:
+        inicio = time.perf_counter()
+        try:
+            return self.template(template_name).render(datos)
+        except Exception:
+            MAIL_RENDER_ERRORES.labels(template_name).inc()
+            raise
+        finally:
+            MAIL_RENDER.labels(template_name).observe(time.perf_counter() - inicio)
+
+    def render_batch(self, mails) -> dict:
+        """Cuerpo renderizado por id de notificación; las que fallan al renderizar se omiten"""
+        cuerpos = {}
+        por_llave = {}
+
+        for mail in mails:
+            llave = (mail.template, json.dumps(mail.datos, sort_keys=True, default=str))
+            if llave in por_llave:
+                MAIL_RENDER_DEDUPLICADOS.labels(mail.template).inc()
+            else:
+                try:
+                    por_llave[llave] = self.render(mail.template, mail.datos)
+                except Exception as e:
+                    logger.error('Error rendering mail %s: %s', mail.id, e)
+                    por_llave[llave] = None
+
+            if por_llave[llave] is not None:
+                cuerpos[mail.id] = por_llave[llave]
+
+        return cuerpos
+
+
+__mail_renderer = None
+
+
+def get_mail_renderer() -> MailRenderer:
+    global __mail_renderer
+    if __mail_renderer is None:
+        __mail_renderer = MailRenderer()
+    return __mail_renderer
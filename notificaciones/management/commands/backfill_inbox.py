@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from notificaciones.tasks.bandeja_task import crea_tabla_bandeja, distribuye_notificaciones, reconcilia_contadores
+
+
+class Command(BaseCommand):
+    help = (
+        'Llena EPMT_BANDEJA_NOTIFICACIONES con las notificaciones vigentes anteriores al trigger de distribución '
+        '(las nuevas las distribuye el trigger al insertarlas)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--create-table',
+            action='store_true',
+            help='Crea la tabla y sus índices si no existen antes de llenarla'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Notificaciones procesadas por transacción (por defecto: 10000)'
+        )
+
+    def handle(self, *args, **options):
+        if options['create_table']:
+            crea_tabla_bandeja()
+            self.stdout.write(self.style.SUCCESS('Tabla EPMT_BANDEJA_NOTIFICACIONES lista'))
+
+        with connection.cursor() as cursor:
+            cursor.execute('''
+                SELECT COALESCE(MIN("ID_NOTIFICACION"), 0), COALESCE(MAX("ID_NOTIFICACION"), 0)
+                FROM "EPMT_NOTIFICACIONES"
+                WHERE "STP_BAJA_REGISTRO" IS NULL
+            ''')
+            minimo, maximo = cursor.fetchone()
+
+        total = 0
+        desde_id = minimo - 1
+        while desde_id < maximo:
+            hasta_id = min(desde_id + options['batch_size'], maximo)
+            total += distribuye_notificaciones(desde_id, hasta_id)
+            self.stdout.write(f'Notificaciones {desde_id + 1} a {hasta_id}: {total} entradas creadas')
+            desde_id = hasta_id
+
+        corregidos = reconcilia_contadores()
+        self.stdout.write(self.style.SUCCESS(
+            f'Backfill terminado: {total} entradas creadas, {corregidos} contadores recalculados'
+        ))
@@ -0,0 +1,128 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.db.backends.signals import connection_created
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from notificaciones.models import Usuario
+from notificaciones.tasks import mail_queue
+from notificaciones.tasks.mail_task import send_mails
+from notificaciones.views import NotificacionesViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el costo de abrir conexiones a la base en las corridas de send_mails y en los GET del buzón, '
+        'sin conexiones persistentes (CONN_MAX_AGE=0) y con la configuración del proceso (DB_ROLE)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--usuario',
+            type=int,
+            help='Usuario que consulta su buzón (por defecto: el primer usuario activo)'
+        )
+        parser.add_argument(
+            '--repeticiones',
+            type=int,
+            default=50,
+            help='Corridas de send_mails y peticiones por medición; se reporta la mediana (por defecto: 50)'
+        )
+        parser.add_argument(
+            '--conn-max-age',
+            type=int,
+            default=settings.DATABASES['default']['CONN_MAX_AGE'],
+            help='CONN_MAX_AGE de la segunda medición (por defecto: el del rol del proceso)'
+        )
+
+    def handle(self, *args, **options):
+        # send_mails se ejecuta completo: con notificaciones pendientes las enviaría
+        if mail_queue.pendientes().exists():
+            raise CommandError('Hay notificaciones pendientes de enviar; ejecute el benchmark sobre una base sin pendientes')
+
+        usuario = self.__usuario(options['usuario'])
+        repeticiones = options['repeticiones']
+        original = connection.settings_dict['CONN_MAX_AGE']
+        escenarios = [('sin persistencia', 0), ('configurada', options['conn_max_age'])]
+
+        self.stdout.write(
+            f'Rol {settings.DB_ROLE}, CONN_HEALTH_CHECKS={connection.settings_dict["CONN_HEALTH_CHECKS"]}, '
+            f'{repeticiones} repeticiones'
+        )
+        self.stdout.write(f'Abrir una conexión: {self.__conexion(repeticiones):.2f} ms (mediana)')
+
+        try:
+            for nombre, max_age in escenarios:
+                connection.close()
+                connection.settings_dict['CONN_MAX_AGE'] = max_age
+                etiqueta = f'{nombre} (CONN_MAX_AGE={max_age})'
+
+                for operacion, mide in (('send_mails', self.__corre_send_mails), ('GET buzón', self.__get_buzon)):
+                    mediana, conexiones = self.__mide(lambda: mide(usuario), repeticiones)
+                    self.stdout.write(
+                        f'{etiqueta:<40} {operacion:<11} {mediana:8.2f} ms, '
+                        f'{conexiones}/{repeticiones} con conexión nueva'
+                    )
+        finally:
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = original
+
+        self.stdout.write(self.style.SUCCESS('Mediciones terminadas'))
+
+    def __usuario(self, usuario_id):
+        usuarios = Usuario.objects.filter(fecha_baja__isnull=True).order_by('id')
+        usuario = usuarios.filter(id=usuario_id).first() if usuario_id is not None else usuarios.first()
+        if usuario is None:
+            raise CommandError('No se encontró el usuario; indique uno existente con --usuario')
+        return usuario
+
+    def __mide(self, operacion, repeticiones):
+        """Mediana en milisegundos de ``operacion`` y cuántas veces tuvo que abrir una conexión"""
+        conexiones = []
+        tiempos = []
+
+        def conectada(**kwargs):
+            conexiones.append(True)
+
+        connection_created.connect(conectada)
+        try:
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                operacion()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+        finally:
+            connection_created.disconnect(conectada)
+
+        return statistics.median(tiempos), len(conexiones)
+
+    def __conexion(self, repeticiones) -> float:
+        tiempos = []
+        for _ in range(repeticiones):
+            connection.close()
+            inicio = time.perf_counter()
+            connection.ensure_connection()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        connection.close()
+        return statistics.median(tiempos)
+
+    @staticmethod
+    def __corre_send_mails(usuario):
+        # La corrida del cron tal como la ejecuta el scheduler, con close_old_connections antes y después
+        send_mails()
+
+    @staticmethod
+    def __get_buzon(usuario):
+        # Las señales de inicio y fin de request son las que cierran las conexiones vencidas en el servidor
+        request_started.send(sender=Command)
+        try:
+            request = APIRequestFactory().get('/notificaciones/', {'page_size': 20})
+            force_authenticate(request, user=usuario)
+            response = NotificacionesViewSet.as_view({'get': 'list'})(request)
+            if response.status_code != 200:
+                raise CommandError(f'GET /notificaciones/ respondió {response.status_code}: {response.data}')
+        finally:
+            request_finished.send(sender=Command)
@@ -0,0 +1,141 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from notificaciones.models import Usuario, UsuarioOrdenServicio
+from notificaciones.tasks.bandeja_task import crea_tabla_bandeja, distribuye_notificaciones
+from notificaciones.views import NotificacionesViewSet
+
+# Una de cada diez notificaciones es directa al usuario medido y otra va a su rol en sus órdenes;
+# el resto es de otros usuarios y solo hace crecer la tabla
+SQL_NOTIFICACIONES = '''
+    INSERT INTO "EPMT_NOTIFICACIONES" (
+        "ID_USUARIO", "ID_ROL", "ID_ORDEN", "IND_EXTERNO", "REF_TITULO", "REF_TEXTO", "REF_TEMPLATE", "REF_DATOS",
+        "CVE_USUARIO_ALTA", "STP_ALTA_REGISTRO", "CVE_USUARIO_MODIFICA", "STP_MODIFICA_REGISTRO"
+    )
+    SELECT
+        CASE
+            WHEN g %% 10 = 0 THEN %(usuario)s
+            WHEN g %% 10 = 1 THEN NULL
+            ELSE (%(otros)s::int[])[1 + g %% cardinality(%(otros)s::int[])]
+        END,
+        CASE WHEN g %% 10 = 1 THEN %(rol)s END,
+        CASE WHEN g %% 10 = 1 THEN (%(ordenes)s::int[])[1 + g %% cardinality(%(ordenes)s::int[])] END,
+        0, 'Benchmark ' || g, '', 'mail/notificacion.html', '{}',
+        'BENCHMARK', NOW() - (g %% 5) * INTERVAL '1 day', 'JOB_SEND_MAILS', NOW()
+    FROM generate_series(1, %(cantidad)s) g
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el listado y el conteo del buzón con la consulta UNION y con la bandeja materializada, '
+        'agregando notificaciones sintéticas hasta cada tamaño; todo se revierte al terminar'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--usuario',
+            type=int,
+            help='Usuario que consulta su buzón (por defecto: el interno con más órdenes asignadas)'
+        )
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[10_000, 100_000, 1_000_000],
+            help='Notificaciones sintéticas en cada medición (por defecto: 10000 100000 1000000)'
+        )
+        parser.add_argument(
+            '--repeticiones',
+            type=int,
+            default=20,
+            help='Peticiones por medición; se reporta la mediana (por defecto: 20)'
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=20,
+            help='Tamaño de página del listado (por defecto: 20)'
+        )
+
+    def handle(self, *args, **options):
+        usuario = self.__usuario(options['usuario'])
+        ordenes = list(UsuarioOrdenServicio.objects.filter(id_usuario=usuario).values_list('id_orden', flat=True))
+        otros = list(
+            Usuario.objects.filter(fecha_baja__isnull=True).exclude(id=usuario.id).values_list('id', flat=True)[:1000]
+        )
+        self.stdout.write(f'Usuario {usuario.id}, rol {usuario.id_rol_id}, {len(ordenes)} órdenes asignadas')
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            crea_tabla_bandeja()
+            insertadas = 0
+
+            for tamano in sorted(options['sizes']):
+                cursor.execute('SELECT COALESCE(MAX("ID_NOTIFICACION"), 0) FROM "EPMT_NOTIFICACIONES"')
+                desde_id = cursor.fetchone()[0]
+                cursor.execute(SQL_NOTIFICACIONES, {
+                    'usuario': usuario.id, 'rol': usuario.id_rol_id, 'ordenes': ordenes or [None],
+                    'otros': otros or [usuario.id], 'cantidad': tamano - insertadas,
+                })
+                insertadas = tamano
+                cursor.execute('SELECT MAX("ID_NOTIFICACION") FROM "EPMT_NOTIFICACIONES"')
+                hasta_id = cursor.fetchone()[0]
+                distribuye_notificaciones(desde_id, hasta_id)
+                cursor.execute('ANALYZE "EPMT_NOTIFICACIONES"')
+                cursor.execute('ANALYZE "EPMT_BANDEJA_NOTIFICACIONES"')
+
+                for modo, bandeja in (('union', False), ('bandeja', True)):
+                    with override_settings(NOTIFICACIONES_BANDEJA=bandeja):
+                        pagina = {'page_size': options['page_size']}
+                        primera = self.__mide(usuario, 'list', pagina, options['repeticiones'])
+                        profunda = self.__mide(usuario, 'list', {**pagina, 'cursor': (desde_id + hasta_id) // 2},
+                                               options['repeticiones'])
+                        conteo = self.__mide(usuario, 'count', {}, options['repeticiones'])
+
+                    self.stdout.write(
+                        f'{tamano:>9} {modo:<8} primera página {primera:8.2f} ms, '
+                        f'página intermedia {profunda:8.2f} ms, count {conteo:8.2f} ms'
+                    )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Mediciones terminadas, notificaciones sintéticas revertidas'))
+
+    def __usuario(self, usuario_id):
+        usuarios = Usuario.objects.filter(fecha_baja__isnull=True)
+        if usuario_id is not None:
+            usuario = usuarios.filter(id=usuario_id).first()
+        else:
+            usuario = (
+                usuarios.filter(is_externo=0)
+                .annotate(ordenes=Count('usuarioordenservicio'))
+                .order_by('-ordenes')
+                .first()
+            )
+
+        if usuario is None:
+            raise CommandError('No se encontró el usuario; indique uno existente con --usuario')
+        return usuario
+
+    def __mide(self, usuario, accion, parametros, repeticiones) -> float:
+        """Mediana, en milisegundos, de la petición GET completa a la vista (consultas y serialización)"""
+        vista = NotificacionesViewSet.as_view({'get': accion})
+        ruta = '/notificaciones/' if accion == 'list' else f'/notificaciones/{accion}/'
+        tiempos = []
+
+        for _ in range(repeticiones):
+            request = APIRequestFactory().get(ruta, parametros)
+            force_authenticate(request, user=usuario)
+            inicio = time.perf_counter()
+            response = vista(request)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'GET {ruta} respondió {response.status_code}: {response.data}')
+
+        return statistics.median(tiempos)
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from notificaciones.indices import INDICES, ddl_indice, indices_invalidos, tablas_particionadas
+
+
+class Command(BaseCommand):
+    help = 'Crea con CREATE INDEX CONCURRENTLY los índices parciales y compuestos de las consultas frecuentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo muestra las sentencias sin ejecutarlas'
+        )
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            particionadas = tablas_particionadas(cursor)
+
+        if options['dry_run']:
+            for nombre, tabla, definicion in INDICES:
+                self.stdout.write(f'{ddl_indice(nombre, tabla, definicion, tabla not in particionadas)};')
+            return
+
+        # CONCURRENTLY no puede ejecutarse dentro de una transacción; el cursor de Django está en autocommit.
+        # En tablas particionadas el índice se crea sin CONCURRENTLY y bloquea escrituras mientras se construye
+        with connection.cursor() as cursor:
+            for nombre in indices_invalidos(cursor):
+                self.stdout.write(self.style.WARNING(f'{nombre} quedó inválido en un intento anterior, se reconstruye'))
+                cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{nombre}"')
+
+            for nombre, tabla, definicion in INDICES:
+                self.stdout.write(f'Creando {nombre} en {tabla}...')
+                cursor.execute(ddl_indice(nombre, tabla, definicion, tabla not in particionadas))
+                cursor.execute(f'ANALYZE "{tabla}"')
+
+        self.stdout.write(self.style.SUCCESS(f'{len(INDICES)} índices listos'))
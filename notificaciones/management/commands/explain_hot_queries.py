@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+
+from notificaciones.indices import consultas_frecuentes, explica, predicados_sin_coincidencia, sql_de
+from notificaciones.models import Usuario
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta EXPLAIN (ANALYZE, BUFFERS) de las consultas frecuentes tal como las arma el código, indica si usan '
+        'el índice esperado y si los predicados de los índices parciales coinciden con su SQL'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--usuario',
+            type=int,
+            help='Usuario para las consultas del listado (por defecto: el interno con más órdenes asignadas)'
+        )
+        parser.add_argument(
+            '--sql',
+            action='store_true',
+            help='Muestra además el SQL de cada consulta'
+        )
+
+    def handle(self, *args, **options):
+        usuario = self.__usuario(options['usuario'])
+        self.stdout.write(f'Usuario {usuario.id}, rol {usuario.id_rol_id}')
+
+        sin_indice = sin_predicado = 0
+        with connection.cursor() as cursor:
+            for nombre, indices, consulta in consultas_frecuentes(usuario):
+                if options['sql']:
+                    self.stdout.write(sql_de(consulta))
+
+                resultado = explica(cursor, consulta)
+                faltantes = indices - set(resultado['indices'])
+                sin_indice += bool(faltantes)
+
+                estilo = self.style.WARNING if faltantes else self.style.SUCCESS
+                self.stdout.write(estilo(
+                    f'{"NO " if faltantes else "OK "} {nombre}: {resultado["milisegundos"]:.2f} ms, '
+                    f'buffers hit={resultado["buffers_hit"]} read={resultado["buffers_read"]}, '
+                    f'índices={", ".join(resultado["indices"]) or "ninguno"}'
+                    f'{f" (esperados: {", ".join(sorted(faltantes))})" if faltantes else ""}'
+                ))
+
+                for indice in predicados_sin_coincidencia(cursor, consulta, indices):
+                    sin_predicado += 1
+                    self.stdout.write(self.style.ERROR(
+                        f'    El predicado de {indice} no aparece en los filtros de "{nombre}"; el planner no podrá '
+                        f'usarlo hasta que su WHERE use la misma expresión que el SQL de la consulta'
+                    ))
+
+        if sin_indice:
+            self.stdout.write(self.style.WARNING(
+                f'{sin_indice} consultas no usan el índice esperado; con tablas pequeñas el planner puede preferir '
+                'un Seq Scan, conviene revisarlo con datos de volumen real'
+            ))
+        if sin_predicado:
+            raise CommandError(f'{sin_predicado} índices parciales no coinciden con el SQL de sus consultas')
+
+    def __usuario(self, usuario_id):
+        usuarios = Usuario.objects.filter(fecha_baja__isnull=True)
+        if usuario_id is not None:
+            usuario = usuarios.filter(id=usuario_id).first()
+            if usuario is None:
+                raise CommandError(f'El usuario {usuario_id} no existe')
+            return usuario
+
+        usuario = (
+            usuarios.filter(is_externo=0, usuarioordenservicio__isnull=False)
+            .annotate(ordenes=Count('usuarioordenservicio'))
+            .order_by('-ordenes')
+            .first()
+        )
+        if usuario is None:
+            raise CommandError('No hay usuarios con órdenes asignadas; indique uno con --usuario')
+        return usuario
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from notificaciones.stream import CANAL, crea_trigger_avisos
+
+
+class Command(BaseCommand):
+    help = 'Crea (o reemplaza) el trigger de EPMT_NOTIFICACIONES que avisa por NOTIFY a los streams SSE'
+
+    def handle(self, *args, **options):
+        crea_trigger_avisos()
+        self.stdout.write(self.style.SUCCESS(f'Trigger instalado, avisos en el canal {CANAL}'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from notificaciones.tasks.particiones_task import TABLA_ANTERIOR, convierte_tabla
+
+
+class Command(BaseCommand):
+    help = 'Convierte EPMT_NOTIFICACIONES en una tabla particionada por STP_ALTA_REGISTRO y copia sus datos'
+
+    def handle(self, *args, **options):
+        try:
+            resultado = convierte_tabla()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Tabla particionada: {resultado["filas"]} filas copiadas a {resultado["particiones"]} particiones'
+            f'{", trigger de avisos reinstalado" if resultado["trigger"] else ""}'
+        ))
+        self.stdout.write(
+            f'Ejecute manage.py create_indexes, active NOTIFICACIONES_PARTICIONADA y, una vez verificado, '
+            f'elimine {TABLA_ANTERIOR}'
+        )
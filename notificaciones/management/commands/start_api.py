@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+from gunicorn.app.base import BaseApplication
+
+APLICACIONES = {
+    # uvicorn: necesario para el stream SSE; cada worker atiende miles de conexiones con asyncio
+    'asgi': ('btentregables_notificaciones.asgi.application', 'uvicorn.workers.UvicornWorker'),
+    'wsgi': ('btentregables_notificaciones.wsgi.application', 'gthread'),
+}
+HILOS_WSGI = 4
+
+
+class _Servidor(BaseApplication):
+    def __init__(self, aplicacion, opciones):
+        self.aplicacion = aplicacion
+        self.opciones = opciones
+        super().__init__()
+
+    def load_config(self):
+        for nombre, valor in self.opciones.items():
+            self.cfg.set(nombre, valor)
+
+    def load(self):
+        return import_string(self.aplicacion)
+
+
+class Command(BaseCommand):
+    help = 'Sirve el API con gunicorn y varios workers, sin el scheduler (ver start_worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--bind',
+            type=str,
+            default='0.0.0.0:8005',
+            help='Dirección y puerto (por defecto: 0.0.0.0:8005)'
+        )
+        parser.add_argument(
+            '--server',
+            choices=sorted(APLICACIONES),
+            default=settings.API_SERVER,
+            help=f'Interfaz del servidor (por defecto: {settings.API_SERVER})'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.API_WORKERS,
+            help=f'Procesos worker (por defecto: {settings.API_WORKERS})'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=settings.API_THREADS,
+            help=f'Hilos por worker, solo con --server wsgi (por defecto: {settings.API_THREADS or HILOS_WSGI})'
+        )
+
+    def handle(self, *args, **options):
+        aplicacion, worker_class = APLICACIONES[options['server']]
+
+        if options['server'] == 'asgi':
+            # UvicornWorker ignora los hilos; la concurrencia bajo asgi la da asyncio
+            if options['threads']:
+                raise CommandError('--threads / API_THREADS solo aplican con --server wsgi')
+            options['threads'] = 1
+        else:
+            options['threads'] = options['threads'] or HILOS_WSGI
+
+        self.stdout.write(
+            f'Iniciando API {options["server"]} en {options["bind"]} con {options["workers"]} workers '
+            f'de {options["threads"]} hilos...'
+        )
+        _Servidor(aplicacion, {
+            'bind': options['bind'],
+            'workers': options['workers'],
+            'threads': options['threads'],
+            'worker_class': worker_class,
+            'graceful_timeout': settings.API_GRACEFUL_TIMEOUT,
+            'accesslog': '-',
+        }).run()
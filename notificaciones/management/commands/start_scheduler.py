@@ -8,7 +8,7 @@ from notificaciones.tasks.scheduler_manager import initialize_scheduler
 
 
 class Command(BaseCommand):
-    help = 'Inicia el scheduler de tareas programadas y el servidor de desarrollo'
+    help = 'Inicia el scheduler de tareas programadas y el servidor de desarrollo (en producción: start_api y start_worker)'
 
     def add_arguments(self, parser):
         parser.add_argument(
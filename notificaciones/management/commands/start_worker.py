@@ -0,0 +1,50 @@
+import signal
+import sys
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from prometheus_client import start_http_server
+
+from notificaciones.tasks.scheduler_manager import initialize_scheduler
+from notificaciones.utils import close_smtp_pool
+
+
+class Command(BaseCommand):
+    help = 'Inicia solo el scheduler de tareas programadas, sin servir el API (ver start_api)'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.scheduler = None
+        self.detenido = threading.Event()
+
+    def handle_sigterm(self, signum, frame):
+        self.stdout.write(self.style.WARNING('\nRecibida señal de terminación. Cerrando el scheduler...'))
+        self.detenido.set()
+
+    def handle(self, *args, **options):
+        signal.signal(signal.SIGINT, self.handle_sigterm)
+        signal.signal(signal.SIGTERM, self.handle_sigterm)
+
+        self.stdout.write('Iniciando scheduler...')
+        try:
+            self.scheduler = initialize_scheduler()
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Error: {str(e)}'))
+            sys.exit(1)
+
+        if self.scheduler is None:
+            self.stdout.write(self.style.ERROR('SCHEDULER_DEFAULT está desactivado, no hay tareas que ejecutar'))
+            sys.exit(1)
+
+        self.stdout.write(self.style.SUCCESS('Scheduler iniciado exitosamente'))
+
+        if settings.METRICS_PORT:
+            # Este proceso no sirve el API, las métricas de las tareas se exponen en su propio puerto
+            start_http_server(settings.METRICS_PORT)
+            self.stdout.write(f'Métricas en el puerto {settings.METRICS_PORT}')
+        while not self.detenido.wait(1):
+            pass
+        # Espera a que terminen las tareas en curso antes de salir
+        self.scheduler.shutdown()
+        close_smtp_pool()
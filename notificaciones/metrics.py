@@ -0,0 +1,104 @@
+"""
+Métricas Prometheus de las tareas programadas, el envío de correos y el API.
+
+Con varios workers de gunicorn se debe definir ``PROMETHEUS_MULTIPROC_DIR`` (directorio vacío y escribible)
+para que ``/metrics`` agregue las métricas de todos los procesos. El worker del scheduler no sirve HTTP, así
+que expone las suyas en ``METRICS_PORT`` (ver start_worker).
+"""
+import functools
+import os
+import time
+
+from django.db import connection
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+from notificaciones.tasks.leader import trabajos_en_curso
+
+JOB_DURACION = Histogram(
+    'notificaciones_job_duration_seconds', 'Duración de cada ejecución de una tarea programada', ['job'],
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800),
+)
+JOB_EJECUCIONES = Counter(
+    'notificaciones_job_runs', 'Ejecuciones de tareas programadas por resultado', ['job', 'resultado'],
+)
+JOB_SQL_SENTENCIAS = Counter(
+    'notificaciones_job_sql_statements', 'Sentencias SQL ejecutadas por las tareas programadas', ['job'],
+)
+JOB_SQL_SEGUNDOS = Counter(
+    'notificaciones_job_sql_seconds', 'Tiempo en base de datos de las tareas programadas', ['job'],
+)
+JOB_FILAS = Counter(
+    'notificaciones_job_rows', 'Filas leídas (SELECT) y escritas (INSERT/UPDATE/DELETE) por las tareas', ['job', 'tipo'],
+)
+MAILS = Counter(
+    'notificaciones_mails', 'Correos procesados por resultado', ['resultado'],
+)
+SMTP_LATENCIA = Histogram(
+    'notificaciones_smtp_send_seconds', 'Latencia de entrega de un correo al servidor SMTP',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+MAIL_RENDER = Histogram(
+    'notificaciones_mail_render_seconds', 'Tiempo de render de un cuerpo de correo', ['template'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+MAIL_RENDER_ERRORES = Counter(
+    'notificaciones_mail_render_errors', 'Renders de correo que fallaron', ['template'],
+)
+MAIL_RENDER_DEDUPLICADOS = Counter(
+    'notificaciones_mail_render_deduplicated', 'Renders evitados por repetir template y datos en el lote', ['template'],
+)
+MAIL_CACHE = Counter(
+    'notificaciones_mail_cache', 'Consultas a las caches de imágenes y adjuntos de correo', ['cache', 'resultado'],
+)
+API_LATENCIA = Histogram(
+    'notificaciones_api_request_seconds', 'Latencia de NotificacionesViewSet', ['accion', 'metodo', 'status'],
+)
+
+
+def instrumenta_job(nombre: str):
+    """
+    Mide duración, resultado, sentencias SQL y filas de la tarea y la cuenta en ``trabajos_en_curso``; conserva
+    nombre y módulo para DjangoJobStore
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            resultado = 'error'
+            try:
+                with trabajos_en_curso, connection.execute_wrapper(functools.partial(_mide_sql, nombre)):
+                    valor = funcion(*args, **kwargs)
+                resultado = 'ok'
+                return valor
+            finally:
+                JOB_DURACION.labels(nombre).observe(time.perf_counter() - inicio)
+                JOB_EJECUCIONES.labels(nombre, resultado).inc()
+        return envoltura
+    return decorador
+
+
+def _mide_sql(job, execute, sql, params, many, context):
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        JOB_SQL_SENTENCIAS.labels(job).inc()
+        JOB_SQL_SEGUNDOS.labels(job).inc(time.perf_counter() - inicio)
+
+        filas = getattr(context['cursor'], 'rowcount', -1)
+        if filas > 0:
+            tipo = 'leidas' if sql.lstrip().upper().startswith('SELECT') else 'escritas'
+            JOB_FILAS.labels(job, tipo).inc(filas)
+
+
+def metrics_view(request):
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+
+    return HttpResponse(generate_latest(registro), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,668 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Las tablas de estos modelos ya existen en la base (son de la aplicación principal; las de la bandeja las
+# crea 0003 si no existen): solo se registran en el estado de migraciones.
+TABLAS_COMPARTIDAS = [
+    migrations.CreateModel(
+        name='Usuario',
+        fields=[
+            ('id', models.AutoField(db_column='ID_USUARIO', primary_key=True, serialize=False)),
+            ('is_active', models.IntegerField(db_column='IND_ACTIVO', default=1)),
+            ('is_externo', models.IntegerField(db_column='IND_EXTERNO', default=0)),
+            ('cargo', models.CharField(db_column='REF_CARGO', max_length=255, null=True)),
+            ('nombre', models.CharField(db_column='REF_NOMBRE', max_length=255, null=True)),
+            ('primer_apellido', models.CharField(db_column='REF_PRIMER_APELLIDO', max_length=255, null=True)),
+            ('segundo_apellido', models.CharField(db_column='REF_SEGUNDO_APELLIDO', max_length=255, null=True)),
+            ('email', models.EmailField(db_column='REF_EMAIL', max_length=254, unique=True)),
+            ('password', models.CharField(db_column='REF_CONTRASENA', max_length=255)),
+            ('token_verificacion', models.CharField(db_column='REF_TOKEN_VERIFICACION', max_length=60, null=True)),
+            ('codigo_verificacion', models.CharField(db_column='REF_CODIGO_VERIFICACION', max_length=10, null=True)),
+            ('fecha_codigo', models.DateTimeField(blank=True, db_column='STP_CODIGO_VERIFICACION', null=True)),
+            ('usuario_alta', models.CharField(db_column='CVE_USUARIO_ALTA', max_length=255, null=True)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(db_column='CVE_USUARIO_MODIFICA', max_length=255, null=True)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(db_column='CVE_USUARIO_BAJA', max_length=255, null=True)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('last_login', models.DateTimeField(blank=True, db_column='STP_LAST_LOGIN', editable=False, null=True)),
+        ],
+        options={
+            'verbose_name': 'Usuario',
+            'verbose_name_plural': 'Usuarios',
+            'db_table': 'EPMT_USUARIOS',
+        },
+    ),
+    migrations.CreateModel(
+        name='Cliente',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_CLIENTE', primary_key=True, serialize=False)),
+            ('nombre', models.CharField(db_column='NOM_CLIENTE', max_length=255)),
+            ('nombre_corto', models.CharField(db_column='NOM_CORTO', max_length=30)),
+            ('rfc', models.CharField(db_column='CVE_RFC', max_length=255, unique=True)),
+            ('razon_social', models.CharField(db_column='REF_RAZON_SOCIAL', max_length=255)),
+            ('giro', models.CharField(db_column='REF_GIRO', max_length=255)),
+            ('direccion', models.CharField(db_column='REF_DIRECCION', max_length=255)),
+        ],
+        options={
+            'verbose_name': 'Cliente',
+            'verbose_name_plural': 'Clientes',
+            'db_table': 'EPMT_CLIENTES',
+        },
+    ),
+    migrations.CreateModel(
+        name='DiaInhabil',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_DIA_INHABIL', primary_key=True, serialize=False)),
+            ('fecha', models.DateField(db_column='FEC_DIA_INHABIL')),
+        ],
+        options={
+            'verbose_name': 'Dia Inhabil',
+            'verbose_name_plural': 'Dias Inhabiles',
+            'db_table': 'EPMC_DIAS_INHABILES',
+        },
+    ),
+    migrations.CreateModel(
+        name='Empresa',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_EMPRESA', primary_key=True, serialize=False)),
+            ('nombre', models.CharField(blank=True, db_column='NOM_EMPRESA', max_length=255)),
+        ],
+        options={
+            'verbose_name': 'Empresa ligada',
+            'verbose_name_plural': 'Empresas ligadas',
+            'db_table': 'EPMC_EMPRESA',
+        },
+    ),
+    migrations.CreateModel(
+        name='EstatusEntregable',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_ESTATUS', primary_key=True, serialize=False)),
+            ('nombre', models.CharField(db_column='NOM_ESTATUS', max_length=50)),
+            ('descripcion', models.CharField(blank=True, db_column='REF_DESCRIPCION', max_length=255)),
+        ],
+        options={
+            'verbose_name': 'Estatus de Entregable',
+            'verbose_name_plural': 'Estatus de Entregables',
+            'db_table': 'EPMC_ESTATUS_ENTREGABLE',
+        },
+    ),
+    migrations.CreateModel(
+        name='Etapa',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_ETAPA', primary_key=True, serialize=False)),
+            ('nombre', models.CharField(db_column='NOM_ETAPA', max_length=50)),
+            ('descripcion', models.CharField(blank=True, db_column='REF_DESCRIPCION', max_length=300)),
+        ],
+        options={
+            'verbose_name': 'Etapa',
+            'verbose_name_plural': 'Etapas',
+            'db_table': 'EPMC_ETAPAS',
+        },
+    ),
+    migrations.CreateModel(
+        name='TipoSprint',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_TIPO_SPRINT', primary_key=True, serialize=False)),
+            ('nombre', models.CharField(db_column='NOM_SPRINT', max_length=30)),
+            ('descripcion', models.CharField(db_column='REF_DESCRIPCION', max_length=300)),
+        ],
+        options={
+            'verbose_name': 'Tipo de Sprint',
+            'verbose_name_plural': 'Tipos de Sprint',
+            'db_table': 'EPMC_TIPO_SPRINT',
+        },
+    ),
+    migrations.CreateModel(
+        name='ContadorNotificaciones',
+        fields=[
+            ('id_usuario', models.OneToOneField(db_column='ID_USUARIO', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+            ('visibles', models.IntegerField(db_column='NUM_VISIBLES', default=0)),
+            ('fecha_actualiza', models.DateTimeField(db_column='STP_ACTUALIZA', null=True)),
+        ],
+        options={
+            'verbose_name': 'Contador de Notificaciones',
+            'verbose_name_plural': 'Contadores de Notificaciones',
+            'db_table': 'EPMT_CONTADOR_NOTIFICACIONES',
+        },
+    ),
+    migrations.AddField(
+        model_name='usuario',
+        name='id_cliente',
+        field=models.ForeignKey(db_column='ID_CLIENTE', null=True, on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.cliente'),
+    ),
+    migrations.CreateModel(
+        name='Contrato',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_CONTRATO', primary_key=True, serialize=False)),
+            ('clave_contrato', models.CharField(db_column='CVE_CONTRATO', max_length=255)),
+            ('nombre_contrato', models.CharField(db_column='NOM_CONTRATO', max_length=255)),
+            ('id_cliente', models.ForeignKey(db_column='ID_CLIENTE', on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.cliente')),
+        ],
+        options={
+            'verbose_name': 'Contrato',
+            'verbose_name_plural': 'Contratos',
+            'db_table': 'EPMT_CONTRATOS',
+        },
+    ),
+    migrations.AddField(
+        model_name='cliente',
+        name='id_empresa_ligada',
+        field=models.ForeignKey(db_column='ID_EMPRESA_LIGADA', on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.empresa'),
+    ),
+    migrations.CreateModel(
+        name='Entregable',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_ENTREGABLE', primary_key=True, serialize=False)),
+            ('color_sla', models.CharField(db_column='REF_COLOR_SLA', default='VERDE', max_length=20)),
+            ('nombre', models.CharField(db_column='NOM_ENTREGABLE', max_length=300)),
+            ('fecha_inicio', models.DateField(db_column='FEC_INICIO', null=True)),
+            ('fecha_fin', models.DateField(db_column='FEC_FIN', null=True)),
+            ('fecha_entrega', models.DateField(db_column='FEC_ENTREGA', null=True)),
+            ('fecha_vobo', models.DateField(db_column='FEC_VOBO', null=True)),
+            ('id_responsable', models.ForeignKey(db_column='ID_USUARIO_RESPONSABLE', null=True, on_delete=django.db.models.deletion.RESTRICT, to=settings.AUTH_USER_MODEL)),
+            ('id_estatus', models.ForeignKey(db_column='ID_ESTATUS', default=1, on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.estatusentregable')),
+        ],
+        options={
+            'verbose_name': 'Entregable',
+            'verbose_name_plural': 'Entregables',
+            'db_table': 'EPMT_ENTREGABLES',
+        },
+    ),
+    migrations.CreateModel(
+        name='EntregableArchivo',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_ARCHIVO', primary_key=True, serialize=False)),
+            ('major_version', models.IntegerField(db_column='CVE_MAJOR_VERSION', default=0)),
+            ('minor_version', models.IntegerField(db_column='CVE_MINOR_VERSION')),
+            ('nombre', models.CharField(db_column='REF_NOMBRE', max_length=500)),
+            ('extension', models.CharField(db_column='REF_EXTENSION', max_length=500)),
+            ('path', models.FileField(db_column='REF_PATH', max_length=700, upload_to='')),
+            ('file_hash', models.CharField(db_column='REF_HASH', max_length=300)),
+            ('sla_actual', models.CharField(db_column='REF_SLA_ACTUAL', max_length=20)),
+            ('sla_cliente', models.CharField(db_column='REF_SLA_CLIENTE', max_length=20)),
+            ('vobo_interno', models.BooleanField(db_column='IND_VOBO_INTERNO', default=False)),
+            ('id_entregable', models.ForeignKey(db_column='ID_ENTREGABLE', on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.entregable')),
+        ],
+        options={
+            'verbose_name': 'Entregable Archivo',
+            'verbose_name_plural': 'Entregables Archivos',
+            'db_table': 'EPMT_ENTREGABLE_ARCHIVO',
+        },
+    ),
+    migrations.CreateModel(
+        name='EntregableArchivoComentario',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_ARCHIVO_COMENTARIO', primary_key=True, serialize=False)),
+            ('comentario', models.CharField(db_column='REF_COMENTARIO', max_length=999)),
+            ('id_archivo', models.ForeignKey(db_column='ID_ARCHIVO', on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.entregablearchivo')),
+        ],
+        options={
+            'verbose_name': 'Comentario Entregable Archivo',
+            'verbose_name_plural': 'Comentarios Entregables Archivos',
+            'db_table': 'EPMT_ENTREGABLE_ARCHIVO_COMENTARIO',
+        },
+    ),
+    migrations.CreateModel(
+        name='EntregableFlujo',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_ENTREGABLE_FLUJO', primary_key=True, serialize=False)),
+            ('id_infoblue', models.IntegerField(db_column='ID_INFOBLUE', null=True)),
+            ('accion', models.CharField(db_column='REF_ACCION', max_length=10)),
+            ('id_estatus_final', models.ForeignKey(db_column='ID_ESTATUS_FINAL', on_delete=django.db.models.deletion.RESTRICT, related_name='estatus_final', to='notificaciones.estatusentregable')),
+            ('id_estatus_inicial', models.ForeignKey(db_column='ID_ESTATUS_INICIAL', on_delete=django.db.models.deletion.RESTRICT, related_name='estatus_inicial', to='notificaciones.estatusentregable')),
+        ],
+        options={
+            'verbose_name': 'Entregable Flujo',
+            'verbose_name_plural': 'Entregables Flujos',
+            'db_table': 'EPMC_ENTREGABLES_FLUJOS',
+        },
+    ),
+    migrations.CreateModel(
+        name='EntregableEstatusHist',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_ESTATUS_ENT_HIST', primary_key=True, serialize=False)),
+            ('id_entregable', models.ForeignKey(db_column='ID_ENTREGABLE', on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.entregable')),
+            ('estatus', models.ForeignKey(db_column='ID_ESTATUS', on_delete=django.db.models.deletion.RESTRICT, related_name='estatus', to='notificaciones.estatusentregable')),
+            ('estatus_ant', models.ForeignKey(db_column='ID_ESTATUS_ANT', on_delete=django.db.models.deletion.RESTRICT, related_name='estatus_ant', to='notificaciones.estatusentregable')),
+        ],
+        options={
+            'verbose_name': 'Entregable Estatus',
+            'verbose_name_plural': 'Entregables Estatus',
+            'db_table': 'EPMT_ENTREGABLE_ESTATUS_HIST',
+        },
+    ),
+    migrations.CreateModel(
+        name='InfoBlue',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_INFOBLUE', primary_key=True, serialize=False)),
+            ('etapa', models.IntegerField(db_column='CVE_ETAPA', default=0)),
+            ('clave', models.CharField(db_column='CVE_INFOBLUE', default='', max_length=255)),
+            ('nombre', models.CharField(db_column='NOM_INFOBLUE', default='', max_length=255)),
+            ('entregable_inicial', models.IntegerField(db_column='IND_ENTREGABLE_INICIAL', default=0)),
+            ('path', models.FileField(db_column='REF_PATH', max_length=500, upload_to='')),
+            ('sla_verde', models.IntegerField(db_column='NUM_SLA_VERDE', default=0)),
+            ('sla_amarillo', models.IntegerField(db_column='NUM_SLA_AMARILLO', default=0)),
+            ('sla_rojo', models.IntegerField(db_column='NUM_SLA_ROJO', default=0)),
+            ('subtipo', models.CharField(db_column='REF_SUBTIPO')),
+            ('requerido', models.BooleanField(db_column='IND_REQUERIDO', default=True)),
+            ('id_cliente', models.ForeignKey(db_column='ID_CLIENTE', on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.cliente')),
+        ],
+        options={
+            'verbose_name': 'InfoBlue',
+            'verbose_name_plural': 'InfoBlues',
+            'db_table': 'EPMC_INFOBLUE',
+        },
+    ),
+    migrations.AddField(
+        model_name='entregable',
+        name='id_infoblue',
+        field=models.ForeignKey(db_column='ID_INFOBLUE', null=True, on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.infoblue'),
+    ),
+    migrations.CreateModel(
+        name='Notificaciones',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_NOTIFICACION', primary_key=True, serialize=False)),
+            ('externo', models.IntegerField(db_column='IND_EXTERNO', default=0)),
+            ('titulo', models.CharField(db_column='REF_TITULO', max_length=150)),
+            ('texto', models.CharField(db_column='REF_TEXTO', max_length=500)),
+            ('template', models.CharField(db_column='REF_TEMPLATE', max_length=50)),
+            ('datos', models.JSONField(db_column='REF_DATOS', max_length=150)),
+            ('id_usuario', models.ForeignKey(db_column='ID_USUARIO', null=True, on_delete=django.db.models.deletion.RESTRICT, to=settings.AUTH_USER_MODEL)),
+        ],
+        options={
+            'verbose_name': 'Notificacion',
+            'verbose_name_plural': 'Notificaciones',
+            'db_table': 'EPMT_NOTIFICACIONES',
+        },
+    ),
+    migrations.CreateModel(
+        name='BandejaNotificacion',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.BigAutoField(db_column='ID_BANDEJA', primary_key=True, serialize=False)),
+            ('id_usuario', models.ForeignKey(db_column='ID_USUARIO', on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL)),
+            ('id_notificacion', models.ForeignKey(db_column='ID_NOTIFICACION', on_delete=django.db.models.deletion.DO_NOTHING, to='notificaciones.notificaciones')),
+        ],
+        options={
+            'verbose_name': 'Bandeja de Notificaciones',
+            'verbose_name_plural': 'Bandejas de Notificaciones',
+            'db_table': 'EPMT_BANDEJA_NOTIFICACIONES',
+        },
+    ),
+    migrations.CreateModel(
+        name='OrdenServicio',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_ORDEN', primary_key=True, serialize=False)),
+            ('num_semanas_duracion', models.IntegerField(db_column='NUM_SEMANAS_DURACION', null=True)),
+            ('nombre', models.CharField(db_column='REF_NOMBRE', max_length=255)),
+            ('nombre_corto', models.CharField(db_column='REF_NOMBRE_CORTO', max_length=255)),
+            ('fecha_inicio', models.DateField(db_column='FEC_INICIO', null=True)),
+            ('fecha_fin', models.DateField(db_column='FEC_FIN', null=True)),
+            ('id_responsable', models.ForeignKey(db_column='ID_USUARIO_RESPONSABLE', null=True, on_delete=django.db.models.deletion.RESTRICT, to=settings.AUTH_USER_MODEL)),
+        ],
+        options={
+            'verbose_name': 'Orden de Servicio',
+            'verbose_name_plural': 'Ordenes de Servicio',
+            'db_table': 'EPMT_ORDEN_SERVICIO',
+        },
+    ),
+    migrations.CreateModel(
+        name='OrdenEtapa',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_ORDEN_ETAPA', primary_key=True, serialize=False)),
+            ('num_semanas_duracion', models.IntegerField(db_column='NUM_SEMANAS_DURACION', default=2)),
+            ('fecha_inicio', models.DateField(db_column='FEC_INICIO', null=True)),
+            ('fecha_fin', models.DateField(db_column='FEC_FIN', null=True)),
+            ('id_etapa', models.ForeignKey(db_column='ID_ETAPA', on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.etapa')),
+            ('id_orden', models.ForeignKey(db_column='ID_ORDEN', on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.ordenservicio')),
+        ],
+        options={
+            'verbose_name': 'Orden Etapa',
+            'verbose_name_plural': 'Ordenes Etapas',
+            'db_table': 'EPMT_ORDEN_ETAPA',
+        },
+    ),
+    migrations.AddField(
+        model_name='notificaciones',
+        name='id_orden',
+        field=models.ForeignKey(db_column='ID_ORDEN', null=True, on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.ordenservicio'),
+    ),
+    migrations.AddField(
+        model_name='entregable',
+        name='id_orden',
+        field=models.ForeignKey(db_column='ID_ORDEN', on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.ordenservicio'),
+    ),
+    migrations.CreateModel(
+        name='OrdenSprint',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_SPRINT', primary_key=True, serialize=False)),
+            ('num_semanas_duracion', models.IntegerField(blank=True, db_column='NUM_SEMANAS_DURACION', default=2, null=True)),
+            ('fecha_inicio', models.DateField(blank=True, db_column='FEC_INICIO', null=True)),
+            ('fecha_fin', models.DateField(blank=True, db_column='FEC_FIN', null=True)),
+            ('fecha_entrega_documentos', models.DateField(blank=True, db_column='FEC_ENTREGA_DOCUMENTOS', null=True)),
+            ('id_orden_etapa', models.ForeignKey(db_column='ID_ORDEN_ETAPA', on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.ordenetapa')),
+        ],
+        options={
+            'verbose_name': 'Orden Sprint',
+            'verbose_name_plural': 'Orden Sprints',
+            'db_table': 'EPMT_ORDEN_SPRINTS',
+        },
+    ),
+    migrations.CreateModel(
+        name='EntregableSprint',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_ENTREGABLE_SPRINT', primary_key=True, serialize=False)),
+            ('id_entregable', models.ForeignKey(db_column='ID_ENTREGABLE', on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.entregable')),
+            ('id_sprint', models.ForeignKey(db_column='ID_SPRINT', on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.ordensprint')),
+        ],
+        options={
+            'verbose_name': 'Entregable sprint',
+            'verbose_name_plural': 'Entregables sprints',
+            'db_table': 'EPMT_ENTREGABLE_SPRINT',
+        },
+    ),
+    migrations.CreateModel(
+        name='Proyecto',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_PROYECTO', primary_key=True, serialize=False)),
+            ('clave_proyecto', models.CharField(blank=True, db_column='CVE_PROYECTO', max_length=255)),
+            ('nombre_proyecto', models.CharField(db_column='NOM_PROYECTO', max_length=255)),
+            ('id_contrato', models.ForeignKey(db_column='ID_CONTRATO', null=True, on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.contrato')),
+        ],
+        options={
+            'verbose_name': 'Proyecto',
+            'verbose_name_plural': 'Proyectos',
+            'db_table': 'EPMT_PROYECTOS',
+        },
+    ),
+    migrations.AddField(
+        model_name='ordenservicio',
+        name='id_proyecto',
+        field=models.ForeignKey(db_column='ID_PROYECTO', on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.proyecto'),
+    ),
+    migrations.CreateModel(
+        name='Rol',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_ROL', primary_key=True, serialize=False)),
+            ('rol', models.CharField(blank=True, db_column='REF_ROL', max_length=255)),
+            ('rol_breve', models.CharField(blank=True, db_column='REF_ROL_BREVE', max_length=255)),
+            ('activo', models.IntegerField(db_column='IND_ACTIVO', default=1)),
+        ],
+        options={
+            'verbose_name': 'Rol',
+            'verbose_name_plural': 'Roles',
+            'db_table': 'EPMC_ROLES',
+            'constraints': [models.UniqueConstraint(fields=('rol',), name='EPMT_ROLES_ROL_UNIQUE')],
+        },
+    ),
+    migrations.AddField(
+        model_name='notificaciones',
+        name='id_rol',
+        field=models.ForeignKey(db_column='ID_ROL', null=True, on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.rol'),
+    ),
+    migrations.AddField(
+        model_name='usuario',
+        name='id_rol',
+        field=models.ForeignKey(db_column='ID_ROL', on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.rol'),
+    ),
+    migrations.CreateModel(
+        name='DetalleSprint',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_DETALLE_SPRINT', primary_key=True, serialize=False)),
+            ('fecha_inicio', models.DateField(db_column='FEC_INICIO', null=True)),
+            ('fecha_fin', models.DateField(db_column='FEC_FIN', null=True)),
+            ('num_semanas_duracion', models.IntegerField(db_column='NUM_SEMANAS_DURACION', default=2)),
+            ('id_orden_etapa', models.ForeignKey(db_column='ID_ORDEN_ETAPA', null=True, on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.ordenetapa')),
+            ('id_sprint', models.ForeignKey(db_column='ID_SPRINT', null=True, on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.ordensprint')),
+            ('id_tipo_sprint', models.ForeignKey(db_column='ID_TIPO_SPRINT', on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.tiposprint')),
+        ],
+        options={
+            'verbose_name': 'Detalle de Sprint',
+            'verbose_name_plural': 'Detalles de Sprint',
+            'db_table': 'EPMT_DETALLE_SPRINT',
+        },
+    ),
+    migrations.CreateModel(
+        name='UsuarioOrdenServicio',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_USUARIO_ORDEN', primary_key=True, serialize=False)),
+            ('id_orden', models.ForeignKey(db_column='ID_ORDEN', on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.ordenservicio')),
+            ('id_usuario', models.ForeignKey(db_column='ID_USUARIO', on_delete=django.db.models.deletion.RESTRICT, to=settings.AUTH_USER_MODEL)),
+        ],
+        options={
+            'verbose_name': 'Usuario Orden de Servicio',
+            'verbose_name_plural': 'Usuarios Ordenes de Servicio',
+            'db_table': 'EPMT_USUARIO_ORDEN_SERVICIO',
+        },
+    ),
+    migrations.CreateModel(
+        name='ClienteSLA',
+        fields=[
+            ('usuario_alta', models.CharField(blank=True, db_column='CVE_USUARIO_ALTA', max_length=255)),
+            ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO', null=True)),
+            ('usuario_modifica', models.CharField(blank=True, db_column='CVE_USUARIO_MODIFICA', max_length=255)),
+            ('fecha_modifica', models.DateTimeField(db_column='STP_MODIFICA_REGISTRO', null=True)),
+            ('usuario_baja', models.CharField(blank=True, db_column='CVE_USUARIO_BAJA', max_length=255)),
+            ('fecha_baja', models.DateTimeField(db_column='STP_BAJA_REGISTRO', null=True)),
+            ('id', models.AutoField(db_column='ID_CLIENTE_SLA', primary_key=True, serialize=False)),
+            ('sla_verde', models.IntegerField(db_column='NUM_SLA_VERDE', default=0)),
+            ('sla_amarillo', models.IntegerField(db_column='NUM_SLA_AMARILLO', default=0)),
+            ('sla_rojo', models.IntegerField(db_column='NUM_SLA_ROJO', default=0)),
+            ('id_cliente', models.ForeignKey(db_column='ID_CLIENTE', on_delete=django.db.models.deletion.RESTRICT, to='notificaciones.cliente')),
+        ],
+        options={
+            'verbose_name': 'Cliente SLA',
+            'verbose_name_plural': 'Cliente SLAs',
+            'db_table': 'EPMC_CLIENTE_SLA',
+            'constraints': [models.UniqueConstraint(fields=('id_cliente',), name='EPMC_CLIENTE_SLA_ID_UNIQUE')],
+        },
+    ),
+    migrations.AddConstraint(
+        model_name='cliente',
+        constraint=models.UniqueConstraint(fields=('rfc',), name='EPMX_BT_PK_RFC'),
+    ),
+    migrations.AlterUniqueTogether(
+        name='entregableflujo',
+        unique_together={('id_estatus_inicial', 'id_estatus_final', 'accion', 'id_infoblue')},
+    ),
+    migrations.AddConstraint(
+        model_name='bandejanotificacion',
+        constraint=models.UniqueConstraint(fields=('id_usuario', 'id_notificacion'), name='EPMT_BANDEJA_USUARIO_NOTIF_UNIQUE'),
+    ),
+    migrations.AddConstraint(
+        model_name='ordenetapa',
+        constraint=models.UniqueConstraint(fields=('id_orden', 'id_etapa'), name='EPMT_ORDEN_ETAPA_UNIQUE'),
+    ),
+    migrations.AddConstraint(
+        model_name='usuario',
+        constraint=models.UniqueConstraint(fields=('email',), name='EPMT_USUARIOS_EMAIL_KEY'),
+    ),
+    migrations.AddConstraint(
+        model_name='usuarioordenservicio',
+        constraint=models.UniqueConstraint(fields=('id_usuario', 'id_orden'), name='EPMT_USUARIO_ORDEN_UNIQUE'),
+    ),
+]
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=TABLAS_COMPARTIDAS),
+        migrations.SeparateDatabaseAndState(
+            # El job la creaba al vuelo en versiones anteriores; IF NOT EXISTS la conserva donde ya existe
+            database_operations=[
+                migrations.RunSQL(
+                    '''
+                    CREATE TABLE IF NOT EXISTS "EPMT_SLA_CONFIGURACION" (
+                        "CVE_JOB" VARCHAR(100) PRIMARY KEY,
+                        "REF_FIRMA" VARCHAR(32) NOT NULL,
+                        "STP_ACTUALIZA" TIMESTAMP
+                    )
+                    ''',
+                    reverse_sql='DROP TABLE IF EXISTS "EPMT_SLA_CONFIGURACION"',
+                ),
+            ],
+            state_operations=[
+                migrations.CreateModel(
+                    name='ConfiguracionSla',
+                    fields=[
+                        ('job', models.CharField(db_column='CVE_JOB', max_length=100, primary_key=True, serialize=False)),
+                        ('firma', models.CharField(db_column='REF_FIRMA', max_length=32)),
+                        ('fecha_actualiza', models.DateTimeField(db_column='STP_ACTUALIZA', null=True)),
+                    ],
+                    options={
+                        'verbose_name': 'Configuracion de SLA',
+                        'verbose_name_plural': 'Configuraciones de SLA',
+                        'db_table': 'EPMT_SLA_CONFIGURACION',
+                    },
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notificaciones', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionEntregaDocumentos',
+            fields=[
+                ('id', models.BigAutoField(db_column='ID_VERSION_ENTREGA', primary_key=True, serialize=False)),
+                ('fecha_entrega', models.DateField(db_column='FEC_ENTREGA_DOCUMENTOS')),
+                ('fecha_alta', models.DateTimeField(db_column='STP_ALTA_REGISTRO')),
+                ('id_entregable', models.ForeignKey(db_column='ID_ENTREGABLE', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to='notificaciones.entregable')),
+            ],
+            options={
+                'verbose_name': 'Version por Entrega de Documentos',
+                'verbose_name_plural': 'Versiones por Entrega de Documentos',
+                'db_table': 'EPMT_VERSION_ENTREGA_DOCUMENTOS',
+                'constraints': [models.UniqueConstraint(fields=('id_entregable', 'fecha_entrega'), name='EPMT_VERSION_ENTREGA_UNIQUE')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+from notificaciones.tasks.bandeja_task import DDL_BANDEJA, DDL_DISTRIBUCION
+
+
+class Migration(migrations.Migration):
+    """
+    Crea las tablas de la bandeja (si no existen) y el trigger que distribuye cada notificación insertada en la
+    misma transacción. Las notificaciones anteriores se distribuyen después con ``manage.py backfill_inbox``.
+    """
+
+    dependencies = [
+        ('notificaciones', '0002_version_entrega_documentos'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DDL_BANDEJA, reverse_sql=migrations.RunSQL.noop),
+        migrations.RunSQL(
+            DDL_DISTRIBUCION,
+            reverse_sql=[
+                'DROP TRIGGER IF EXISTS "EPMT_NOTIFICACIONES_BANDEJA" ON "EPMT_NOTIFICACIONES"',
+                'DROP FUNCTION IF EXISTS "EPMF_DISTRIBUYE_NOTIFICACIONES"()',
+            ],
+        ),
+    ]
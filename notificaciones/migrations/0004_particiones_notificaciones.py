@@ -0,0 +1,100 @@
+from datetime import datetime
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+from notificaciones.tasks.particiones_task import LLAVE_PRIMARIA, TABLA, siguiente_particion
+
+# STP_ALTA_REGISTRO pasa a ser la llave de partición: obligatoria y con default en la base
+SQL_ALTA_OBLIGATORIA = [
+    '''
+    UPDATE "EPMT_NOTIFICACIONES"
+    SET "STP_ALTA_REGISTRO" = COALESCE("STP_MODIFICA_REGISTRO", "STP_BAJA_REGISTRO", NOW())
+    WHERE "STP_ALTA_REGISTRO" IS NULL
+    ''',
+    'ALTER TABLE "EPMT_NOTIFICACIONES" ALTER COLUMN "STP_ALTA_REGISTRO" SET DEFAULT NOW()',
+    'ALTER TABLE "EPMT_NOTIFICACIONES" ALTER COLUMN "STP_ALTA_REGISTRO" SET NOT NULL',
+]
+
+# Tablas ya particionadas por partition_notifications antes de esta migración, que las creaba sin llave primaria
+SQL_LLAVE_PARTICIONADA = f'''
+    DO $$
+    BEGIN
+        IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('"{TABLA}"')) = 'p' AND NOT EXISTS (
+            SELECT 1 FROM pg_index WHERE indrelid = to_regclass('"{TABLA}"') AND indisprimary
+        ) THEN
+            ALTER TABLE "{TABLA}"
+            ADD CONSTRAINT "{LLAVE_PRIMARIA}" PRIMARY KEY ("ID_NOTIFICACION", "STP_ALTA_REGISTRO");
+        END IF;
+    END $$
+'''
+
+
+def registra_particiones_existentes(apps, schema_editor):
+    """
+    Registra las particiones creadas antes del registro. crea_particiones las nombra con su fecha de inicio
+    (EPMT_NOTIFICACIONES_PAAAAMMDD) y el fin es el del intervalo configurado.
+    """
+    ParticionNotificaciones = apps.get_model('notificaciones', 'ParticionNotificaciones')
+    prefijo = f'{TABLA}_P'
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s) AND c.relname LIKE %s
+        ''', [f'"{TABLA}"', f'{prefijo}%'])
+        nombres = [fila[0] for fila in cursor.fetchall()]
+
+    for nombre in nombres:
+        inicio = datetime.strptime(nombre[len(prefijo):], '%Y%m%d').date()
+        ParticionNotificaciones.objects.get_or_create(
+            nombre=nombre, defaults={'fecha_inicio': inicio, 'fecha_fin': siguiente_particion(inicio)}
+        )
+
+
+class Migration(migrations.Migration):
+    """
+    Prepara EPMT_NOTIFICACIONES para el particionado por STP_ALTA_REGISTRO y crea el registro de particiones del
+    que mantiene_particiones toma los límites.
+    """
+
+    dependencies = [
+        ('notificaciones', '0003_distribucion_bandeja'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(SQL_ALTA_OBLIGATORIA, reverse_sql=[
+                    'ALTER TABLE "EPMT_NOTIFICACIONES" ALTER COLUMN "STP_ALTA_REGISTRO" DROP NOT NULL',
+                    'ALTER TABLE "EPMT_NOTIFICACIONES" ALTER COLUMN "STP_ALTA_REGISTRO" DROP DEFAULT',
+                ]),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='notificaciones',
+                    name='fecha_alta',
+                    field=models.DateTimeField(
+                        db_column='STP_ALTA_REGISTRO', db_default=django.db.models.functions.datetime.Now()
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunSQL(SQL_LLAVE_PARTICIONADA, reverse_sql=migrations.RunSQL.noop),
+        migrations.CreateModel(
+            name='ParticionNotificaciones',
+            fields=[
+                ('nombre', models.CharField(db_column='NOM_PARTICION', max_length=63, primary_key=True, serialize=False)),
+                ('fecha_inicio', models.DateField(db_column='FEC_INICIO')),
+                ('fecha_fin', models.DateField(db_column='FEC_FIN')),
+            ],
+            options={
+                'verbose_name': 'Particion de Notificaciones',
+                'verbose_name_plural': 'Particiones de Notificaciones',
+                'db_table': 'EPMT_PARTICIONES_NOTIFICACIONES',
+            },
+        ),
+        migrations.RunPython(registra_particiones_existentes, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,7 @@ import os
 
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
 from django.db import models
+from django.db.models.functions import Now
 
 
 class UserManager(BaseUserManager):
@@ -561,6 +562,9 @@ class Notificaciones(AuditModel):
     texto = models.CharField(max_length=500, db_column='REF_TEXTO')
     template = models.CharField(max_length=50, db_column='REF_TEMPLATE')
     datos = models.JSONField(max_length=150, db_column='REF_DATOS')
+    # Llave de partición (tasks/particiones_task.py): obligatoria y con el default en la base para los INSERT que
+    # no la mandan
+    fecha_alta = models.DateTimeField(db_default=Now(), db_column='STP_ALTA_REGISTRO')
 
     @property
     def id_cliente(self):
@@ -577,6 +581,87 @@ class Notificaciones(AuditModel):
         return f"{self.id} - {self.titulo}"
 
 
+class BandejaNotificacion(AuditModel):
+    id = models.BigAutoField(primary_key=True, db_column='ID_BANDEJA')
+    id_notificacion = models.ForeignKey(Notificaciones, on_delete=models.DO_NOTHING, db_column='ID_NOTIFICACION')
+    id_usuario = models.ForeignKey(Usuario, on_delete=models.DO_NOTHING, db_column='ID_USUARIO')
+
+    def __str__(self):
+        return f"{self.id_usuario_id} - {self.id_notificacion_id}"
+
+    class Meta:
+        db_table = 'EPMT_BANDEJA_NOTIFICACIONES'
+        verbose_name = 'Bandeja de Notificaciones'
+        verbose_name_plural = 'Bandejas de Notificaciones'
+        constraints = [
+            models.UniqueConstraint(fields=['id_usuario', 'id_notificacion'], name='EPMT_BANDEJA_USUARIO_NOTIF_UNIQUE')
+        ]
+
+
+class ContadorNotificaciones(models.Model):
+    id_usuario = models.OneToOneField(Usuario, primary_key=True, on_delete=models.DO_NOTHING, db_column='ID_USUARIO')
+    visibles = models.IntegerField(default=0, db_column='NUM_VISIBLES')
+    fecha_actualiza = models.DateTimeField(null=True, db_column='STP_ACTUALIZA')
+
+    def __str__(self):
+        return f"{self.id_usuario_id} - {self.visibles}"
+
+    class Meta:
+        db_table = 'EPMT_CONTADOR_NOTIFICACIONES'
+        verbose_name = 'Contador de Notificaciones'
+        verbose_name_plural = 'Contadores de Notificaciones'
+
+
+class ConfiguracionSla(models.Model):
+    job = models.CharField(max_length=100, primary_key=True, db_column='CVE_JOB')
+    firma = models.CharField(max_length=32, db_column='REF_FIRMA')
+    fecha_actualiza = models.DateTimeField(null=True, db_column='STP_ACTUALIZA')
+
+    def __str__(self):
+        return f"{self.job} - {self.firma}"
+
+    class Meta:
+        db_table = 'EPMT_SLA_CONFIGURACION'
+        verbose_name = 'Configuracion de SLA'
+        verbose_name_plural = 'Configuraciones de SLA'
+
+
+class ParticionNotificaciones(models.Model):
+    nombre = models.CharField(max_length=63, primary_key=True, db_column='NOM_PARTICION')
+    fecha_inicio = models.DateField(db_column='FEC_INICIO')
+    fecha_fin = models.DateField(db_column='FEC_FIN')
+
+    def __str__(self):
+        return f"{self.nombre} - [{self.fecha_inicio}, {self.fecha_fin})"
+
+    class Meta:
+        db_table = 'EPMT_PARTICIONES_NOTIFICACIONES'
+        verbose_name = 'Particion de Notificaciones'
+        verbose_name_plural = 'Particiones de Notificaciones'
+
+
+class VersionEntregaDocumentos(models.Model):
+    id = models.BigAutoField(primary_key=True, db_column='ID_VERSION_ENTREGA')
+    id_entregable = models.ForeignKey(
+        Entregable, on_delete=models.DO_NOTHING, db_constraint=False, db_column='ID_ENTREGABLE'
+    )
+    fecha_entrega = models.DateField(db_column='FEC_ENTREGA_DOCUMENTOS')
+    fecha_alta = models.DateTimeField(db_column='STP_ALTA_REGISTRO')
+
+    def __str__(self):
+        return f"{self.id_entregable_id} - {self.fecha_entrega}"
+
+    class Meta:
+        db_table = 'EPMT_VERSION_ENTREGA_DOCUMENTOS'
+        verbose_name = 'Version por Entrega de Documentos'
+        verbose_name_plural = 'Versiones por Entrega de Documentos'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['id_entregable', 'fecha_entrega'], name='EPMT_VERSION_ENTREGA_UNIQUE'
+            )
+        ]
+
+
 class DiaInhabil(AuditModel):
     id = models.AutoField(primary_key=True, db_column='ID_DIA_INHABIL')
     fecha = models.DateField(null=False, db_column='FEC_DIA_INHABIL')
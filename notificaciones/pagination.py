@@ -0,0 +1,83 @@
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class NotificacionesCursorPagination(BasePagination):
+    """
+    Paginación por llave (keyset) sobre ``id`` descendente.
+
+    Se aplica siempre: sin parámetros el listado regresa la primera página de ``NOTIFICACIONES_PAGE_SIZE``, y
+    ``page_size`` se acota a ``NOTIFICACIONES_MAX_PAGE_SIZE``. ``cursor`` regresa los ids menores al dado y
+    ``since_id`` los mayores.
+
+    Con ``since_id`` sin ``cursor`` se leen en orden ascendente los inmediatos posteriores al dado, para que una
+    página no salte los intermedios; la página se entrega de mayor a menor y ``next_since_id`` es el siguiente
+    ``since_id`` a pedir.
+    """
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    since_query_param = 'since_id'
+
+    def __init__(self):
+        self.page_size = None
+        self.next_cursor = None
+        self.next_since_id = None
+
+    def ascendente(self, request) -> bool:
+        return (
+            self._entero(request, self.since_query_param) is not None
+            and self._entero(request, self.cursor_query_param) is None
+        )
+
+    def orden(self, request) -> str:
+        return 'id' if self.ascendente(request) else '-id'
+
+    def acota(self, queryset, request):
+        """
+        Aplica los límites de id, el orden y el LIMIT a cada consulta antes del UNION, para que cada
+        parte lea a lo más una página por índice en lugar de todo el buzón.
+        """
+        cursor = self._entero(request, self.cursor_query_param)
+        since_id = self._entero(request, self.since_query_param)
+
+        if cursor is not None:
+            queryset = queryset.filter(id__lt=cursor)
+        if since_id is not None:
+            queryset = queryset.filter(id__gt=since_id)
+        return queryset.order_by(self.orden(request))[:self._page_size(request) + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self._page_size(request)
+        notificaciones = list(queryset[:self.page_size + 1])
+        hay_mas = len(notificaciones) > self.page_size
+        notificaciones = notificaciones[:self.page_size]
+
+        if self.ascendente(request):
+            self.next_since_id = notificaciones[-1].id if hay_mas else None
+            notificaciones.reverse()
+        else:
+            self.next_cursor = notificaciones[-1].id if hay_mas else None
+        return notificaciones
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next_cursor': self.next_cursor,
+            'next_since_id': self.next_since_id,
+            'results': data,
+        })
+
+    def _page_size(self, request) -> int:
+        page_size = self._entero(request, self.page_size_query_param) or settings.NOTIFICACIONES_PAGE_SIZE
+        return max(1, min(page_size, settings.NOTIFICACIONES_MAX_PAGE_SIZE))
+
+    def _entero(self, request, param):
+        valor = request.query_params.get(param)
+        if valor in (None, ''):
+            return None
+
+        try:
+            return int(valor)
+        except ValueError:
+            raise ValidationError({param: 'Debe ser un número entero.'})
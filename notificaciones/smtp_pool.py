@@ -0,0 +1,199 @@
+import logging
+import queue
+import re
+import smtplib
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.message import sanitize_address
+
+from notificaciones.attachment_cache import AdjuntoEnDisco
+from notificaciones.metrics import SMTP_LATENCIA
+
+logger = logging.getLogger(__name__)
+
+
+class _Conexion:
+    def __init__(self):
+        self.backend = get_connection(fail_silently=False)
+        self.enviados = 0
+        self.ultimo_uso = time.monotonic()
+
+    def abre(self, max_inactividad: float):
+        # Una conexión que pasó demasiado tiempo sin usarse probablemente ya la cerró el servidor
+        if self.backend.connection is not None and time.monotonic() - self.ultimo_uso > max_inactividad:
+            self.cierra()
+
+        # El backend SMTP cierra al terminar send_messages() las conexiones que él mismo abrió,
+        # por eso se abre explícitamente antes de enviar
+        if self.backend.connection is None:
+            self.backend.open()
+            self.enviados = 0
+
+    def cierra(self):
+        try:
+            self.backend.close()
+        except Exception as e:
+            logger.warning('Error cerrando conexión SMTP: %s', e)
+        finally:
+            self.backend.connection = None
+            self.enviados = 0
+
+
+class SMTPConnectionPool:
+    """
+    Pool acotado de conexiones SMTP de larga duración compartido entre hilos.
+
+    Cada conexión se reutiliza hasta ``max_mensajes`` envíos, se reabre si el servidor la cerró y, entre
+    corridas, si estuvo más de ``max_inactividad`` segundos sin usarse.
+    """
+
+    def __init__(self, tamano: int = None, max_mensajes: int = None, max_inactividad: float = None):
+        self.tamano = tamano or getattr(settings, 'MAIL_CONCURRENCY', 4)
+        self.max_mensajes = max_mensajes or getattr(settings, 'MAIL_MAX_MESSAGES_PER_CONNECTION', 100)
+        self.max_inactividad = max_inactividad or getattr(settings, 'MAIL_CONNECTION_IDLE_SECONDS', 360)
+        self._libres = queue.LifoQueue()
+        self._todas = []
+        self._lock = threading.Lock()
+
+    def _toma(self) -> _Conexion:
+        try:
+            return self._libres.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._todas) < self.tamano:
+                conexion = _Conexion()
+                self._todas.append(conexion)
+                return conexion
+
+        return self._libres.get()
+
+    def send(self, mensaje) -> bool:
+        conexion = self._toma()
+        try:
+            for intento in (1, 2):
+                try:
+                    inicio = time.perf_counter()
+                    conexion.abre(self.max_inactividad)
+                    en_disco = [
+                        adjunto for adjunto in mensaje.attachments if isinstance(adjunto, AdjuntoEnDisco)
+                    ] if isinstance(mensaje, EmailMessage) else []
+                    if en_disco:
+                        enviados = _envia_por_partes(conexion.backend, mensaje, en_disco)
+                    else:
+                        enviados = conexion.backend.send_messages([mensaje])
+                    SMTP_LATENCIA.observe(time.perf_counter() - inicio)
+                    conexion.enviados += 1
+                    return bool(enviados)
+                except (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout) as e:
+                    conexion.cierra()
+                    if intento == 2:
+                        raise
+                    logger.warning('Conexión SMTP perdida, reconectando: %s', e)
+        finally:
+            conexion.ultimo_uso = time.monotonic()
+            if conexion.enviados >= self.max_mensajes:
+                conexion.cierra()
+            self._libres.put(conexion)
+
+    def send_many(self, mensajes) -> list:
+        """
+        Envía los mensajes en paralelo; regresa un bool por mensaje en el mismo orden.
+
+        Un elemento puede ser también una función que arma el mensaje: se llama en el hilo de entrega justo antes
+        de enviar, así que cada hilo tiene en memoria solo los adjuntos del correo que está enviando.
+        """
+        def enviar(mensaje):
+            try:
+                if callable(mensaje):
+                    mensaje = mensaje()
+                return self.send(mensaje)
+            except Exception as e:
+                logger.error('Error sending mail %s: %s', getattr(mensaje, 'subject', ''), e)
+                return False
+
+        if not mensajes:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(self.tamano, len(mensajes))) as executor:
+            return list(executor.map(enviar, mensajes))
+
+    def close(self):
+        with self._lock:
+            for conexion in self._todas:
+                conexion.cierra()
+
+
+def _envia_por_partes(backend, mensaje: EmailMessage, en_disco: list) -> bool:
+    """
+    Envía el mensaje como ``smtplib.SMTP.sendmail``, pero escribe el contenido de los ``AdjuntoEnDisco``
+    directo del archivo al socket, por bloques, en lugar de serializar el mensaje completo en memoria.
+    """
+    if not mensaje.recipients():
+        return False
+
+    encoding = mensaje.encoding or settings.DEFAULT_CHARSET
+    remitente = sanitize_address(mensaje.from_email, encoding)
+    destinatarios = [sanitize_address(destinatario, encoding) for destinatario in mensaje.recipients()]
+
+    for adjunto in en_disco:
+        adjunto.por_partes = True
+    try:
+        crudo = mensaje.message().as_bytes(linesep='\r\n')
+    finally:
+        for adjunto in en_disco:
+            adjunto.por_partes = False
+
+    # El pool entrega cada conexión a un solo hilo a la vez, así que aquí no se necesita el lock del backend
+    smtp = backend.connection
+    smtp.ehlo_or_helo_if_needed()
+    codigo, respuesta = smtp.mail(remitente)
+    if codigo != 250:
+        _reinicia(smtp)
+        raise smtplib.SMTPSenderRefused(codigo, respuesta, remitente)
+
+    rechazados = {}
+    for destinatario in destinatarios:
+        codigo, respuesta = smtp.rcpt(destinatario)
+        if codigo not in (250, 251):
+            rechazados[destinatario] = (codigo, respuesta)
+    if len(rechazados) == len(destinatarios):
+        _reinicia(smtp)
+        raise smtplib.SMTPRecipientsRefused(rechazados)
+
+    codigo, respuesta = smtp.docmd('data')
+    if codigo != 354:
+        raise smtplib.SMTPDataError(codigo, respuesta)
+
+    # Las marcas quedan en su propia línea; el base64 no tiene puntos, así que solo el texto se escapa
+    resto = crudo
+    for adjunto in en_disco:
+        antes, resto = resto.split(adjunto.marca.encode('ascii'), 1)
+        smtp.send(_escapa_puntos(antes))
+        for bloque in adjunto.lineas_base64():
+            smtp.send(bloque)
+    resto = _escapa_puntos(resto)
+    smtp.send(resto + (b'.\r\n' if resto.endswith(b'\r\n') else b'\r\n.\r\n'))
+
+    codigo, respuesta = smtp.getreply()
+    if codigo != 250:
+        raise smtplib.SMTPDataError(codigo, respuesta)
+    return True
+
+
+def _escapa_puntos(datos: bytes) -> bytes:
+    """Duplica el punto al inicio de línea (RFC 5321, 4.5.2), como ``smtplib.SMTP.data``"""
+    return re.sub(rb'(?m)^\.', b'..', datos)
+
+
+def _reinicia(smtp):
+    try:
+        smtp.rset()
+    except smtplib.SMTPServerDisconnected:
+        pass
@@ -0,0 +1,243 @@
+"""
+Stream de notificaciones por Server-Sent Events.
+
+Cada proceso ASGI mantiene una sola conexión a Postgres en LISTEN sobre el canal que llena el trigger de
+EPMT_NOTIFICACIONES (``manage.py install_notify_trigger``). La escucha arranca en el loop del servidor con el
+evento ``lifespan`` de ASGI (``con_listener`` en asgi.py), no con la primera petición. Por cada aviso se resuelven una sola vez los
+destinatarios conectados al proceso y las notificaciones se reparten en memoria a la cola de cada suscriptor,
+así que una conexión ociosa solo cuesta una corrutina y su cola.
+
+Lo que se inserte mientras la conexión LISTEN se reestablece no se envía; el cliente lo recupera con
+``GET /notificaciones/?since_id=<último id recibido>``.
+"""
+import asyncio
+import logging
+from collections import OrderedDict, defaultdict
+
+import psycopg2
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from notificaciones.db import parametros_conexion_dedicada
+from notificaciones.model_serializers import NotificacionesModelSerializer
+from notificaciones.models import Notificaciones, Usuario
+from notificaciones.tasks.bandeja_task import SQL_DESTINATARIOS
+
+logger = logging.getLogger(__name__)
+
+CANAL = 'epmt_notificaciones'
+RECONEXION_SEGUNDOS = 5
+MAX_RECORDADAS = 10000
+
+# Trigger por sentencia: un INSERT masivo (jobs de SLA) genera un solo aviso con el rango de ids insertados
+DDL_TRIGGER = [
+    '''
+    CREATE OR REPLACE FUNCTION "EPMF_AVISA_NOTIFICACIONES"() RETURNS trigger AS $$
+    DECLARE
+        rango TEXT;
+    BEGIN
+        SELECT MIN("ID_NOTIFICACION") || ',' || MAX("ID_NOTIFICACION") INTO rango FROM nuevas;
+        IF rango IS NOT NULL THEN
+            PERFORM pg_notify('epmt_notificaciones', rango);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    ''',
+    'DROP TRIGGER IF EXISTS "EPMT_NOTIFICACIONES_AVISO" ON "EPMT_NOTIFICACIONES"',
+    '''
+    CREATE TRIGGER "EPMT_NOTIFICACIONES_AVISO"
+    AFTER INSERT ON "EPMT_NOTIFICACIONES"
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION "EPMF_AVISA_NOTIFICACIONES"()
+    ''',
+]
+
+
+def crea_trigger_avisos():
+    with connection.cursor() as cursor:
+        for ddl in DDL_TRIGGER:
+            cursor.execute(ddl)
+
+
+class NotificacionesListener:
+    """LISTEN compartido por todos los streams del proceso"""
+
+    def __init__(self):
+        self._suscriptores = defaultdict(set)
+        self._enviadas = OrderedDict()
+        self._tarea = None
+
+    @property
+    def activo(self) -> bool:
+        return self._tarea is not None and not self._tarea.done()
+
+    def inicia(self):
+        """Crea la tarea de escucha en el loop en curso, que debe ser el del servidor ASGI"""
+        if not self.activo:
+            self._tarea = asyncio.get_running_loop().create_task(self._escucha())
+
+    async def detiene(self):
+        if self._tarea is None:
+            return
+        self._tarea.cancel()
+        try:
+            await self._tarea
+        except asyncio.CancelledError:
+            pass
+        self._tarea = None
+
+    def suscribe(self, usuario_id: int) -> asyncio.Queue:
+        cola = asyncio.Queue(maxsize=settings.NOTIFICACIONES_STREAM_QUEUE_SIZE)
+        self._suscriptores[usuario_id].add(cola)
+        return cola
+
+    def cancela(self, usuario_id: int, cola: asyncio.Queue):
+        colas = self._suscriptores.get(usuario_id)
+        if colas is not None:
+            colas.discard(cola)
+            if not colas:
+                del self._suscriptores[usuario_id]
+
+    async def _escucha(self):
+        while True:
+            try:
+                await self._escucha_conexion()
+            except Exception as e:
+                logger.error('Conexión LISTEN %s perdida: %s', CANAL, e)
+            await asyncio.sleep(RECONEXION_SEGUNDOS)
+
+    async def _escucha_conexion(self):
+        conexion = await sync_to_async(_conexion_listen, thread_sensitive=False)()
+        loop = asyncio.get_running_loop()
+        avisos = asyncio.Queue()
+
+        def lee():
+            try:
+                conexion.poll()
+            except Exception as e:
+                avisos.put_nowait(e)
+                return
+            while conexion.notifies:
+                avisos.put_nowait(conexion.notifies.pop(0).payload)
+
+        loop.add_reader(conexion.fileno(), lee)
+        try:
+            while True:
+                rangos = [await avisos.get()]
+                while not avisos.empty():
+                    rangos.append(avisos.get_nowait())
+
+                for rango in rangos:
+                    if isinstance(rango, Exception):
+                        raise rango
+
+                await self._reparte(rangos)
+        finally:
+            loop.remove_reader(conexion.fileno())
+            conexion.close()
+
+    async def _reparte(self, rangos):
+        if not self._suscriptores:
+            return
+
+        limites = [int(limite) for rango in rangos for limite in rango.split(',')]
+        eventos = await sync_to_async(_eventos)(min(limites) - 1, max(limites), list(self._suscriptores))
+
+        for notificacion_id, usuario_id, datos in eventos:
+            # Un rango puede incluir ids de otra transacción que ya se avisaron con su propio rango
+            if (notificacion_id, usuario_id) in self._enviadas:
+                continue
+            self._enviadas[(notificacion_id, usuario_id)] = True
+            if len(self._enviadas) > MAX_RECORDADAS:
+                self._enviadas.popitem(last=False)
+
+            for cola in self._suscriptores.get(usuario_id, ()):
+                try:
+                    cola.put_nowait(datos)
+                except asyncio.QueueFull:
+                    logger.warning('Cola del stream llena, notificación %s descartada para %s', notificacion_id, usuario_id)
+
+
+def _conexion_listen():
+    conexion = psycopg2.connect(**parametros_conexion_dedicada())
+    conexion.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    with conexion.cursor() as cursor:
+        cursor.execute(f'LISTEN {CANAL}')
+    return conexion
+
+
+def _eventos(desde: int, hasta: int, usuarios: list) -> list:
+    """(id de notificación, id de usuario, datos serializados) para los usuarios conectados"""
+    close_old_connections()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT d."ID_NOTIFICACION", d."ID_USUARIO" FROM ({SQL_DESTINATARIOS}) d WHERE d."ID_USUARIO" = ANY(%(usuarios)s)',
+            {'desde': desde, 'hasta': hasta, 'usuarios': usuarios}
+        )
+        destinos = cursor.fetchall()
+
+    if not destinos:
+        return []
+
+    notificaciones = {
+        notificacion.id: NotificacionesModelSerializer(notificacion).data
+        for notificacion in Notificaciones.objects.filter(id__in={destino[0] for destino in destinos})
+    }
+    return [
+        (notificacion_id, usuario_id, notificaciones[notificacion_id])
+        for notificacion_id, usuario_id in destinos
+        if notificacion_id in notificaciones
+    ]
+
+
+async def usuario_del_token(request):
+    """
+    Id del usuario y expiración (epoch) del JWT de acceso, o (None, None) si no es válido.
+
+    EventSource no permite encabezados, por lo que también se acepta ``?token=``.
+    """
+    encabezado = request.headers.get('Authorization', '')
+    token_crudo = encabezado[7:] if encabezado.startswith('Bearer ') else request.GET.get('token')
+    if not token_crudo:
+        return None, None
+
+    try:
+        token = AccessToken(token_crudo)
+    except TokenError:
+        return None, None
+
+    usuario_id = token.get(api_settings.USER_ID_CLAIM)
+    if usuario_id is None or not await Usuario.objects.filter(id=usuario_id, fecha_baja__isnull=True).aexists():
+        return None, None
+
+    return usuario_id, token['exp']
+
+
+listener = NotificacionesListener()
+
+
+def con_listener(aplicacion):
+    """
+    Envuelve la aplicación ASGI de Django, que no atiende ``lifespan``, para iniciar el LISTEN al arrancar
+    el servidor y detenerlo al apagarlo; las demás conexiones pasan sin cambios.
+    """
+    async def asgi(scope, receive, send):
+        if scope['type'] != 'lifespan':
+            return await aplicacion(scope, receive, send)
+
+        while True:
+            mensaje = await receive()
+            if mensaje['type'] == 'lifespan.startup':
+                listener.inicia()
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensaje['type'] == 'lifespan.shutdown':
+                await listener.detiene()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    return asgi
@@ -0,0 +1,211 @@
+import logging
+
+from django.db import connection
+from django_apscheduler import util
+
+from notificaciones.metrics import instrumenta_job
+
+logger = logging.getLogger(__name__)
+
+DDL_BANDEJA = [
+    '''
+    CREATE TABLE IF NOT EXISTS "EPMT_BANDEJA_NOTIFICACIONES" (
+        "ID_BANDEJA" BIGSERIAL PRIMARY KEY,
+        "ID_NOTIFICACION" INTEGER NOT NULL,
+        "ID_USUARIO" INTEGER NOT NULL REFERENCES "EPMT_USUARIOS" ("ID_USUARIO"),
+        "CVE_USUARIO_ALTA" VARCHAR(255),
+        "STP_ALTA_REGISTRO" TIMESTAMP,
+        "CVE_USUARIO_MODIFICA" VARCHAR(255),
+        "STP_MODIFICA_REGISTRO" TIMESTAMP,
+        "CVE_USUARIO_BAJA" VARCHAR(255),
+        "STP_BAJA_REGISTRO" TIMESTAMP,
+        CONSTRAINT "EPMT_BANDEJA_USUARIO_NOTIF_UNIQUE" UNIQUE ("ID_USUARIO", "ID_NOTIFICACION")
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS "EPMT_BANDEJA_NOTIFICACION_IDX"
+    ON "EPMT_BANDEJA_NOTIFICACIONES" ("ID_NOTIFICACION")
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS "EPMT_CONTADOR_NOTIFICACIONES" (
+        "ID_USUARIO" INTEGER PRIMARY KEY REFERENCES "EPMT_USUARIOS" ("ID_USUARIO"),
+        "NUM_VISIBLES" INTEGER NOT NULL DEFAULT 0,
+        "STP_ACTUALIZA" TIMESTAMP
+    )
+    ''',
+]
+
+# Destinatarios de las notificaciones de ``origen`` que cumplen ``filtro``, con las mismas reglas de
+# visibilidad que NotificacionesViewSet.get_queryset: directas, por rol para internos asignados a la orden y
+# por rol para externos del cliente de la orden
+SQL_DESTINATARIOS_DE = '''
+    SELECT n."ID_NOTIFICACION", n."ID_USUARIO"
+    FROM {origen} n
+    WHERE {filtro}
+        AND n."STP_BAJA_REGISTRO" IS NULL
+        AND n."ID_USUARIO" IS NOT NULL
+    UNION
+    SELECT n."ID_NOTIFICACION", u."ID_USUARIO"
+    FROM {origen} n
+    JOIN "EPMT_ORDEN_SERVICIO" o ON o."ID_ORDEN" = n."ID_ORDEN" AND o."STP_BAJA_REGISTRO" IS NULL
+    JOIN "EPMT_USUARIO_ORDEN_SERVICIO" uos ON uos."ID_ORDEN" = n."ID_ORDEN"
+    JOIN "EPMT_USUARIOS" u ON u."ID_USUARIO" = uos."ID_USUARIO"
+        AND u."ID_ROL" = n."ID_ROL"
+        AND u."IND_EXTERNO" = 0
+        AND u."STP_BAJA_REGISTRO" IS NULL
+    WHERE {filtro}
+        AND n."STP_BAJA_REGISTRO" IS NULL
+        AND n."ID_ROL" IS NOT NULL
+    UNION
+    SELECT n."ID_NOTIFICACION", u."ID_USUARIO"
+    FROM {origen} n
+    JOIN "EPMT_ORDEN_SERVICIO" o ON o."ID_ORDEN" = n."ID_ORDEN" AND o."STP_BAJA_REGISTRO" IS NULL
+    JOIN "EPMT_PROYECTOS" p ON p."ID_PROYECTO" = o."ID_PROYECTO"
+    JOIN "EPMT_CONTRATOS" c ON c."ID_CONTRATO" = p."ID_CONTRATO"
+    JOIN "EPMT_USUARIOS" u ON u."ID_CLIENTE" = c."ID_CLIENTE"
+        AND u."ID_ROL" = n."ID_ROL"
+        AND u."IND_EXTERNO" <> 0
+        AND u."STP_BAJA_REGISTRO" IS NULL
+    WHERE {filtro}
+        AND n."STP_BAJA_REGISTRO" IS NULL
+        AND n."ID_ROL" IS NOT NULL
+        AND EXISTS (SELECT 1 FROM "EPMT_USUARIO_ORDEN_SERVICIO" uos WHERE uos."ID_ORDEN" = n."ID_ORDEN")
+'''
+
+# Notificaciones con id en (desde, hasta]: backfill de la bandeja y avisos del stream
+SQL_DESTINATARIOS = SQL_DESTINATARIOS_DE.format(
+    origen='"EPMT_NOTIFICACIONES"',
+    filtro='n."ID_NOTIFICACION" > %(desde)s AND n."ID_NOTIFICACION" <= %(hasta)s',
+)
+
+# Inserta las entradas de bandeja de ``destinatarios`` e incrementa en la misma sentencia los contadores con las
+# entradas realmente insertadas; ``resultado`` es el destino del total dentro de una función plpgsql
+SQL_INSERTA_BANDEJA = '''
+    WITH nuevas_entradas AS (
+        INSERT INTO "EPMT_BANDEJA_NOTIFICACIONES" ("ID_NOTIFICACION", "ID_USUARIO", "CVE_USUARIO_ALTA", "STP_ALTA_REGISTRO")
+        SELECT destino."ID_NOTIFICACION", destino."ID_USUARIO", '{usuario}', NOW()
+        FROM ({destinatarios}) destino
+        ON CONFLICT ("ID_USUARIO", "ID_NOTIFICACION") DO NOTHING
+        RETURNING "ID_USUARIO"
+    ),
+    contadores AS (
+        INSERT INTO "EPMT_CONTADOR_NOTIFICACIONES" ("ID_USUARIO", "NUM_VISIBLES", "STP_ACTUALIZA")
+        SELECT "ID_USUARIO", COUNT(*), NOW()
+        FROM nuevas_entradas
+        GROUP BY "ID_USUARIO"
+        ON CONFLICT ("ID_USUARIO") DO UPDATE
+        SET "NUM_VISIBLES" = "EPMT_CONTADOR_NOTIFICACIONES"."NUM_VISIBLES" + EXCLUDED."NUM_VISIBLES",
+            "STP_ACTUALIZA" = EXCLUDED."STP_ACTUALIZA"
+    )
+    SELECT COUNT(*) {resultado} FROM nuevas_entradas
+'''
+
+SQL_DISTRIBUYE = SQL_INSERTA_BANDEJA.format(usuario='JOB_BANDEJA', destinatarios=SQL_DESTINATARIOS, resultado='')
+
+# Trigger por sentencia: cada INSERT en EPMT_NOTIFICACIONES crea las entradas de bandeja y suma a los contadores
+# en su misma transacción, así que la bandeja no depende del orden en que se confirman las transacciones
+DDL_DISTRIBUCION = [
+    '''
+    CREATE OR REPLACE FUNCTION "EPMF_DISTRIBUYE_NOTIFICACIONES"() RETURNS trigger AS $$
+    DECLARE
+        total INTEGER;
+    BEGIN
+    ''' + SQL_INSERTA_BANDEJA.format(
+        usuario='TRIGGER_BANDEJA',
+        destinatarios=SQL_DESTINATARIOS_DE.format(origen='nuevas', filtro='TRUE'),
+        resultado='INTO total',
+    ) + ''';
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    ''',
+    'DROP TRIGGER IF EXISTS "EPMT_NOTIFICACIONES_BANDEJA" ON "EPMT_NOTIFICACIONES"',
+    '''
+    CREATE TRIGGER "EPMT_NOTIFICACIONES_BANDEJA"
+    AFTER INSERT ON "EPMT_NOTIFICACIONES"
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION "EPMF_DISTRIBUYE_NOTIFICACIONES"()
+    ''',
+]
+
+SQL_DESCUENTA = '''
+    UPDATE "EPMT_CONTADOR_NOTIFICACIONES" c
+    SET "NUM_VISIBLES" = GREATEST(c."NUM_VISIBLES" - d.total, 0),
+        "STP_ACTUALIZA" = NOW()
+    FROM (
+        SELECT b."ID_USUARIO", COUNT(*) AS total
+        FROM "EPMT_BANDEJA_NOTIFICACIONES" b
+        WHERE b."ID_NOTIFICACION" = ANY(%s)
+            AND b."STP_BAJA_REGISTRO" IS NULL
+        GROUP BY b."ID_USUARIO"
+    ) d
+    WHERE c."ID_USUARIO" = d."ID_USUARIO"
+'''
+
+# Recalcula los contadores desde la bandeja; solo escribe los que se desviaron
+SQL_RECONCILIA = '''
+    INSERT INTO "EPMT_CONTADOR_NOTIFICACIONES" ("ID_USUARIO", "NUM_VISIBLES", "STP_ACTUALIZA")
+    SELECT u."ID_USUARIO", COUNT(n."ID_NOTIFICACION"), NOW()
+    FROM "EPMT_USUARIOS" u
+    LEFT JOIN "EPMT_BANDEJA_NOTIFICACIONES" b
+        ON b."ID_USUARIO" = u."ID_USUARIO" AND b."STP_BAJA_REGISTRO" IS NULL
+    LEFT JOIN "EPMT_NOTIFICACIONES" n
+        ON n."ID_NOTIFICACION" = b."ID_NOTIFICACION" AND n."STP_BAJA_REGISTRO" IS NULL
+    WHERE u."STP_BAJA_REGISTRO" IS NULL
+    GROUP BY u."ID_USUARIO"
+    -- Sin contador ni notificaciones visibles no hay nada que corregir: count ya responde 0
+    HAVING COUNT(n."ID_NOTIFICACION") > 0
+        OR EXISTS (SELECT 1 FROM "EPMT_CONTADOR_NOTIFICACIONES" c WHERE c."ID_USUARIO" = u."ID_USUARIO")
+    ON CONFLICT ("ID_USUARIO") DO UPDATE
+    SET "NUM_VISIBLES" = EXCLUDED."NUM_VISIBLES",
+        "STP_ACTUALIZA" = EXCLUDED."STP_ACTUALIZA"
+    WHERE "EPMT_CONTADOR_NOTIFICACIONES"."NUM_VISIBLES" IS DISTINCT FROM EXCLUDED."NUM_VISIBLES"
+'''
+
+
+def crea_tabla_bandeja():
+    with connection.cursor() as cursor:
+        for ddl in DDL_BANDEJA:
+            cursor.execute(ddl)
+
+
+def crea_trigger_bandeja():
+    with connection.cursor() as cursor:
+        for ddl in DDL_DISTRIBUCION:
+            cursor.execute(ddl)
+
+
+def distribuye_notificaciones(desde_id: int, hasta_id: int) -> int:
+    """
+    Crea las entradas de bandeja que falten de las notificaciones con id en (desde_id, hasta_id].
+
+    Las nuevas las distribuye el trigger al insertarlas; esto solo llena la bandeja con las anteriores a él.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_DISTRIBUYE, {'desde': desde_id, 'hasta': hasta_id})
+        return cursor.fetchone()[0]
+
+
+def descuenta_contadores(ids) -> int:
+    """Resta de los contadores de cada destinatario las notificaciones ``ids`` que se acaban de dar de baja"""
+    ids = list(ids)
+    if not ids:
+        return 0
+
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_DESCUENTA, [ids])
+        return cursor.rowcount
+
+
+def reconcilia_contadores() -> int:
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_RECONCILIA)
+        return cursor.rowcount
+
+
+@util.close_old_connections
+@instrumenta_job('reconcilia_contadores_bandeja')
+def reconcilia_contadores_bandeja(**kwargs):
+    corregidos = reconcilia_contadores()
+    if corregidos:
+        logger.warning('Contadores de notificaciones corregidos: %s', corregidos)
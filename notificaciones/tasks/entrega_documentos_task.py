@@ -1,62 +1,75 @@
 import logging
 from datetime import timedelta
 
-from django.db.models import Prefetch
+from django.db import connection, transaction
 from django.utils import timezone
 from django.utils.timezone import now
 from django_apscheduler import util
 
-from notificaciones.models import OrdenSprint, EntregableSprint, EntregableArchivo
+from notificaciones.metrics import instrumenta_job
+from notificaciones.models import EntregableSprint, EntregableArchivo
 
 logger = logging.getLogger(__name__)
 
+USUARIO_JOB = 'JOB_ENTREGA_DOCUMENTOS'
+
+# Solo regresa los entregables que no tenían marca: los que ya se versionaron para esa fecha de entrega se omiten,
+# aunque después se haya subido otra versión o la corrida anterior sea de otro día
+SQL_MARCA_VERSIONADOS = '''
+    INSERT INTO "EPMT_VERSION_ENTREGA_DOCUMENTOS" ("ID_ENTREGABLE", "FEC_ENTREGA_DOCUMENTOS", "STP_ALTA_REGISTRO")
+    SELECT UNNEST(%s::integer[]), %s, %s
+    ON CONFLICT ("ID_ENTREGABLE", "FEC_ENTREGA_DOCUMENTOS") DO NOTHING
+    RETURNING "ID_ENTREGABLE"
+'''
+
 
 @util.close_old_connections
+@instrumenta_job('actualiza_version_entregables')
 def actualiza_version_entregables(**kwargs):
-    fecha_ayer = timezone.now().date() - timedelta(days=1)
+    fecha_entrega = timezone.now().date() - timedelta(days=1)
 
-    orden_sprints = OrdenSprint.objects.filter(
-        fecha_baja__isnull=True,
-        fecha_entrega_documentos=fecha_ayer,
-    ).prefetch_related(
-        Prefetch(
-            'entregablesprint_set',
-            queryset=EntregableSprint.objects.filter(
-                fecha_baja__isnull=True,
-                id_entregable__id_estatus_id__lt=7,
-            ).select_related('id_entregable'))
-    )
+    # La marca y las versiones se guardan juntas: si la corrida falla no queda ningún entregable marcado sin versión
+    with transaction.atomic():
+        archivos = {archivo.id_entregable_id: archivo for archivo in archivos_actuales(fecha_entrega)}
+        with connection.cursor() as cursor:
+            cursor.execute(SQL_MARCA_VERSIONADOS, [list(archivos), fecha_entrega, now()])
+            por_versionar = sorted(row[0] for row in cursor.fetchall())
 
-    entregables = [
-        entregable.id_entregable
-        for sprint in orden_sprints
-        for entregable in sprint.entregablesprint_set.all()
-    ]
+        nuevas_versiones = [nueva_version(archivos[id_entregable]) for id_entregable in por_versionar]
+        EntregableArchivo.objects.bulk_create(nuevas_versiones)
 
-    # Procesar los archivos en lote
-    for entregable in entregables:
-        archivo_actual = EntregableArchivo.objects.filter(
-            id_entregable=entregable,
-            fecha_baja__isnull=True
-        ).order_by('-major_version', '-minor_version').first()
+    logger.info('Nuevas versiones creadas: %s', len(nuevas_versiones))
 
-        if not archivo_actual:
-            continue
 
-        crear_nueva_version(archivo_actual)
+def archivos_actuales(fecha_entrega):
+    """Último archivo vigente de cada entregable con entrega de documentos en ``fecha_entrega`` (DISTINCT ON)"""
+    entregables = EntregableSprint.objects.filter(
+        fecha_baja__isnull=True,
+        id_sprint__fecha_baja__isnull=True,
+        id_sprint__fecha_entrega_documentos=fecha_entrega,
+        id_entregable__id_estatus_id__lt=7,
+    ).values('id_entregable')
+
+    return (
+        EntregableArchivo.objects
+        .filter(id_entregable__in=entregables, fecha_baja__isnull=True)
+        .order_by('id_entregable', '-major_version', '-minor_version')
+        .distinct('id_entregable')
+    )
 
 
-def crear_nueva_version(archivo_actual):
-    """Crear nueva versión del archivo"""
+def nueva_version(archivo_actual):
+    """Nueva versión major (sin guardar) a partir del archivo actual"""
     campos_nueva_version = {
         k: v for k, v in archivo_actual.__dict__.items()
         if k not in ('_state', 'id', 'fecha_alta', 'usuario_alta', 'major_version', 'minor_version')
     }
 
-    return EntregableArchivo.objects.create(
+    return EntregableArchivo(
         **campos_nueva_version,
         fecha_alta=now(),
-        usuario_alta='JOB_ENTREGA_DOCUMENTOS',
+        usuario_alta=USUARIO_JOB,
         major_version=archivo_actual.major_version + 1,
         minor_version=0
     )
+
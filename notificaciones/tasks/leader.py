@@ -0,0 +1,133 @@
+"""
+Elección de líder del scheduler entre réplicas con un advisory lock de Postgres.
+
+Todas las réplicas arrancan su scheduler en pausa; solo la que obtiene ``pg_try_advisory_lock`` lo reanuda.
+El lock es de sesión y vive en una conexión dedicada: si el proceso líder muere o pierde la red, Postgres
+cierra la sesión (keepalives de unos segundos) y otra réplica lo obtiene en su siguiente intento.
+
+Al perder el liderazgo el scheduler se pausa, pero las tareas en curso siguen; por eso las tareas largas
+consultan ``es_lider()`` entre lotes y se detienen, y ``trabajos_en_curso`` permite esperar a que terminen.
+"""
+import logging
+import threading
+import time
+
+import psycopg2
+from django.conf import settings
+
+from notificaciones.db import parametros_conexion_dedicada
+
+logger = logging.getLogger(__name__)
+
+# Detección de conexiones muertas en ~10 s en ambos extremos, para que el lock se libere rápido
+KEEPALIVES = {
+    'keepalives': 1,
+    'keepalives_idle': 5,
+    'keepalives_interval': 2,
+    'keepalives_count': 3,
+    'connect_timeout': 5,
+}
+OPCIONES_SERVIDOR = '-c tcp_keepalives_idle=5 -c tcp_keepalives_interval=2 -c tcp_keepalives_count=3'
+
+_elector = None
+
+
+def es_lider() -> bool:
+    """Sin elección de líder (una sola réplica o tarea ejecutada a mano) el proceso siempre ejecuta las tareas"""
+    return _elector is None or _elector.es_lider
+
+
+class TrabajosEnCurso:
+    """
+    Ejecuciones de tareas en curso en este proceso; ``instrumenta_job`` registra cada una.
+
+    Se cuentan dentro de la tarea y no con los eventos del scheduler, que avisa del envío después de que la
+    tarea ya empezó a correr en el executor.
+    """
+
+    def __init__(self):
+        self._en_curso = 0
+        self._condicion = threading.Condition()
+
+    def __enter__(self):
+        with self._condicion:
+            self._en_curso += 1
+
+    def __exit__(self, *exc):
+        with self._condicion:
+            self._en_curso -= 1
+            self._condicion.notify_all()
+
+    def espera(self, timeout: float) -> bool:
+        """Espera a que no haya ejecuciones en curso; regresa False si se agotó ``timeout``"""
+        with self._condicion:
+            return self._condicion.wait_for(lambda: self._en_curso == 0, timeout)
+
+
+trabajos_en_curso = TrabajosEnCurso()
+
+
+class LeaderElector(threading.Thread):
+    def __init__(self, on_elected, on_demoted, lock_id: int = None, intervalo: float = None):
+        super().__init__(name='scheduler-leader', daemon=True)
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.lock_id = lock_id or settings.SCHEDULER_LEADER_LOCK_ID
+        self.intervalo = intervalo or settings.SCHEDULER_LEADER_INTERVAL
+        self.es_lider = False
+        self._conexion = None
+
+    def start(self):
+        global _elector
+        _elector = self
+        super().start()
+
+    def run(self):
+        # Hilo daemon: al terminar el proceso se cierra el socket y Postgres libera el lock de inmediato
+        while True:
+            try:
+                self._ciclo()
+            except Exception as e:
+                logger.error('Error en la elección de líder del scheduler: %s', e)
+                self._pierde_liderazgo()
+                self._cierra()
+            time.sleep(self.intervalo)
+
+    def _ciclo(self):
+        if self._conexion is None or self._conexion.closed:
+            self._conexion = _conecta()
+
+        with self._conexion.cursor() as cursor:
+            if self.es_lider:
+                # Health check: si la sesión murió el lock ya no es nuestro
+                cursor.execute('SELECT 1')
+                return
+
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [self.lock_id])
+            if cursor.fetchone()[0]:
+                self.es_lider = True
+                logger.info('Este proceso es el líder del scheduler')
+                self.on_elected()
+
+    def _pierde_liderazgo(self):
+        if self.es_lider:
+            self.es_lider = False
+            logger.warning('Este proceso dejó de ser el líder del scheduler')
+            self.on_demoted()
+
+    def _cierra(self):
+        if self._conexion is not None:
+            try:
+                self._conexion.close()
+            except Exception:
+                pass
+            self._conexion = None
+
+
+def _conecta():
+    parametros = {**parametros_conexion_dedicada(), **KEEPALIVES}
+    parametros['options'] = f"{parametros.get('options', '')} {OPCIONES_SERVIDOR}".strip()
+
+    conexion = psycopg2.connect(**parametros)
+    conexion.autocommit = True
+    return conexion
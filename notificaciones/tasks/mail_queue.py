@@ -0,0 +1,100 @@
+"""
+Cola de correos sobre EPMT_NOTIFICACIONES.
+
+Se reutilizan las columnas de auditoría para que varios procesos puedan enviar sin duplicar correos:
+
+* pendiente: ``STP_MODIFICA_REGISTRO IS NULL``
+* reclamada: ``CVE_USUARIO_MODIFICA = 'LEASE:<owner>'`` y ``STP_MODIFICA_REGISTRO`` = vencimiento del lease
+* enviada: ``CVE_USUARIO_MODIFICA = 'JOB_SEND_MAILS'`` y ``STP_MODIFICA_REGISTRO`` = fecha de envío
+
+Un lease vencido (el proceso que la reclamó murió) vuelve a estar disponible. Con ``MAIL_DIGEST`` las
+notificaciones que pueden ir en un resumen no se reclaman hasta que cumplen ``MAIL_DIGEST_WINDOW_MINUTES`` o
+hasta que otra del mismo destino y template la cumple.
+"""
+import os
+import socket
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils.timezone import now
+
+from notificaciones.models import Notificaciones
+from notificaciones.tasks.particiones_task import filtro_vigentes
+
+LEASE_PREFIX = 'LEASE:'
+USUARIO_ENVIADO = 'JOB_SEND_MAILS'
+
+
+def nuevo_owner() -> str:
+    return f'{LEASE_PREFIX}{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def pendientes():
+    return Notificaciones.objects.filter(
+        Q(fecha_modifica__isnull=True) |
+        Q(usuario_modifica__startswith=LEASE_PREFIX, fecha_modifica__lt=now()),
+        ventana_resumen(),
+        filtro_vigentes(),
+    )
+
+
+def ventana_resumen() -> Q:
+    """
+    Las notificaciones agrupables esperan la ventana para juntarse con las que lleguen después.
+
+    Cuando una notificación pendiente de un destino (el usuario, o el rol y la orden) ya cumplió la ventana, las
+    más recientes del mismo destino y template se reclaman con ella para ir en el mismo resumen.
+    """
+    if not settings.MAIL_DIGEST:
+        return Q()
+
+    limite = now() - timedelta(minutes=settings.MAIL_DIGEST_WINDOW_MINUTES)
+    vencida_del_destino = Notificaciones.objects.filter(
+        Q(id_usuario=OuterRef('id_usuario')) |
+        Q(id_usuario__isnull=True, id_rol=OuterRef('id_rol'), id_orden=OuterRef('id_orden'),
+          externo=OuterRef('externo')),
+        fecha_modifica__isnull=True,
+        fecha_alta__lte=limite,
+        template=OuterRef('template'),
+    )
+
+    return (
+        Q(template__in=settings.MAIL_DIGEST_EXCLUDE) |
+        Q(fecha_alta__lte=limite) |
+        Q(Exists(vencida_del_destino))
+    )
+
+
+def reclamar_lote(owner: str, limite: int = None, lease_segundos: int = None) -> list:
+    """Reclama hasta ``limite`` notificaciones con FOR UPDATE SKIP LOCKED y les asigna un lease"""
+    limite = limite or settings.MAIL_QUEUE_BATCH_SIZE
+    lease_segundos = lease_segundos or settings.MAIL_QUEUE_LEASE_SECONDS
+
+    with transaction.atomic():
+        ids = list(
+            pendientes()
+            .select_for_update(skip_locked=True)
+            .order_by('id')
+            .values_list('id', flat=True)[:limite]
+        )
+        if ids:
+            Notificaciones.objects.filter(id__in=ids).update(
+                usuario_modifica=owner,
+                fecha_modifica=now() + timedelta(seconds=lease_segundos),
+            )
+
+    return ids
+
+
+def completar(ids: list, owner: str) -> int:
+    """Marca como enviadas, en un solo UPDATE, las notificaciones cuyo lease sigue siendo de ``owner``"""
+    if not ids:
+        return 0
+
+    return Notificaciones.objects.filter(id__in=ids, usuario_modifica=owner).update(
+        usuario_modifica=USUARIO_ENVIADO,
+        fecha_modifica=now(),
+    )
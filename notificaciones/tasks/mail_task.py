@@ -1,30 +1,160 @@
 import logging
+import time
+from collections import defaultdict
+from functools import partial
 
-from django.template.loader import render_to_string
-from django.utils.timezone import now
+from django.conf import settings
 from django_apscheduler import util
 
-from notificaciones.models import Notificaciones, Usuario, UsuarioOrdenServicio, InfoBlue
-from notificaciones.utils import send_mail_html_attachments
+from notificaciones.mail_render import get_mail_renderer
+from notificaciones.metrics import MAILS, instrumenta_job
+from notificaciones.models import Notificaciones, UsuarioOrdenServicio, InfoBlue
+from notificaciones.tasks import mail_queue
+from notificaciones.tasks.leader import es_lider
+from notificaciones.utils import build_mail_html_attachments, send_mail_messages
 
 logger = logging.getLogger(__name__)
 
+TEMPLATE_RESUMEN = 'mail/resumen-notificaciones.html'
+
 
 @util.close_old_connections
+@instrumenta_job('send_mails')
 def send_mails(**kwargs):
-    mails = Notificaciones.objects.filter(fecha_modifica__isnull=True)
+    owner = mail_queue.nuevo_owner()
+    adjuntos_por_cliente = {}
+    enviados = fallidos = 0
+    tiempos = {'render': 0.0, 'entrega': 0.0}
+    inicio = time.monotonic()
+
+    # Se deja de reclamar lotes al perder el liderazgo; el nuevo líder continúa con los pendientes
+    while es_lider() and (ids := mail_queue.reclamar_lote(owner)):
+        mails = list(
+            Notificaciones.objects
+            .filter(id__in=ids)
+            .select_related('id_usuario', 'id_orden__id_proyecto__id_contrato__id_cliente')
+            .order_by('id')
+        )
+        resultados = __envia_lote(mails, adjuntos_por_cliente, tiempos)
+        enviados += sum(resultados)
+        fallidos += len(resultados) - sum(resultados)
+        # Se marcan todas las reclamadas, igual que antes se marcaban aunque el envío fallara
+        mail_queue.completar(ids, owner)
+
+    MAILS.labels('enviado').inc(enviados)
+    MAILS.labels('fallido').inc(fallidos)
+
+    duracion = time.monotonic() - inicio
+    if enviados or fallidos:
+        logger.info('Mails enviados: %s, fallidos: %s en %.2fs (%.1f/s); render %.2fs, entrega %.2fs',
+                    enviados, fallidos, duracion, (enviados + fallidos) / duracion if duracion else 0,
+                    tiempos['render'], tiempos['entrega'])
+
+
+def __envia_lote(mails, adjuntos_por_cliente, tiempos):
+    # Los correos se arman en este hilo (consultas y render) y solo la entrega SMTP va en paralelo
+    destinatarios_por_rol = __destinatarios_por_rol(mails)
+    por_enviar = []
 
     for mail in mails:
+        logger.debug('Sending mail %s', mail)
+        if mail.id_usuario_id:
+            destinatarios = [mail.id_usuario.email]
+        elif mail.id_rol_id:
+            destinatarios = destinatarios_por_rol.get((mail.id_orden_id, mail.id_rol_id, mail.externo), [])
+        else:
+            continue
+
+        if destinatarios:
+            por_enviar.append((mail, destinatarios))
+
+    por_enviar, resumenes = __agrupa_resumenes(por_enviar)
+
+    # Todo el lote se renderiza antes de empezar la entrega
+    inicio = time.monotonic()
+    cuerpos = get_mail_renderer().render_batch([mail for mail, _ in por_enviar])
+    tiempos['render'] += time.monotonic() - inicio
+
+    mensajes = []
+    for grupo, destinatarios in resumenes:
+        try:
+            inicio = time.monotonic()
+            cuerpo = __render_resumen(grupo)
+            tiempos['render'] += time.monotonic() - inicio
+
+            mensajes.append(partial(
+                build_mail_html_attachments,
+                to=destinatarios, subject=settings.MAIL_DIGEST_SUBJECT.format(total=len(grupo)), body_html=cuerpo,
+                image_names=__images_by_template(TEMPLATE_RESUMEN),
+            ))
+            MAILS.labels('agrupado').inc(len(grupo))
+        except Exception as e:
+            logger.error('Error sending digest mail %s', e)
+
+    # Los mensajes (con sus adjuntos en base64) se arman en el hilo de entrega, uno a la vez, en lugar de
+    # tener armado todo el lote; aquí solo se resuelve lo que necesita la base de datos
+    for mail, destinatarios in por_enviar:
+        if mail.id not in cuerpos:
+            continue
+
         try:
-            logger.debug('Sending mail %s', mail)
-            if mail.id_usuario:
-                __mail_usuario(mail)
-            elif mail.id_rol:
-                __mail_rol(mail)
+            mensajes.append(partial(
+                build_mail_html_attachments,
+                to=destinatarios, subject=mail.titulo, body_html=cuerpos[mail.id],
+                image_names=__images_by_template(mail.template),
+                attachments=__get_attachments(mail, adjuntos_por_cliente),
+            ))
         except Exception as e:
             logger.error('Error sending mail %s', e)
-        finally:
-            __mail_notificado(mail)
+
+    inicio = time.monotonic()
+    resultados = send_mail_messages(mensajes)
+    tiempos['entrega'] += time.monotonic() - inicio
+    return resultados
+
+
+def __agrupa_resumenes(por_enviar):
+    """
+    Separa los correos que van solos de los resúmenes por destinatario.
+
+    Cada correo del lote se agrupa por (destinatario, template), sin importar si la notificación era directa o
+    para su rol; un destinatario con al menos ``MAIL_DIGEST_MIN_ITEMS`` recibe un resumen y el resto de los
+    destinatarios de esas notificaciones las reciben solas. Las notificaciones agrupadas se marcan como
+    enviadas con el resto del lote en ``mail_queue.completar``.
+    """
+    if not settings.MAIL_DIGEST:
+        return por_enviar, []
+
+    grupos = defaultdict(list)
+    for mail, destinatarios in por_enviar:
+        if mail.template not in settings.MAIL_DIGEST_EXCLUDE:
+            for destinatario in dict.fromkeys(destinatarios):
+                grupos[(destinatario, mail.template)].append(mail)
+
+    resumenes = []
+    agrupados = set()
+    for (destinatario, _), mails in grupos.items():
+        if len(mails) >= settings.MAIL_DIGEST_MIN_ITEMS:
+            resumenes.append((mails, [destinatario]))
+            agrupados.update((mail.id, destinatario) for mail in mails)
+
+    individuales = []
+    for mail, destinatarios in por_enviar:
+        restantes = [destinatario for destinatario in destinatarios if (mail.id, destinatario) not in agrupados]
+        if restantes:
+            individuales.append((mail, restantes))
+
+    return individuales, resumenes
+
+
+def __render_resumen(mails):
+    return get_mail_renderer().render(TEMPLATE_RESUMEN, {
+        'titulo': f'Tienes {len(mails)} notificaciones nuevas',
+        'notificaciones': [
+            {**(mail.datos if isinstance(mail.datos, dict) else {}), 'titulo': mail.titulo, 'texto': mail.texto}
+            for mail in mails
+        ],
+    })
 
 
 def __images_by_template(template_name):
@@ -35,40 +165,35 @@ def __images_by_template(template_name):
     return image_template_map.get(template_name, ['logo-pm.png'])
 
 
-def __mail_notificado(mail: Notificaciones):
-    try:
-        Notificaciones.objects.filter(id=mail.id).update(usuario_modifica='JOB_SEND_MAILS', fecha_modifica=now())
-    except Exception as e:
-        logger.error('Error sending mail %s', e)
-
+def __destinatarios_por_rol(mails):
+    """
+    Correos de todo el lote agrupados por (orden, rol, externo), resueltos en una sola consulta.
 
-def __mail_usuario(mail: Notificaciones):
-    body = render_to_string(mail.template, mail.datos)
-    send_mail_html_attachments(to=[mail.id_usuario.email], subject=mail.titulo, body_html=body,
-                               image_names=__images_by_template(mail.template),
-                               attachments=__get_attachments(mail))
+    Cada correo aparece una sola vez por grupo aunque el usuario tenga más de una asignación a la orden,
+    igual que con el ``Usuario.objects.filter(id__in=...)`` por notificación de antes.
+    """
+    ordenes = {mail.id_orden_id for mail in mails if not mail.id_usuario_id and mail.id_rol_id}
+    destinatarios = defaultdict(dict)
 
+    if ordenes:
+        usuarios_orden = UsuarioOrdenServicio.objects.filter(id_orden__in=ordenes).values_list(
+            'id_orden', 'id_usuario__id_rol', 'id_usuario__is_externo', 'id_usuario__email'
+        ).order_by('id')
+        for id_orden, id_rol, externo, email in usuarios_orden:
+            # dict en lugar de set para conservar el orden de asignación
+            destinatarios[(id_orden, id_rol, externo)][email] = None
 
-def __mail_rol(mail: Notificaciones):
-    destinatarios = list(
-        Usuario.objects.filter(
-            id__in=UsuarioOrdenServicio.objects.filter(
-                id_orden=mail.id_orden,
-                id_usuario__id_rol_id__in=[mail.id_rol],
-                id_usuario__is_externo=mail.externo,
-            ).values_list('id_usuario', flat=True)
-        ).values_list('email', flat=True)
-    )
+    return {llave: list(correos) for llave, correos in destinatarios.items()}
 
-    if destinatarios.__len__() > 0:
-        body = render_to_string(mail.template, mail.datos)
-        send_mail_html_attachments(to=destinatarios, subject=mail.titulo, body_html=body,
-                                   image_names=__images_by_template(mail.template),
-                                   attachments=__get_attachments(mail))
 
-
-def __get_attachments(mail: Notificaciones):
+def __get_attachments(mail: Notificaciones, adjuntos_por_cliente: dict):
     if mail.template == 'mail/nueva-orden.html':
-        return [entregable.path.path for entregable in InfoBlue.get_entregables_iniciales(mail.id_cliente)]
-
-    return None
\ No newline at end of file
+        # La lista de entregables iniciales se consulta una vez por cliente en cada corrida
+        id_cliente = mail.id_cliente
+        if id_cliente not in adjuntos_por_cliente:
+            adjuntos_por_cliente[id_cliente] = [
+                entregable.path.path for entregable in InfoBlue.get_entregables_iniciales(id_cliente)
+            ]
+        return adjuntos_por_cliente[id_cliente]
+
+    return None
@@ -0,0 +1,210 @@
+"""
+EPMT_NOTIFICACIONES particionada por rango de STP_ALTA_REGISTRO (opcional, NOTIFICACIONES_PARTICIONADA).
+
+``manage.py partition_notifications`` convierte la tabla una sola vez. Después ``mantiene_particiones`` crea
+las particiones de los próximos días y elimina completas las que quedaron fuera de la retención, en lugar
+del DELETE fila por fila de ``__limpia_datos``. Los límites de cada partición se registran al crearla en
+EPMT_PARTICIONES_NOTIFICACIONES; las filas fuera de ellos caen en la partición DEFAULT y se siguen limpiando
+por filas.
+
+STP_ALTA_REGISTRO es obligatorio y tiene default NOW() desde la migración 0004, así que forma parte de la
+llave primaria de la tabla particionada.
+"""
+import logging
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django_apscheduler import util
+
+from notificaciones.indices import INDICES
+from notificaciones.metrics import instrumenta_job
+from notificaciones.models import ParticionNotificaciones
+from notificaciones.tasks.bandeja_task import crea_trigger_bandeja
+
+logger = logging.getLogger(__name__)
+
+TABLA = 'EPMT_NOTIFICACIONES'
+TABLA_ANTERIOR = 'EPMT_NOTIFICACIONES_ANTERIOR'
+PARTICION_DEFAULT = 'EPMT_NOTIFICACIONES_DEFAULT'
+# Otro nombre que el de la llave de la tabla original, que lo conserva al renombrarse
+LLAVE_PRIMARIA = 'EPMT_NOTIFICACIONES_PARTICION_PK'
+
+
+def filtro_vigentes() -> Q:
+    """
+    Condición sobre la llave de partición para que el planner descarte las particiones fuera de la retención.
+
+    Ninguna notificación visible o pendiente es más antigua que la retención (se dan de baja a los 5 días), así
+    que el filtro no cambia resultados; sin la tabla particionada no se agrega.
+    """
+    if not settings.NOTIFICACIONES_PARTICIONADA:
+        return Q()
+
+    return Q(fecha_alta__gte=timezone.now() - timedelta(days=settings.NOTIFICACIONES_RETENTION_DAYS))
+
+
+def esta_particionada(cursor) -> bool:
+    cursor.execute('SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [f'"{TABLA}"'])
+    fila = cursor.fetchone()
+    return fila is not None and fila[0] == 'p'
+
+
+def inicio_particion(dia: date) -> date:
+    if settings.NOTIFICACIONES_PARTITION_INTERVAL == 'week':
+        return dia - timedelta(days=dia.weekday())
+    return dia
+
+
+def siguiente_particion(inicio: date) -> date:
+    return inicio + timedelta(days=7 if settings.NOTIFICACIONES_PARTITION_INTERVAL == 'week' else 1)
+
+
+def crea_particiones(cursor, desde: date, hasta: date) -> list:
+    """Crea y registra las particiones que faltan para cubrir [desde, hasta]; regresa sus nombres"""
+    creadas = []
+    inicio = inicio_particion(desde)
+    while inicio <= hasta:
+        fin = siguiente_particion(inicio)
+        nombre = f'{TABLA}_P{inicio:%Y%m%d}'
+        cursor.execute('SELECT to_regclass(%s)', [f'"{nombre}"'])
+        if cursor.fetchone()[0] is None:
+            # La tabla y su registro en la misma transacción: una partición sin registro no se eliminaría nunca
+            with transaction.atomic():
+                cursor.execute(
+                    f'CREATE TABLE "{nombre}" PARTITION OF "{TABLA}" FOR VALUES FROM (%s) TO (%s)',
+                    [inicio.isoformat(), fin.isoformat()]
+                )
+                ParticionNotificaciones.objects.create(nombre=nombre, fecha_inicio=inicio, fecha_fin=fin)
+            creadas.append(nombre)
+        inicio = fin
+    return creadas
+
+
+def particiones_vencidas(limite: date) -> list:
+    """Particiones cuyo límite superior es anterior o igual a ``limite``"""
+    return list(
+        ParticionNotificaciones.objects.filter(fecha_fin__lte=limite).order_by('nombre').values_list('nombre', flat=True)
+    )
+
+
+def elimina_particion(cursor, nombre: str):
+    cursor.execute(f'''
+        DELETE FROM "EPMT_BANDEJA_NOTIFICACIONES"
+        WHERE "ID_NOTIFICACION" IN (SELECT "ID_NOTIFICACION" FROM "{nombre}")
+    ''')
+    cursor.execute(f'DROP TABLE IF EXISTS "{nombre}"')
+    ParticionNotificaciones.objects.filter(nombre=nombre).delete()
+
+
+@util.close_old_connections
+@instrumenta_job('mantiene_particiones')
+def mantiene_particiones(**kwargs):
+    hoy = timezone.now().date()
+
+    with connection.cursor() as cursor:
+        if not esta_particionada(cursor):
+            logger.warning('%s no está particionada, ejecute manage.py partition_notifications', TABLA)
+            return
+
+        creadas = crea_particiones(cursor, hoy, hoy + timedelta(days=settings.NOTIFICACIONES_PARTITIONS_AHEAD))
+
+        vencidas = particiones_vencidas(hoy - timedelta(days=settings.NOTIFICACIONES_RETENTION_DAYS))
+        for nombre in vencidas:
+            with transaction.atomic():
+                elimina_particion(cursor, nombre)
+
+    logger.info('Particiones creadas: %s, eliminadas: %s', creadas, vencidas)
+
+
+def convierte_tabla() -> dict:
+    """
+    Reemplaza EPMT_NOTIFICACIONES por una tabla particionada con las mismas columnas y datos, en una transacción.
+
+    La tabla original queda como EPMT_NOTIFICACIONES_ANTERIOR para poder regresar; los índices se vuelven a crear
+    con ``manage.py create_indexes``.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        if esta_particionada(cursor):
+            raise ValueError(f'{TABLA} ya está particionada')
+
+        cursor.execute('''
+            SELECT conname, conrelid::regclass::text
+            FROM pg_constraint
+            WHERE contype = 'f' AND confrelid = to_regclass(%s)
+        ''', [f'"{TABLA}"'])
+        referencias = cursor.fetchall()
+        if referencias:
+            raise ValueError(f'Hay llaves foráneas hacia {TABLA}: {referencias}')
+
+        cursor.execute(f'LOCK TABLE "{TABLA}" IN ACCESS EXCLUSIVE MODE')
+
+        cursor.execute('''
+            SELECT a.attidentity <> '', pg_get_serial_sequence(%s, 'ID_NOTIFICACION')
+            FROM pg_attribute a
+            WHERE a.attrelid = to_regclass(%s) AND a.attname = 'ID_NOTIFICACION'
+        ''', [f'"{TABLA}"', f'"{TABLA}"'])
+        es_identity, secuencia = cursor.fetchone()
+
+        cursor.execute('''
+            SELECT conname, pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE contype = 'f' AND conrelid = to_regclass(%s)
+        ''', [f'"{TABLA}"'])
+        llaves_foraneas = cursor.fetchall()
+
+        cursor.execute('''
+            SELECT 1 FROM pg_trigger WHERE tgrelid = to_regclass(%s) AND tgname = 'EPMT_NOTIFICACIONES_AVISO'
+        ''', [f'"{TABLA}"'])
+        tenia_trigger = cursor.fetchone() is not None
+
+        cursor.execute(f'ALTER TABLE "{TABLA}" RENAME TO "{TABLA_ANTERIOR}"')
+        # Los índices conservan su nombre al renombrar la tabla; se liberan para que create_indexes los cree de nuevo
+        for nombre, tabla, _ in INDICES:
+            if tabla == TABLA:
+                cursor.execute(f'ALTER INDEX IF EXISTS "{nombre}" RENAME TO "{nombre}_ANTERIOR"')
+
+        # La llave primaria de una tabla particionada debe incluir la llave de partición; las búsquedas por id
+        # usan su primera columna. El default NOW() de STP_ALTA_REGISTRO viene de la tabla original
+        cursor.execute(f'''
+            CREATE TABLE "{TABLA}" (
+                LIKE "{TABLA_ANTERIOR}" INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS,
+                CONSTRAINT "{LLAVE_PRIMARIA}" PRIMARY KEY ("ID_NOTIFICACION", "STP_ALTA_REGISTRO")
+            ) PARTITION BY RANGE ("STP_ALTA_REGISTRO")
+        ''')
+        cursor.execute(f'CREATE TABLE "{PARTICION_DEFAULT}" PARTITION OF "{TABLA}" DEFAULT')
+
+        cursor.execute(f'SELECT MIN("STP_ALTA_REGISTRO") FROM "{TABLA_ANTERIOR}"')
+        primera = cursor.fetchone()[0]
+        hoy = timezone.now().date()
+        primera = primera.date() if isinstance(primera, datetime) else (primera or hoy)
+        particiones = crea_particiones(cursor, primera, hoy + timedelta(days=settings.NOTIFICACIONES_PARTITIONS_AHEAD))
+
+        cursor.execute(
+            f'INSERT INTO "{TABLA}" {"OVERRIDING SYSTEM VALUE" if es_identity else ""} SELECT * FROM "{TABLA_ANTERIOR}"'
+        )
+        filas = cursor.rowcount
+
+        if es_identity:
+            cursor.execute(
+                f'SELECT setval(pg_get_serial_sequence(%s, \'ID_NOTIFICACION\'), '
+                f'(SELECT COALESCE(MAX("ID_NOTIFICACION"), 0) + 1 FROM "{TABLA_ANTERIOR}"), false)',
+                [f'"{TABLA}"']
+            )
+        elif secuencia:
+            # La secuencia serial sigue siendo la misma; pasa a pertenecer a la tabla nueva
+            cursor.execute(f'ALTER SEQUENCE {secuencia} OWNED BY "{TABLA}"."ID_NOTIFICACION"')
+
+        for nombre, definicion in llaves_foraneas:
+            cursor.execute(f'ALTER TABLE "{TABLA}" ADD CONSTRAINT "{nombre}" {definicion}')
+
+        # En la misma transacción, para que ningún INSERT posterior quede sin entradas de bandeja
+        crea_trigger_bandeja()
+
+    if tenia_trigger:
+        from notificaciones.stream import crea_trigger_avisos
+        crea_trigger_avisos()
+
+    return {'filas': filas, 'particiones': len(particiones), 'trigger': tenia_trigger}
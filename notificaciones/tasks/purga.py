@@ -0,0 +1,48 @@
+"""
+Procesamiento por rangos de llave primaria para las limpiezas de EPMT_NOTIFICACIONES.
+
+Cada rango es una transacción corta, así que los locks y el WAL de cada commit quedan acotados por
+``PURGE_CHUNK_SIZE`` sin importar el tamaño de la tabla. El rango inicial se calcula con el predicado: las
+filas ya procesadas dejan de cumplirlo, por lo que una corrida interrumpida continúa donde se quedó.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+
+from notificaciones.tasks.leader import es_lider
+
+logger = logging.getLogger(__name__)
+
+
+def por_rangos(nombre: str, queryset, procesa, tamano: int = None, pausa: float = None) -> int:
+    """Aplica ``procesa(queryset_del_rango)`` por rangos de id de ``queryset``; regresa el total de filas"""
+    tamano = tamano or settings.PURGE_CHUNK_SIZE
+    pausa = settings.PURGE_SLEEP_SECONDS if pausa is None else pausa
+
+    limites = queryset.aggregate(minimo=Min('id'), maximo=Max('id'))
+    if limites['minimo'] is None:
+        return 0
+
+    inicio = time.monotonic()
+    total = 0
+    desde = limites['minimo'] - 1
+
+    while desde < limites['maximo']:
+        if not es_lider():
+            logger.warning('%s: interrumpido al perder el liderazgo del scheduler', nombre)
+            break
+
+        hasta = min(desde + tamano, limites['maximo'])
+        with transaction.atomic():
+            total += procesa(queryset.filter(id__gt=desde, id__lte=hasta))
+        desde = hasta
+
+        if pausa and desde < limites['maximo']:
+            time.sleep(pausa)
+
+    duracion = time.monotonic() - inicio
+    logger.info('%s: %s filas en %.1fs (%.0f filas/s)', nombre, total, duracion, total / duracion if duracion else total)
+    return total
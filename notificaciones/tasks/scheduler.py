@@ -2,19 +2,24 @@ import logging
 import sys
 
 from apscheduler.schedulers.background import BackgroundScheduler
+from django.conf import settings
 from django.utils import timezone
 from django_apscheduler.jobstores import DjangoJobStore
 
 logger = logging.getLogger(__name__)
 
 
-def start():
-    scheduler = BackgroundScheduler(timezone=timezone.get_current_timezone())
+def start(paused=False):
+    # Las ejecuciones perdidas (scheduler en pausa o cambio de líder) corren una sola vez si no pasó el margen
+    scheduler = BackgroundScheduler(timezone=timezone.get_current_timezone(), job_defaults={
+        'coalesce': True,
+        'misfire_grace_time': settings.SCHEDULER_MISFIRE_GRACE_TIME,
+    })
     scheduler.add_jobstore(DjangoJobStore(), "default")
 
     try:
-        # Inicio del scheduler
-        scheduler.start()
+        # Inicio del scheduler; en pausa no ejecuta tareas hasta que se llame resume()
+        scheduler.start(paused=paused)
     except Exception as e:
         logger.error(e)
         sys.exit(1)
@@ -2,13 +2,19 @@ import logging
 from datetime import timedelta
 
 from django.conf import settings
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
 from django_apscheduler.models import DjangoJobExecution
 
-from notificaciones.models import Notificaciones
+from notificaciones.metrics import instrumenta_job
+from notificaciones.models import Notificaciones, BandejaNotificacion, ParticionNotificaciones
 from notificaciones.tasks import scheduler
+from notificaciones.tasks.bandeja_task import descuenta_contadores, reconcilia_contadores_bandeja
 from notificaciones.tasks.entrega_documentos_task import actualiza_version_entregables
+from notificaciones.tasks.leader import LeaderElector, trabajos_en_curso
 from notificaciones.tasks.mail_task import send_mails
+from notificaciones.tasks.particiones_task import mantiene_particiones
+from notificaciones.tasks.purga import por_rangos
 from django_apscheduler import util
 from notificaciones.tasks.sla_task import actualiza_entregables_sla, actualiza_sla_atencion_clientes
 
@@ -17,7 +23,8 @@ logger = logging.getLogger(__name__)
 
 def initialize_scheduler():
     if getattr(settings, 'SCHEDULER_DEFAULT', False):
-        scheduler_instance = scheduler.start()
+        eleccion_lider = getattr(settings, 'SCHEDULER_LEADER_ELECTION', False)
+        scheduler_instance = scheduler.start(paused=eleccion_lider)
 
         # Programar tareas
         try:
@@ -29,10 +36,27 @@ def initialize_scheduler():
 
             scheduler_instance.add_job(__limpia_datos, 'cron', day_of_week='fri', hour='6', minute='0', id='limpia_datos', replace_existing=True)
             scheduler_instance.add_job(__baja_de_notificaciones, 'cron', minute='0', hour='1', id='notificaciones_cleanup', replace_existing=True)
+
+            scheduler_instance.add_job(reconcilia_contadores_bandeja, 'cron', minute='30', id='reconcilia_contadores_bandeja', replace_existing=True)
+
+            if getattr(settings, 'NOTIFICACIONES_PARTICIONADA', False):
+                scheduler_instance.add_job(mantiene_particiones, 'cron', minute='30', hour='0', id='mantiene_particiones', replace_existing=True)
         except Exception as e:
-            logger.error(f"Error al programar las tareas: {str(e)}")
+            logger.error('Error al programar las tareas: %s', e)
             raise
 
+        if eleccion_lider:
+            # Solo la réplica que tenga el advisory lock ejecuta las tareas
+            def al_perder_liderazgo():
+                # Las tareas en curso se detienen en su siguiente lote (es_lider); no se vuelve a competir
+                # por el lock hasta que terminen
+                scheduler_instance.pause()
+                if not trabajos_en_curso.espera(settings.SCHEDULER_DEMOTION_TIMEOUT):
+                    logger.warning('Siguen tareas en curso %ss después de perder el liderazgo',
+                                   settings.SCHEDULER_DEMOTION_TIMEOUT)
+
+            LeaderElector(on_elected=scheduler_instance.resume, on_demoted=al_perder_liderazgo).start()
+
         return scheduler_instance
     else:
         logger.warning("SCHEDULER_DEFAULT está desactivado en la configuración")
@@ -40,26 +64,60 @@ def initialize_scheduler():
 
 
 @util.close_old_connections
+@instrumenta_job('limpia_datos')
 def __limpia_datos():
     try:
         DjangoJobExecution.objects.delete_old_job_executions(86400)
-        Notificaciones.objects.filter(
-            fecha_baja__isnull=False,
-            fecha_baja__lte=(timezone.now() - timedelta(days=7)),
-        ).delete()
+        por_rangos('Notificaciones eliminadas', notificaciones_por_eliminar(), __elimina_lote)
     except Exception as e:
         logger.error(e)
 
 
 @util.close_old_connections
+@instrumenta_job('notificaciones_cleanup')
 def __baja_de_notificaciones():
     try:
-        Notificaciones.objects.filter(
-            fecha_alta__lte=(timezone.now() - timedelta(days=5)),
-            fecha_baja__isnull=True
-        ).update(
-            fecha_baja=timezone.now(),
-            usuario_baja='JOB_NOTIFICACIONES_CLEANUP',
-        )
+        por_rangos('Notificaciones dadas de baja', notificaciones_por_dar_de_baja(), __baja_lote)
     except Exception as e:
-        logger.error(e)
\ No newline at end of file
+        logger.error(e)
+
+
+def notificaciones_por_eliminar():
+    notificaciones = Notificaciones.objects.filter(
+        fecha_baja__isnull=False,
+        fecha_baja__lte=(timezone.now() - timedelta(days=7)),
+    )
+    if getattr(settings, 'NOTIFICACIONES_PARTICIONADA', False):
+        # mantiene_particiones elimina particiones completas; por filas solo quedan las de la partición DEFAULT
+        notificaciones = notificaciones.exclude(Exists(ParticionNotificaciones.objects.filter(
+            fecha_inicio__lte=OuterRef('fecha_alta'), fecha_fin__gt=OuterRef('fecha_alta')
+        )))
+    return notificaciones
+
+
+def notificaciones_por_dar_de_baja():
+    return Notificaciones.objects.filter(
+        fecha_alta__lte=(timezone.now() - timedelta(days=5)),
+        fecha_baja__isnull=True
+    )
+
+
+def __elimina_lote(notificaciones):
+    # La bandeja no tiene llave foránea hacia las notificaciones; sus entradas se eliminan con ellas
+    BandejaNotificacion.objects.filter(id_notificacion__in=notificaciones.values('id')).delete()
+
+    return notificaciones.delete()[0]
+
+
+def __baja_lote(notificaciones):
+    # SKIP LOCKED: las filas que otra transacción tiene tomadas se alcanzan en la siguiente corrida
+    ids = list(notificaciones.select_for_update(skip_locked=True).values_list('id', flat=True))
+
+    total = Notificaciones.objects.filter(id__in=ids).update(
+        fecha_baja=timezone.now(),
+        usuario_baja='JOB_NOTIFICACIONES_CLEANUP',
+    )
+
+    descuenta_contadores(ids)
+
+    return total
\ No newline at end of file
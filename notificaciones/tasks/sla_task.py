@@ -1,24 +1,93 @@
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
+from django.conf import settings
 from django.db import connection
 from django.utils.timezone import now
 from django_apscheduler import util
 import json
 
+from notificaciones.business_calendar import BusinessCalendar
+from notificaciones.log_sampling import LogMuestreado
+from notificaciones.metrics import instrumenta_job
+from notificaciones.tasks.leader import es_lider
+
 logger = logging.getLogger(__name__)
 
+# Usuario, SLA del cliente (o el de ID_CLIENTE_SLA = 1), estatus y último archivo
+# se resuelven en la misma consulta en lugar de consultarse por entregable
+SQL_ENTREGABLES_CLIENTES = '''
+    WITH usuario_cliente AS (
+        SELECT DISTINCT ON ("ID_CLIENTE") "ID_CLIENTE", "ID_USUARIO", "ID_ROL"
+        FROM "EPMT_USUARIOS"
+        WHERE "ID_CLIENTE" IS NOT NULL AND "IND_ACTIVO" = 1 AND "STP_BAJA_REGISTRO" IS NULL
+        ORDER BY "ID_CLIENTE", "ID_USUARIO"
+    ), sla_cliente AS (
+        SELECT DISTINCT ON ("ID_CLIENTE") "ID_CLIENTE", "NUM_SLA_VERDE", "NUM_SLA_AMARILLO", "NUM_SLA_ROJO"
+        FROM "EPMC_CLIENTE_SLA"
+        ORDER BY "ID_CLIENTE", "ID_CLIENTE_SLA"
+    )
+    SELECT
+        e."ID_ENTREGABLE",
+        e."NOM_ENTREGABLE",
+        e."FEC_INICIO",
+        c."ID_CLIENTE",
+        o."ID_ORDEN",
+        o."REF_NOMBRE" AS "NOM_ORDEN",
+        est."NOM_ESTATUS",
+        uc."ID_USUARIO",
+        uc."ID_ROL",
+        COALESCE(sc."NUM_SLA_VERDE", sd."NUM_SLA_VERDE"),
+        COALESCE(sc."NUM_SLA_AMARILLO", sd."NUM_SLA_AMARILLO"),
+        COALESCE(sc."NUM_SLA_ROJO", sd."NUM_SLA_ROJO"),
+        a."ID_ARCHIVO",
+        a."REF_SLA_CLIENTE"
+    FROM "EPMT_ENTREGABLES" e
+    JOIN "EPMT_ORDEN_SERVICIO" o ON e."ID_ORDEN" = o."ID_ORDEN"
+    JOIN "EPMT_PROYECTOS" p ON o."ID_PROYECTO" = p."ID_PROYECTO"
+    JOIN "EPMT_CONTRATOS" c ON p."ID_CONTRATO" = c."ID_CONTRATO"
+    LEFT JOIN "EPMC_ESTATUS_ENTREGABLE" est ON e."ID_ESTATUS" = est."ID_ESTATUS"
+    LEFT JOIN usuario_cliente uc ON uc."ID_CLIENTE" = c."ID_CLIENTE"
+    LEFT JOIN sla_cliente sc ON sc."ID_CLIENTE" = c."ID_CLIENTE"
+    LEFT JOIN "EPMC_CLIENTE_SLA" sd ON sd."ID_CLIENTE_SLA" = 1
+    LEFT JOIN LATERAL (
+        SELECT ea."ID_ARCHIVO", ea."REF_SLA_CLIENTE"
+        FROM "EPMT_ENTREGABLE_ARCHIVO" ea
+        WHERE ea."ID_ENTREGABLE" = e."ID_ENTREGABLE"
+        ORDER BY ea."CVE_MAJOR_VERSION" DESC, ea."STP_ALTA_REGISTRO" DESC
+        LIMIT 1
+    ) a ON TRUE
+    WHERE e."ID_ESTATUS" = 3 AND e."STP_BAJA_REGISTRO" IS NULL
+'''
+
+# Huella de lo que decide la fecha de cambio de color sin archivo: días inhábiles y umbrales por cliente
+SQL_FIRMA_CLIENTES = '''
+    SELECT md5(
+        COALESCE((
+            SELECT string_agg("FEC_INHABIL"::text, ',' ORDER BY "FEC_INHABIL")
+            FROM "EPMC_DIAS_INHABILES"
+            WHERE "STP_BAJA_REGISTRO" IS NULL
+        ), '')
+        || '|' ||
+        COALESCE((
+            SELECT string_agg(
+                concat_ws(':', "ID_CLIENTE_SLA", "ID_CLIENTE", "NUM_SLA_VERDE", "NUM_SLA_AMARILLO", "NUM_SLA_ROJO"),
+                ',' ORDER BY "ID_CLIENTE_SLA"
+            )
+            FROM "EPMC_CLIENTE_SLA"
+        ), '')
+    )
+'''
+
+
 @util.close_old_connections
+@instrumenta_job('actualiza_sla')
 def actualiza_entregables_sla(**kwargs):
-    logger.info("Iniciando actualización de SLA...")
+    incremental = kwargs.get('incremental', getattr(settings, 'SLA_INCREMENTAL', False))
+    logger.info('Iniciando actualización de SLA%s...', ' (incremental)' if incremental else '')
 
     with connection.cursor() as cursor:
-        cursor.execute('''
-            SELECT "FEC_INHABIL"
-            FROM "EPMC_DIAS_INHABILES"
-            WHERE "STP_BAJA_REGISTRO" IS NULL
-        ''')
-        dias_inhabiles = set(row[0] for row in cursor.fetchall())
-        logger.info(f" Días inhabilitados cargados: {len(dias_inhabiles)}")
+        calendario = BusinessCalendar.from_db(cursor)
+        logger.info(' Días inhabilitados cargados: %s', len(calendario.dias_inhabiles))
 
         cursor.execute('''
             SELECT 
@@ -26,6 +95,8 @@ def actualiza_entregables_sla(**kwargs):
                 e."FEC_INICIO", 
                 e."ID_INFOBLUE", 
                 e."NOM_ENTREGABLE", 
+                e."ID_ESTATUS",
+                e."REF_COLOR_SLA",
                 u."ID_USUARIO", 
                 u."ID_ROL", 
                 u."REF_EMAIL",
@@ -42,281 +113,281 @@ def actualiza_entregables_sla(**kwargs):
         ''')
 
         entregables = cursor.fetchall()
-        logger.info(f" Entregables a procesar: {len(entregables)}")
+        logger.info(' Entregables a procesar: %s', len(entregables))
 
-        entregables_actualizados = []
+        # Catálogos cargados una sola vez para todo el lote
+        slas = _slas_infoblue(cursor, {entregable[2] for entregable in entregables if entregable[2] is not None})
+        nombres_estatus = _nombres_estatus(cursor)
+
+        hoy = datetime.now().date()
+        fecha_proceso = now()
+        colores = []
+        notificaciones = []
+        dias_por_entregable = calendario.business_days_since((entregable[1] for entregable in entregables), hoy)
+        muestreo = LogMuestreado(logger)
 
         for (
-            id_entregable, fec_inicio, id_infoblue, nombre_entregable,
+            id_entregable, fec_inicio, id_infoblue, nombre_entregable, id_estatus, color_actual,
             id_usuario, id_rol, email_responsable,
             id_orden, nombre_orden
-        ) in entregables:
+        ), dias_transcurridos in zip(entregables, dias_por_entregable):
 
             if fec_inicio is None:
-                color = None
-            else:
-                hoy = datetime.now().date()
-                dias_transcurridos = 0
-                dia_actual = fec_inicio
-
-                while dia_actual <= hoy:
-                    if dia_actual.weekday() < 5 and dia_actual not in dias_inhabiles:
-                        dias_transcurridos += 1
-                    dia_actual += timedelta(days=1)
-
-                logger.debug(f" Entregable {id_entregable} - Días hábiles transcurridos: {dias_transcurridos}")
-
-                cursor.execute('''
-                    SELECT "NUM_SLA_VERDE", "NUM_SLA_AMARILLO", "NUM_SLA_ROJO"
-                    FROM "EPMC_INFOBLUE"
-                    WHERE "ID_INFOBLUE" = %s
-                ''', [id_infoblue])
-                sla = cursor.fetchone()
-
-                if sla:
-                    sla_verde, sla_amarillo, sla_rojo = sla
-
-                    if dias_transcurridos <= sla_verde:
-                        color = 'VERDE'
-                    elif dias_transcurridos <= sla_amarillo:
-                        color = 'AMARILLO'
-                    elif dias_transcurridos >= sla_rojo:
-                        color = 'ROJO'
-                    else:
-                        color = None
-                else:
-                    logger.warning(f" SLA no encontrado para ID_INFOBLUE {id_infoblue}")
-                    color = None
-
-            if color:
-                cursor.execute('''
-                    UPDATE "EPMT_ENTREGABLES"
-                    SET "REF_COLOR_SLA" = %s,
-                        "STP_MODIFICA_REGISTRO" = %s,
-                        "CVE_USUARIO_MODIFICA" = %s
-                    WHERE "ID_ENTREGABLE" = %s
-                ''', [color, now(), "JOB_SLA", id_entregable])
-                entregables_actualizados.append(id_entregable)
-                logger.info(f" Entregable {id_entregable} actualizado a SLA: {color}")
-
-                if color != "VERDE":
-                    cursor.execute('''
-                        SELECT est."NOM_ESTATUS"
-                        FROM "EPMT_ENTREGABLES" ent
-                        JOIN "EPMC_ESTATUS_ENTREGABLE" est ON ent."ID_ESTATUS" = est."ID_ESTATUS"
-                        WHERE ent."ID_ENTREGABLE" = %s
-                    ''', [id_entregable])
-                    resultado = cursor.fetchone()
-                    nombre_estatus = resultado[0] if resultado else "SIN ESTATUS"
-
-                    titulo = f"Un entregable llegó al estado: {nombre_estatus.upper()}"
-                    texto = f"Nombre del entregable: {nombre_entregable}"
-                    template = "mail/actualiza-entregables-sla.html"
-                    datos_json = json.dumps({
+                continue
+
+            logger.debug(' Entregable %s - Días hábiles transcurridos: %s', id_entregable, dias_transcurridos)
+
+            sla = slas.get(id_infoblue)
+            if not sla:
+                muestreo.warning('SLA no encontrado', ' SLA no encontrado para ID_INFOBLUE %s', id_infoblue)
+                continue
+
+            color = _color_sla(dias_transcurridos, *sla)
+            if not color:
+                continue
+
+            # En modo incremental el color guardado es el de la última corrida: si no cambió,
+            # no hay nada que escribir ni que notificar
+            if incremental and color == color_actual:
+                continue
+
+            colores.append((id_entregable, color))
+
+            if color != "VERDE":
+                nombre_estatus = nombres_estatus.get(id_estatus, "SIN ESTATUS")
+                titulo = f"Un entregable llegó al estado: {nombre_estatus.upper()}"
+                notificaciones.append((
+                    id_usuario,
+                    id_rol,
+                    titulo,
+                    f"Nombre del entregable: {nombre_entregable}",
+                    "mail/actualiza-entregables-sla.html",
+                    json.dumps({
                         "titulo": titulo,
                         "id_entregable": id_entregable,
                         "nombre_entregable": nombre_entregable,
                         "nombre_orden": nombre_orden,
                         "dias_atraso": dias_transcurridos
-                    })
-
-                    cursor.execute('''
-                        INSERT INTO "EPMT_NOTIFICACIONES" (
-                            "ID_USUARIO", "ID_ROL", "REF_TITULO", "REF_TEXTO", 
-                            "REF_TEMPLATE", "REF_DATOS", "CVE_USUARIO_ALTA", 
-                            "STP_ALTA_REGISTRO", "ID_ORDEN"
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ''', [
-                        id_usuario,
-                        id_rol,
-                        titulo,
-                        texto,
-                        template,
-                        datos_json,
-                        "JOB_SLA",
-                        now(),
-                        id_orden
-                    ])
-                    logger.info(f" Notificación insertada para entregable {id_entregable}.")
-
-    logger.info(f" SLA actualizado para {len(entregables_actualizados)} entregables.")
+                    }),
+                    "JOB_SLA",
+                    fecha_proceso,
+                    id_orden
+                ))
+
+        muestreo.resumen()
+        if not es_lider():
+            logger.warning('Se perdió el liderazgo del scheduler, no se guarda el SLA')
+            return
+        _actualiza_en_bloque(cursor, 'EPMT_ENTREGABLES', 'ID_ENTREGABLE', 'REF_COLOR_SLA',
+                             colores, fecha_proceso, "JOB_SLA")
+        _inserta_notificaciones(cursor, notificaciones)
+
+    logger.info(' SLA actualizado para %s entregables, %s notificaciones insertadas.', len(colores), len(notificaciones))
 
 
 @util.close_old_connections
+@instrumenta_job('actualiza_sla_atencion_clientes')
 def actualiza_sla_atencion_clientes(**kwargs):
-    logger.info("Iniciando actualización de SLA de atención a clientes...")
+    incremental = kwargs.get('incremental', getattr(settings, 'SLA_INCREMENTAL', False))
+    logger.info('Iniciando actualización de SLA de atención a clientes%s...', ' (incremental)' if incremental else '')
 
     with connection.cursor() as cursor:
-        cursor.execute('''
-            SELECT e."FEC_INHABIL"
-            FROM "EPMC_DIAS_INHABILES" e
-            WHERE e."STP_BAJA_REGISTRO" IS NULL
-        ''')
-        dias_inhabiles = set(row[0] for row in cursor.fetchall())
-        logger.info(f"Días inhabilitados cargados: {len(dias_inhabiles)}")
+        calendario = BusinessCalendar.from_db(cursor)
+        logger.info('Días inhabilitados cargados: %s', len(calendario.dias_inhabiles))
 
-        cursor.execute('''
-            SELECT e."ID_ENTREGABLE", e."REF_COLOR_SLA", e."NOM_ENTREGABLE", c."ID_CLIENTE", o."ID_ORDEN"
-            FROM "EPMT_ENTREGABLES" e
-            JOIN "EPMT_ORDEN_SERVICIO" o ON e."ID_ORDEN" = o."ID_ORDEN"
-            JOIN "EPMT_PROYECTOS" p ON o."ID_PROYECTO" = p."ID_PROYECTO"
-            JOIN "EPMT_CONTRATOS" c ON p."ID_CONTRATO" = c."ID_CONTRATO"
-            WHERE e."ID_ESTATUS" = 3 AND e."STP_BAJA_REGISTRO" IS NULL
-        ''')
+        cursor.execute(SQL_ENTREGABLES_CLIENTES)
 
         entregables = cursor.fetchall()
-        logger.info(f"Total de entregables encontrados: {len(entregables)}")
+        logger.info('Total de entregables encontrados: %s', len(entregables))
 
         if not entregables:
             logger.warning("No se encontraron entregables para actualizar.")
             return
 
-        entregables_actualizados = []
+        dia_actual = datetime.now().date()
+        fecha_proceso = datetime.now()
+        # Si cambió el calendario o algún SLA, la fecha de cambio de color de los entregables sin archivo
+        # pudo moverse a un día ya pasado; en modo incremental esos se notifican como en una corrida completa
+        firma, firma_anterior = _firma_configuracion(cursor, 'actualiza_sla_atencion_clientes')
+        if incremental and firma != firma_anterior:
+            logger.info('Cambió la configuración de SLA, se revisan completos los entregables sin archivo')
+        archivos = []
+        notificaciones = []
+        dias_por_entregable = calendario.business_days_since((entregable[2] for entregable in entregables), dia_actual)
+        muestreo = LogMuestreado(logger)
 
-        for id_entregable, color_sla, nombre_entregable, id_cliente, id_orden in entregables:
-            logger.info(f"Procesando entregable ID: {id_entregable}, ID_CLIENTE: {id_cliente}")
-
-            cursor.execute('''
-                SELECT "ID_USUARIO", "ID_ROL"
-                FROM "EPMT_USUARIOS"
-                WHERE "ID_CLIENTE" = %s AND "IND_ACTIVO" = 1 AND "STP_BAJA_REGISTRO" IS NULL
-                LIMIT 1
-            ''', [id_cliente])
-
-            usuario = cursor.fetchone()
-            id_usuario = usuario[0] if usuario else None
-            id_rol = usuario[1] if usuario else None
+        for (
+            id_entregable, nombre_entregable, fec_inicio, id_cliente, id_orden, nombre_orden, nombre_estatus,
+            id_usuario, id_rol, sla_verde, sla_amarillo, sla_rojo, id_archivo, sla_cliente_actual
+        ), dias_transcurridos in zip(entregables, dias_por_entregable):
 
             if not id_usuario:
-                logger.warning(
-                    f"No se encontró un usuario activo para el cliente {id_cliente}, se omitirá la notificación.")
+                muestreo.warning('Cliente sin usuario activo',
+                                 'No se encontró un usuario activo para el cliente %s, se omitirá la notificación.',
+                                 id_cliente)
                 continue
 
-            cursor.execute('''
-                SELECT "NUM_SLA_VERDE", "NUM_SLA_AMARILLO", "NUM_SLA_ROJO"
-                FROM "EPMC_CLIENTE_SLA"
-                WHERE "ID_CLIENTE" = %s
-                ORDER BY "ID_CLIENTE_SLA" ASC
-                LIMIT 1
-            ''', [id_cliente])
-
-            sla = cursor.fetchone()
-
-            if not sla:
-                logger.info(f"No se encontró SLA para el cliente {id_cliente}, buscando SLA por defecto.")
-                cursor.execute('''
-                    SELECT "NUM_SLA_VERDE", "NUM_SLA_AMARILLO", "NUM_SLA_ROJO"
-                    FROM "EPMC_CLIENTE_SLA"
-                    WHERE "ID_CLIENTE_SLA" = 1
-                ''')
-                sla = cursor.fetchone()
-
-            if not sla:
-                logger.error(f"No se encontró SLA por defecto. Saltando entregable {id_entregable}.")
+            if sla_verde is None:
+                muestreo.error('Sin SLA por defecto', 'No se encontró SLA por defecto. Saltando entregable %s.',
+                               id_entregable)
                 continue
 
-            sla_verde, sla_amarillo, sla_rojo = sla
-            dias_transcurridos = 0
-            dia_actual = datetime.now().date()
-
-            cursor.execute('''SELECT "FEC_INICIO" FROM "EPMT_ENTREGABLES" WHERE "ID_ENTREGABLE" = %s''',
-                           [id_entregable])
-            fec_inicio = cursor.fetchone()[0]
-
             if not fec_inicio:
-                logger.warning(
-                    f"El campo 'fec_inicio' es None para el entregable {id_entregable}, se omitirá el cálculo del SLA.")
+                muestreo.warning('Entregable sin fec_inicio',
+                                 "El campo 'fec_inicio' es None para el entregable %s, se omitirá el cálculo del SLA.",
+                                 id_entregable)
                 continue
 
-            while fec_inicio <= dia_actual:
-                if fec_inicio.weekday() < 5 and fec_inicio not in dias_inhabiles:
-                    dias_transcurridos += 1
-                fec_inicio += timedelta(days=1)
+            logger.debug('Entregable %s - Días hábiles transcurridos: %s', id_entregable, dias_transcurridos)
 
-            logger.debug(f"Entregable {id_entregable} - Días hábiles transcurridos: {dias_transcurridos}")
+            nuevo_color_sla = _color_sla(dias_transcurridos, sla_verde, sla_amarillo, sla_rojo)
 
-            if dias_transcurridos <= sla_verde:
-                nuevo_color_sla = 'VERDE'
-            elif dias_transcurridos <= sla_amarillo:
-                nuevo_color_sla = 'AMARILLO'
-            elif dias_transcurridos >= sla_rojo:
-                nuevo_color_sla = 'ROJO'
-            else:
-                nuevo_color_sla = None
-
-            logger.info(f"Nuevo color SLA calculado para entregable {id_entregable}: {nuevo_color_sla}")
-
-            if nuevo_color_sla and nuevo_color_sla != 'VERDE':
-                cursor.execute('''
-                    SELECT "ID_ARCHIVO"
-                    FROM "EPMT_ENTREGABLE_ARCHIVO"
-                    WHERE "ID_ENTREGABLE" = %s
-                    ORDER BY "CVE_MAJOR_VERSION" DESC, "STP_ALTA_REGISTRO" DESC
-                    LIMIT 1
-                ''', [id_entregable])
-
-                archivo = cursor.fetchone()
-
-                if archivo:
-                    id_entregable_archivo = archivo[0]
-                    cursor.execute('''
-                        UPDATE "EPMT_ENTREGABLE_ARCHIVO"
-                        SET "REF_SLA_CLIENTE" = %s, "STP_MODIFICA_REGISTRO" = %s, "CVE_USUARIO_MODIFICA" = %s
-                        WHERE "ID_ARCHIVO" = %s
-                    ''', [nuevo_color_sla, datetime.now(), "JOB_SLA_CLIENTE", id_entregable_archivo])
-
-                    entregables_actualizados.append(id_entregable)
-                    logger.info(f"SLA actualizado para entregable {id_entregable}: {nuevo_color_sla}")
-                else:
-                    logger.warning(f"No se encontró archivo para el entregable {id_entregable}, no se actualizó SLA.")
-
-                cursor.execute('''
-                    SELECT "REF_NOMBRE"
-                    FROM "EPMT_ORDEN_SERVICIO"
-                    WHERE "ID_ORDEN" = %s
-                ''', [id_orden])
-
-                orden = cursor.fetchone()
-                nombre_orden = orden[0] if orden else "Orden no encontrada"
-
-                cursor.execute('''
-                    SELECT "NOM_ESTATUS"
-                    FROM "EPMC_ESTATUS_ENTREGABLE"
-                    WHERE "ID_ESTATUS" = (SELECT "ID_ESTATUS" FROM "EPMT_ENTREGABLES" WHERE "ID_ENTREGABLE" = %s)
-                ''', [id_entregable])
+            if not nuevo_color_sla or nuevo_color_sla == 'VERDE':
+                continue
 
-                estatus = cursor.fetchone()
-                nombre_estatus = estatus[0] if estatus else "SIN ESTATUS"
-                titulo = f"Un entregable llegó al estado: {nombre_estatus.upper()}"
+            if incremental:
+                # Con archivo se compara contra el color guardado; sin archivo no hay estado previo
+                # y solo se notifica el día hábil en que el entregable entró a su color actual
+                if id_archivo:
+                    sin_cambio = nuevo_color_sla == sla_cliente_actual
+                elif firma != firma_anterior:
+                    sin_cambio = False
+                else:
+                    sin_cambio = _fecha_cambio_color(calendario, fec_inicio, dias_transcurridos,
+                                                     sla_verde, sla_amarillo, sla_rojo) != dia_actual
+                if sin_cambio:
+                    continue
 
-                datos_json = json.dumps({
+            if id_archivo:
+                archivos.append((id_archivo, nuevo_color_sla))
+            else:
+                muestreo.warning('Entregable sin archivo',
+                                 'No se encontró archivo para el entregable %s, no se actualizó SLA.', id_entregable)
+
+            titulo = f"Un entregable llegó al estado: {(nombre_estatus or 'SIN ESTATUS').upper()}"
+            notificaciones.append((
+                id_usuario,
+                id_rol,
+                titulo,
+                f"Nombre del entregable: {nombre_entregable}",
+                "mail/actualizacion-sla-clientes.html",
+                json.dumps({
                     "titulo": titulo,
                     "id_entregable": id_entregable,
                     "nombre_entregable": nombre_entregable,
                     "nombre_orden": nombre_orden,
                     "dias_atraso": dias_transcurridos
-                })
-
-                cursor.execute('''
-                    INSERT INTO "EPMT_NOTIFICACIONES" (
-                        "ID_USUARIO", "ID_ROL", "REF_TITULO", "REF_TEXTO", "REF_TEMPLATE", "REF_DATOS", 
-                        "CVE_USUARIO_ALTA", "STP_ALTA_REGISTRO", "ID_ORDEN"
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ''', [
-                    id_usuario,
-                    id_rol,
-                    titulo,
-                    f"Nombre del entregable: {nombre_entregable}",
-                    "mail/actualizacion-sla-clientes.html",
-                    datos_json,
-                    "JOB_SLA_CLIENTE",
-                    datetime.now(),
-                    id_orden
-                ])
-                logger.info(f"Notificación insertada para entregable {id_entregable}.")
-            else:
-                logger.info(
-                    f"No se inserta notificación para el entregable {id_entregable} porque el color SLA es VERDE.")
-
-        logger.info(f"SLA de atención a clientes actualizado para {len(entregables_actualizados)} entregables.")
-
+                }),
+                "JOB_SLA_CLIENTE",
+                fecha_proceso,
+                id_orden
+            ))
+
+        muestreo.resumen()
+        if not es_lider():
+            logger.warning('Se perdió el liderazgo del scheduler, no se guarda el SLA de atención a clientes')
+            return
+        _actualiza_en_bloque(cursor, 'EPMT_ENTREGABLE_ARCHIVO', 'ID_ARCHIVO', 'REF_SLA_CLIENTE',
+                             archivos, fecha_proceso, "JOB_SLA_CLIENTE")
+        _inserta_notificaciones(cursor, notificaciones)
+        _guarda_firma(cursor, 'actualiza_sla_atencion_clientes', firma, fecha_proceso)
+
+        logger.info('SLA de atención a clientes actualizado para %s entregables, %s notificaciones insertadas.',
+                    len(archivos), len(notificaciones))
+
+
+def _color_sla(dias_transcurridos, sla_verde, sla_amarillo, sla_rojo):
+    if dias_transcurridos <= sla_verde:
+        return 'VERDE'
+    elif dias_transcurridos <= sla_amarillo:
+        return 'AMARILLO'
+    elif dias_transcurridos >= sla_rojo:
+        return 'ROJO'
+    return None
+
+
+def _fecha_cambio_color(calendario, fec_inicio, dias_transcurridos, sla_verde, sla_amarillo, sla_rojo):
+    """Fecha hábil en la que el entregable entró a su color de SLA actual"""
+    if dias_transcurridos <= sla_verde:
+        return fec_inicio
+    elif dias_transcurridos <= sla_amarillo:
+        umbral = sla_verde + 1
+    elif dias_transcurridos >= sla_rojo:
+        umbral = max(sla_rojo, sla_amarillo + 1)
+    else:
+        umbral = sla_amarillo + 1
+
+    return calendario.date_for_business_day(fec_inicio, umbral)
+
+
+def _firma_configuracion(cursor, job):
+    """Firma actual de la configuración de SLA y la guardada en la última corrida del job (None si no hay)"""
+    cursor.execute(SQL_FIRMA_CLIENTES)
+    firma = cursor.fetchone()[0]
+    cursor.execute('''SELECT "REF_FIRMA" FROM "EPMT_SLA_CONFIGURACION" WHERE "CVE_JOB" = %s''', [job])
+    fila = cursor.fetchone()
+    return firma, fila[0] if fila else None
+
+
+def _guarda_firma(cursor, job, firma, fecha_proceso):
+    cursor.execute('''
+        INSERT INTO "EPMT_SLA_CONFIGURACION" ("CVE_JOB", "REF_FIRMA", "STP_ACTUALIZA")
+        VALUES (%s, %s, %s)
+        ON CONFLICT ("CVE_JOB") DO UPDATE
+        SET "REF_FIRMA" = EXCLUDED."REF_FIRMA", "STP_ACTUALIZA" = EXCLUDED."STP_ACTUALIZA"
+    ''', [job, firma, fecha_proceso])
+
+
+def _slas_infoblue(cursor, ids_infoblue):
+    """Umbrales de SLA por InfoBlue, en una sola consulta"""
+    if not ids_infoblue:
+        return {}
+
+    cursor.execute('''
+        SELECT "ID_INFOBLUE", "NUM_SLA_VERDE", "NUM_SLA_AMARILLO", "NUM_SLA_ROJO"
+        FROM "EPMC_INFOBLUE"
+        WHERE "ID_INFOBLUE" = ANY(%s)
+    ''', [list(ids_infoblue)])
+    return {row[0]: row[1:] for row in cursor.fetchall()}
+
+
+def _nombres_estatus(cursor):
+    cursor.execute('''SELECT "ID_ESTATUS", "NOM_ESTATUS" FROM "EPMC_ESTATUS_ENTREGABLE"''')
+    return dict(cursor.fetchall())
+
+
+def _values(filas):
+    """Fragmento VALUES (...), (...) con sus parámetros planos para sentencias en bloque"""
+    placeholders = ', '.join('(' + ', '.join(['%s'] * len(fila)) + ')' for fila in filas)
+    return placeholders, [valor for fila in filas for valor in fila]
+
+
+def _actualiza_en_bloque(cursor, tabla, columna_id, columna_valor, filas, fecha_modifica, usuario_modifica):
+    """Aplica todos los pares (id, valor) con un único UPDATE ... FROM (VALUES ...)"""
+    if not filas:
+        return
+
+    placeholders, params = _values(filas)
+    cursor.execute(f'''
+        UPDATE "{tabla}" t
+        SET "{columna_valor}" = v.valor,
+            "STP_MODIFICA_REGISTRO" = %s,
+            "CVE_USUARIO_MODIFICA" = %s
+        FROM (VALUES {placeholders}) AS v(id, valor)
+        WHERE t."{columna_id}" = v.id
+    ''', [fecha_modifica, usuario_modifica, *params])
+
+
+def _inserta_notificaciones(cursor, notificaciones):
+    """Inserta todas las notificaciones del lote con un único INSERT multi-fila"""
+    if not notificaciones:
+        return
+
+    placeholders, params = _values(notificaciones)
+    cursor.execute(f'''
+        INSERT INTO "EPMT_NOTIFICACIONES" (
+            "ID_USUARIO", "ID_ROL", "REF_TITULO", "REF_TEXTO", 
+            "REF_TEMPLATE", "REF_DATOS", "CVE_USUARIO_ALTA", 
+            "STP_ALTA_REGISTRO", "ID_ORDEN"
+        ) VALUES {placeholders}
+    ''', params)
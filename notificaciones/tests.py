@@ -1,3 +1,1812 @@
-from django.test import TestCase
+import asyncio
+import base64
+import email
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import socket
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+from logging.handlers import QueueListener
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db import connection, transaction
+from django.utils.timezone import now
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from notificaciones.attachment_cache import AdjuntoEnDisco, AttachmentCache, TAMANO_BLOQUE
+from notificaciones.business_calendar import BusinessCalendar
+from notificaciones.indices import INDICES, consultas_frecuentes, ddl_indice, predicados_sin_coincidencia
+from notificaciones.log_queue import QueueHandlerIniciado
+from notificaciones.log_sampling import LogMuestreado
+from notificaciones.mail_render import MailRenderer
+from notificaciones.metrics import instrumenta_job
+from notificaciones.models import (
+    BandejaNotificacion, Cliente, ClienteSLA, ContadorNotificaciones, Contrato, DiaInhabil, Empresa, Entregable,
+    EntregableArchivo, EntregableSprint, EstatusEntregable, Etapa, InfoBlue, Notificaciones, OrdenEtapa,
+    OrdenServicio, OrdenSprint, ParticionNotificaciones, Proyecto, Rol, Usuario, UsuarioOrdenServicio,
+    VersionEntregaDocumentos,
+)
+from notificaciones.smtp_pool import SMTPConnectionPool
+from notificaciones.stream import NotificacionesListener, con_listener
+from notificaciones.tasks import mail_queue, scheduler_manager
+from notificaciones.tasks.bandeja_task import crea_trigger_bandeja, reconcilia_contadores
+from notificaciones.tasks.entrega_documentos_task import USUARIO_JOB, actualiza_version_entregables
+from notificaciones.tasks.leader import trabajos_en_curso
+from notificaciones.tasks.mail_task import send_mails
+from notificaciones.tasks.particiones_task import convierte_tabla, crea_particiones, mantiene_particiones
+from notificaciones.tasks.purga import por_rangos
+from notificaciones.tasks.sla_task import actualiza_entregables_sla, actualiza_sla_atencion_clientes
+from notificaciones.utils import inline_image
+
+
+def ajusta_esquema():
+    """Alinea las tablas creadas desde los modelos con las de la base real, que es a la que escribe el SQL de los jobs"""
+    with connection.cursor() as cursor:
+        # Un TransactionTestCase confirma estos cambios, así que deben poder aplicarse otra vez
+        cursor.execute('''
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'EPMC_DIAS_INHABILES' AND column_name = 'FEC_DIA_INHABIL'
+        ''')
+        if cursor.fetchone():
+            cursor.execute('ALTER TABLE "EPMC_DIAS_INHABILES" RENAME COLUMN "FEC_DIA_INHABIL" TO "FEC_INHABIL"')
+        for tabla in ('EPMT_NOTIFICACIONES', 'EPMT_BANDEJA_NOTIFICACIONES'):
+            for columna in ('CVE_USUARIO_ALTA', 'CVE_USUARIO_MODIFICA', 'CVE_USUARIO_BAJA'):
+                cursor.execute(f'ALTER TABLE "{tabla}" ALTER COLUMN "{columna}" DROP NOT NULL')
+        cursor.execute('ALTER TABLE "EPMT_NOTIFICACIONES" ALTER COLUMN "IND_EXTERNO" SET DEFAULT 0')
+    # En la base real lo instala la migración 0003; las pruebas no corren migraciones
+    crea_trigger_bandeja()
+
+
+def dias_habiles_por_fila(fec_inicio, hoy, dias_inhabiles):
+    """Conteo día por día del job anterior"""
+    dias_transcurridos = 0
+    while fec_inicio <= hoy:
+        if fec_inicio.weekday() < 5 and fec_inicio not in dias_inhabiles:
+            dias_transcurridos += 1
+        fec_inicio += timedelta(days=1)
+    return dias_transcurridos
+
+
+def color_por_fila(dias_transcurridos, sla_verde, sla_amarillo, sla_rojo):
+    if dias_transcurridos <= sla_verde:
+        return 'VERDE'
+    elif dias_transcurridos <= sla_amarillo:
+        return 'AMARILLO'
+    elif dias_transcurridos >= sla_rojo:
+        return 'ROJO'
+    return None
+
+
+def dias_inhabiles_por_fila(cursor):
+    cursor.execute('''SELECT "FEC_INHABIL" FROM "EPMC_DIAS_INHABILES" WHERE "STP_BAJA_REGISTRO" IS NULL''')
+    return set(row[0] for row in cursor.fetchall())
+
+
+def inserta_notificacion_por_fila(cursor, valores):
+    cursor.execute('''
+        INSERT INTO "EPMT_NOTIFICACIONES" (
+            "ID_USUARIO", "ID_ROL", "REF_TITULO", "REF_TEXTO", "REF_TEMPLATE", "REF_DATOS",
+            "CVE_USUARIO_ALTA", "STP_ALTA_REGISTRO", "ID_ORDEN"
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ''', valores)
+
+
+def sla_entregables_por_fila():
+    """actualiza_entregables_sla antes del motor por lotes: consultas, UPDATE e INSERT por entregable"""
+    with connection.cursor() as cursor:
+        dias_inhabiles = dias_inhabiles_por_fila(cursor)
+        cursor.execute('''
+            SELECT e."ID_ENTREGABLE", e."FEC_INICIO", e."ID_INFOBLUE", e."NOM_ENTREGABLE",
+                   u."ID_USUARIO", u."ID_ROL", o."ID_ORDEN", o."REF_NOMBRE"
+            FROM "EPMT_ENTREGABLES" e
+            JOIN "EPMT_USUARIOS" u ON e."ID_USUARIO_RESPONSABLE" = u."ID_USUARIO"
+            JOIN "EPMT_ORDEN_SERVICIO" o ON e."ID_ORDEN" = o."ID_ORDEN"
+            WHERE e."ID_ESTATUS" < 7 AND e."STP_BAJA_REGISTRO" IS NULL
+                AND u."STP_BAJA_REGISTRO" IS NULL AND u."IND_ACTIVO" = 1
+        ''')
+
+        for (
+            id_entregable, fec_inicio, id_infoblue, nombre_entregable, id_usuario, id_rol, id_orden, nombre_orden
+        ) in cursor.fetchall():
+            if fec_inicio is None:
+                continue
+
+            dias_transcurridos = dias_habiles_por_fila(fec_inicio, datetime.now().date(), dias_inhabiles)
+            cursor.execute('''
+                SELECT "NUM_SLA_VERDE", "NUM_SLA_AMARILLO", "NUM_SLA_ROJO" FROM "EPMC_INFOBLUE" WHERE "ID_INFOBLUE" = %s
+            ''', [id_infoblue])
+            sla = cursor.fetchone()
+            color = color_por_fila(dias_transcurridos, *sla) if sla else None
+            if not color:
+                continue
+
+            cursor.execute('''
+                UPDATE "EPMT_ENTREGABLES"
+                SET "REF_COLOR_SLA" = %s, "STP_MODIFICA_REGISTRO" = %s, "CVE_USUARIO_MODIFICA" = %s
+                WHERE "ID_ENTREGABLE" = %s
+            ''', [color, now(), "JOB_SLA", id_entregable])
+
+            if color != "VERDE":
+                cursor.execute('''
+                    SELECT est."NOM_ESTATUS"
+                    FROM "EPMT_ENTREGABLES" ent
+                    JOIN "EPMC_ESTATUS_ENTREGABLE" est ON ent."ID_ESTATUS" = est."ID_ESTATUS"
+                    WHERE ent."ID_ENTREGABLE" = %s
+                ''', [id_entregable])
+                resultado = cursor.fetchone()
+                titulo = f"Un entregable llegó al estado: {(resultado[0] if resultado else 'SIN ESTATUS').upper()}"
+                inserta_notificacion_por_fila(cursor, [
+                    id_usuario, id_rol, titulo, f"Nombre del entregable: {nombre_entregable}",
+                    "mail/actualiza-entregables-sla.html",
+                    json.dumps({
+                        "titulo": titulo,
+                        "id_entregable": id_entregable,
+                        "nombre_entregable": nombre_entregable,
+                        "nombre_orden": nombre_orden,
+                        "dias_atraso": dias_transcurridos
+                    }),
+                    "JOB_SLA", now(), id_orden,
+                ])
+
+
+def sla_clientes_por_fila():
+    """actualiza_sla_atencion_clientes antes de la consulta pre-unida: seis consultas por entregable"""
+    with connection.cursor() as cursor:
+        dias_inhabiles = dias_inhabiles_por_fila(cursor)
+        cursor.execute('''
+            SELECT e."ID_ENTREGABLE", e."NOM_ENTREGABLE", c."ID_CLIENTE", o."ID_ORDEN"
+            FROM "EPMT_ENTREGABLES" e
+            JOIN "EPMT_ORDEN_SERVICIO" o ON e."ID_ORDEN" = o."ID_ORDEN"
+            JOIN "EPMT_PROYECTOS" p ON o."ID_PROYECTO" = p."ID_PROYECTO"
+            JOIN "EPMT_CONTRATOS" c ON p."ID_CONTRATO" = c."ID_CONTRATO"
+            WHERE e."ID_ESTATUS" = 3 AND e."STP_BAJA_REGISTRO" IS NULL
+        ''')
+
+        for id_entregable, nombre_entregable, id_cliente, id_orden in cursor.fetchall():
+            cursor.execute('''
+                SELECT "ID_USUARIO", "ID_ROL" FROM "EPMT_USUARIOS"
+                WHERE "ID_CLIENTE" = %s AND "IND_ACTIVO" = 1 AND "STP_BAJA_REGISTRO" IS NULL
+                LIMIT 1
+            ''', [id_cliente])
+            usuario = cursor.fetchone()
+            if not usuario:
+                continue
+
+            cursor.execute('''
+                SELECT "NUM_SLA_VERDE", "NUM_SLA_AMARILLO", "NUM_SLA_ROJO" FROM "EPMC_CLIENTE_SLA"
+                WHERE "ID_CLIENTE" = %s ORDER BY "ID_CLIENTE_SLA" ASC LIMIT 1
+            ''', [id_cliente])
+            sla = cursor.fetchone()
+            if not sla:
+                cursor.execute('''
+                    SELECT "NUM_SLA_VERDE", "NUM_SLA_AMARILLO", "NUM_SLA_ROJO" FROM "EPMC_CLIENTE_SLA"
+                    WHERE "ID_CLIENTE_SLA" = 1
+                ''')
+                sla = cursor.fetchone()
+            if not sla:
+                continue
+
+            cursor.execute('''SELECT "FEC_INICIO" FROM "EPMT_ENTREGABLES" WHERE "ID_ENTREGABLE" = %s''', [id_entregable])
+            fec_inicio = cursor.fetchone()[0]
+            if not fec_inicio:
+                continue
+
+            dias_transcurridos = dias_habiles_por_fila(fec_inicio, datetime.now().date(), dias_inhabiles)
+            color = color_por_fila(dias_transcurridos, *sla)
+            if not color or color == 'VERDE':
+                continue
+
+            cursor.execute('''
+                SELECT "ID_ARCHIVO" FROM "EPMT_ENTREGABLE_ARCHIVO" WHERE "ID_ENTREGABLE" = %s
+                ORDER BY "CVE_MAJOR_VERSION" DESC, "STP_ALTA_REGISTRO" DESC
+                LIMIT 1
+            ''', [id_entregable])
+            archivo = cursor.fetchone()
+            if archivo:
+                cursor.execute('''
+                    UPDATE "EPMT_ENTREGABLE_ARCHIVO"
+                    SET "REF_SLA_CLIENTE" = %s, "STP_MODIFICA_REGISTRO" = %s, "CVE_USUARIO_MODIFICA" = %s
+                    WHERE "ID_ARCHIVO" = %s
+                ''', [color, datetime.now(), "JOB_SLA_CLIENTE", archivo[0]])
+
+            cursor.execute('''SELECT "REF_NOMBRE" FROM "EPMT_ORDEN_SERVICIO" WHERE "ID_ORDEN" = %s''', [id_orden])
+            orden = cursor.fetchone()
+            cursor.execute('''
+                SELECT "NOM_ESTATUS" FROM "EPMC_ESTATUS_ENTREGABLE"
+                WHERE "ID_ESTATUS" = (SELECT "ID_ESTATUS" FROM "EPMT_ENTREGABLES" WHERE "ID_ENTREGABLE" = %s)
+            ''', [id_entregable])
+            estatus = cursor.fetchone()
+            titulo = f"Un entregable llegó al estado: {(estatus[0] if estatus else 'SIN ESTATUS').upper()}"
+            inserta_notificacion_por_fila(cursor, [
+                usuario[0], usuario[1], titulo, f"Nombre del entregable: {nombre_entregable}",
+                "mail/actualizacion-sla-clientes.html",
+                json.dumps({
+                    "titulo": titulo,
+                    "id_entregable": id_entregable,
+                    "nombre_entregable": nombre_entregable,
+                    "nombre_orden": orden[0] if orden else "Orden no encontrada",
+                    "dias_atraso": dias_transcurridos
+                }),
+                "JOB_SLA_CLIENTE", datetime.now(), id_orden,
+            ])
+
+
+def estado_sla() -> dict:
+    """Colores, estatus y notificaciones resultantes, sin las fechas de proceso"""
+    return {
+        'colores': dict(Entregable.objects.values_list('id', 'color_sla')),
+        'estatus': dict(Entregable.objects.values_list('id', 'id_estatus')),
+        'sla_cliente': dict(EntregableArchivo.objects.values_list('id', 'sla_cliente')),
+        'notificaciones': filas_notificacion(Notificaciones.objects.all()),
+    }
+
+
+def filas_notificacion(notificaciones) -> list:
+    return sorted(
+        (
+            notificacion.id_usuario_id, notificacion.id_rol_id, notificacion.id_orden_id, notificacion.titulo,
+            notificacion.texto, notificacion.template, notificacion.usuario_alta,
+            json.dumps(notificacion.datos, sort_keys=True),
+        )
+        for notificacion in notificaciones
+    )
+
+
+def entregable_notificado(notificacion) -> int:
+    return json.loads(notificacion[-1])['id_entregable']
+
+
+class JobTestCase(TestCase):
+    """Los jobs cierran conexiones viejas antes y después de correr; en un TestCase eso cerraría su transacción"""
+
+    def setUp(self):
+        parche = mock.patch('django.db.close_old_connections')
+        parche.start()
+        self.addCleanup(parche.stop)
+
+
+class DatosSla:
+    """Catálogos, clientes, órdenes y entregables con fechas de inicio relativas a hoy para los jobs de SLA"""
+
+    @classmethod
+    def crea_catalogos(cls):
+        hoy = date.today()
+
+        for dias in (3, 10, 17):
+            DiaInhabil.objects.create(fecha=hoy - timedelta(days=dias))
+        DiaInhabil.objects.create(fecha=hoy - timedelta(days=5), fecha_baja=datetime.now())
+
+        ajusta_esquema()
+
+        cls.estatus = {
+            id_estatus: EstatusEntregable.objects.create(id=id_estatus, nombre=nombre)
+            for id_estatus, nombre in enumerate(
+                ['Nuevo', 'En proceso', 'Revisión cliente', 'Con comentarios', 'Aprobado', 'VoBo', 'Cerrado'], start=1
+            )
+        }
+
+        cls.rol = Rol.objects.create(rol='Consultor')
+        cls.rol_cliente = Rol.objects.create(rol='Cliente')
+        empresa = Empresa.objects.create(nombre='PM')
+
+        cls.clientes = []
+        for indice in range(3):
+            cls.clientes.append(Cliente.objects.create(
+                id_empresa_ligada=empresa, nombre=f'Cliente {indice}', nombre_corto=f'C{indice}', rfc=f'RFC{indice}',
+                razon_social=f'Cliente {indice}', giro='', direccion='',
+            ))
+
+        # ID_CLIENTE_SLA = 1 es el SLA por defecto; el segundo cliente no tiene uno propio
+        ClienteSLA.objects.create(id=1, id_cliente=cls.clientes[0], sla_verde=4, sla_amarillo=8, sla_rojo=10)
+        ClienteSLA.objects.create(id=2, id_cliente=cls.clientes[2], sla_verde=2, sla_amarillo=5, sla_rojo=6)
+
+        cls.infoblues = [
+            InfoBlue.objects.create(id_cliente=cls.clientes[0], nombre='Plan', sla_verde=5, sla_amarillo=10,
+                                    sla_rojo=12, subtipo='', path='infoblue/plan.docx'),
+            InfoBlue.objects.create(id_cliente=cls.clientes[0], nombre='Diseño', sla_verde=3, sla_amarillo=6,
+                                    sla_rojo=7, subtipo='', path='infoblue/diseno.docx'),
+            None,
+        ]
+
+        cls.responsables = [
+            cls.crea_usuario('responsable@pm.mx', cls.rol),
+            cls.crea_usuario('otro@pm.mx', cls.rol),
+            cls.crea_usuario('inactivo@pm.mx', cls.rol, is_active=0),
+        ]
+        # El primer y segundo cliente tienen un usuario activo; el tercero solo uno inactivo
+        cls.crea_usuario('cliente0@cliente.mx', cls.rol_cliente, id_cliente=cls.clientes[0], is_externo=1)
+        cls.crea_usuario('cliente1@cliente.mx', cls.rol_cliente, id_cliente=cls.clientes[1], is_externo=1)
+        cls.crea_usuario('cliente2@cliente.mx', cls.rol_cliente, id_cliente=cls.clientes[2], is_externo=1,
+                         is_active=0)
+
+        cls.ordenes = []
+        for cliente in cls.clientes:
+            contrato = Contrato.objects.create(id_cliente=cliente, clave_contrato='', nombre_contrato='Contrato')
+            proyecto = Proyecto.objects.create(id_contrato=contrato, nombre_proyecto='Proyecto')
+            cls.ordenes.append(OrdenServicio.objects.create(
+                id_proyecto=proyecto, nombre=f'Orden {cliente.nombre}', nombre_corto='', fecha_inicio=hoy,
+            ))
+
+    @staticmethod
+    def crea_usuario(email, rol, **campos):
+        return Usuario.objects.create(email=email, id_rol=rol, nombre=email.split('@')[0], **campos)
+
+    @classmethod
+    def crea_entregables(cls, cantidad: int):
+        """Entregables repartidos entre órdenes, estatus, InfoBlues, responsables, antigüedades y colores"""
+        hoy = date.today()
+        colores = ['VERDE', 'AMARILLO', 'ROJO']
+        entregables = []
+
+        for indice in range(cantidad):
+            entregable = Entregable.objects.create(
+                id_orden=cls.ordenes[indice % len(cls.ordenes)],
+                id_responsable=cls.responsables[indice % len(cls.responsables)],
+                id_estatus=cls.estatus[(1, 3, 3, 5, 7)[indice % 5]],
+                id_infoblue=cls.infoblues[indice % len(cls.infoblues)],
+                color_sla=colores[indice % len(colores)],
+                nombre=f'Entregable {indice}',
+                fecha_inicio=None if indice % 11 == 10 else hoy - timedelta(days=indice % 30),
+            )
+            entregables.append(entregable)
+
+            # Dos de cada tres tienen archivos; el último es el de versión mayor más alta
+            if indice % 3:
+                for major in range(indice % 3):
+                    EntregableArchivo.objects.create(
+                        id_entregable=entregable, major_version=major, minor_version=1, nombre='a.docx',
+                        extension='docx', path='a.docx', file_hash='', sla_actual='',
+                        sla_cliente=colores[(indice + major) % len(colores)],
+                    )
+
+        return entregables
+
+
+class SlaRoundTripsTest(DatosSla, JobTestCase):
+    """Las sentencias de los jobs de SLA no dependen del número de entregables"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.crea_catalogos()
+
+    def sentencias(self, job) -> int:
+        with CaptureQueriesContext(connection) as consultas:
+            job()
+        return len(consultas)
+
+    def test_actualiza_entregables_sla(self):
+        self.crea_entregables(30)
+        pocas = self.sentencias(actualiza_entregables_sla)
+        notificaciones = Notificaciones.objects.count()
+
+        self.crea_entregables(300)
+        muchas = self.sentencias(actualiza_entregables_sla)
+
+        self.assertGreater(Notificaciones.objects.count() - notificaciones, notificaciones)
+        self.assertEqual(pocas, muchas)
+
+    def test_actualiza_sla_atencion_clientes(self):
+        self.crea_entregables(30)
+        pocas = self.sentencias(actualiza_sla_atencion_clientes)
+        notificaciones = Notificaciones.objects.count()
+
+        self.crea_entregables(300)
+        muchas = self.sentencias(actualiza_sla_atencion_clientes)
+
+        self.assertGreater(Notificaciones.objects.count() - notificaciones, notificaciones)
+        self.assertEqual(pocas, muchas)
+
+
+class SlaRegresionTest(DatosSla, JobTestCase):
+    """Los jobs por lotes dejan los mismos colores, estatus y notificaciones que los jobs anteriores, fila por fila"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.crea_catalogos()
+        cls.crea_entregables(120)
+
+    def estado_por_fila(self, job) -> dict:
+        """Resultado del job anterior; sus cambios se deshacen para correr el nuevo sobre los mismos datos"""
+        with transaction.atomic():
+            job()
+            estado = estado_sla()
+            transaction.set_rollback(True)
+        return estado
+
+    def test_entregables_sla(self):
+        esperado = self.estado_por_fila(sla_entregables_por_fila)
+
+        actualiza_entregables_sla(incremental=False)
+
+        self.assertTrue(esperado['notificaciones'])
+        self.assertEqual(estado_sla(), esperado)
+
+    def test_entregables_sla_incremental(self):
+        colores_previos = dict(Entregable.objects.values_list('id', 'color_sla'))
+        esperado = self.estado_por_fila(sla_entregables_por_fila)
+
+        actualiza_entregables_sla(incremental=True)
+
+        # Solo se notifican los entregables cuyo color guardado era distinto al calculado
+        estado = estado_sla()
+        self.assertEqual(estado['colores'], esperado['colores'])
+        self.assertEqual(estado['estatus'], esperado['estatus'])
+        self.assertEqual(estado['notificaciones'], [
+            notificacion for notificacion in esperado['notificaciones']
+            if colores_previos[entregable_notificado(notificacion)] != esperado['colores'][entregable_notificado(notificacion)]
+        ])
+        self.assertLess(len(estado['notificaciones']), len(esperado['notificaciones']))
+
+        # Una segunda corrida el mismo día ya no encuentra cambios
+        actualiza_entregables_sla(incremental=True)
+        self.assertEqual(estado_sla(), estado)
+
+    def test_sla_atencion_clientes(self):
+        esperado = self.estado_por_fila(sla_clientes_por_fila)
+
+        actualiza_sla_atencion_clientes(incremental=False)
+
+        self.assertTrue(esperado['notificaciones'])
+        self.assertEqual(estado_sla(), esperado)
+
+    def test_sla_atencion_clientes_incremental(self):
+        actualiza_sla_atencion_clientes(incremental=False)
+        estado = estado_sla()
+
+        actualiza_sla_atencion_clientes(incremental=True)
+
+        # Con archivo el color ya quedó guardado; sin archivo solo se notifica si el color cambió hoy
+        hoy = date.today()
+        with connection.cursor() as cursor:
+            dias_inhabiles = dias_inhabiles_por_fila(cursor)
+        nuevas = estado_sla()['notificaciones'][len(estado['notificaciones']):]
+        cambios_hoy = set()
+        for entregable in Entregable.objects.filter(id_estatus=3, fecha_inicio__isnull=False,
+                                                    entregablearchivo__isnull=True):
+            cliente = entregable.id_orden.id_proyecto.id_contrato.id_cliente
+            sla = ClienteSLA.objects.filter(id_cliente=cliente).first() or ClienteSLA.objects.get(id=1)
+            umbrales = (sla.sla_verde, sla.sla_amarillo, sla.sla_rojo)
+            dias = dias_habiles_por_fila(entregable.fecha_inicio, hoy, dias_inhabiles)
+            color = color_por_fila(dias, *umbrales)
+            if (
+                Usuario.objects.filter(id_cliente=cliente, is_active=1).exists()
+                and color not in (None, 'VERDE')
+                and color != color_por_fila(dias_habiles_por_fila(entregable.fecha_inicio, hoy - timedelta(days=1),
+                                                                 dias_inhabiles), *umbrales)
+            ):
+                cambios_hoy.add(entregable.id)
+
+        self.assertEqual(
+            Notificaciones.objects.count() - len(estado['notificaciones']), len(cambios_hoy)
+        )
+        self.assertEqual(estado_sla()['sla_cliente'], estado['sla_cliente'])
+
+    def test_sla_atencion_clientes_incremental_cambio_configuracion(self):
+        actualiza_sla_atencion_clientes(incremental=False)
+        ClienteSLA.objects.filter(id=1).update(sla_verde=2, sla_amarillo=3, sla_rojo=5)
+        ultima = Notificaciones.objects.order_by('-id').values_list('id', flat=True).first()
+        with transaction.atomic():
+            sla_clientes_por_fila()
+            esperado = estado_sla()
+            esperado['notificaciones'] = filas_notificacion(Notificaciones.objects.filter(id__gt=ultima))
+            transaction.set_rollback(True)
+        con_archivo = set(EntregableArchivo.objects.values_list('id_entregable', flat=True))
+        sin_archivo = [
+            notificacion for notificacion in esperado['notificaciones']
+            if entregable_notificado(notificacion) not in con_archivo
+        ]
+
+        actualiza_sla_atencion_clientes(incremental=True)
+
+        # Con otra firma de configuración los entregables sin archivo se notifican como en una corrida completa
+        nuevas = filas_notificacion(Notificaciones.objects.filter(id__gt=ultima))
+        self.assertTrue(sin_archivo)
+        self.assertEqual(
+            [notificacion for notificacion in nuevas if entregable_notificado(notificacion) not in con_archivo],
+            sin_archivo
+        )
+        self.assertEqual(estado_sla()['sla_cliente'], esperado['sla_cliente'])
+
+        # La firma quedó guardada: la siguiente corrida vuelve a notificar solo en la fecha de cambio de color
+        total = Notificaciones.objects.count()
+        actualiza_sla_atencion_clientes(incremental=True)
+        self.assertLess(Notificaciones.objects.count() - total, len(sin_archivo))
+
+
+@override_settings(MAIL_QUEUE_BATCH_SIZE=200, MAIL_DIGEST=False)
+class SendMailsQueriesTest(DatosSla, JobTestCase):
+    """Las consultas de send_mails no crecen con el número de correos del lote, incluidos los de destinatarios por rol"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.crea_catalogos()
+        for orden in cls.ordenes:
+            for usuario in Usuario.objects.filter(is_active=1):
+                UsuarioOrdenServicio.objects.create(id_usuario=usuario, id_orden=orden)
+
+    def setUp(self):
+        super().setUp()
+        # Sin SMTP: cada correo se arma como lo haría el hilo de entrega y se da por enviado
+        parche = mock.patch(
+            'notificaciones.tasks.mail_task.send_mail_messages',
+            side_effect=lambda mensajes: [bool(arma().to) for arma in mensajes],
+        )
+        self.envio = parche.start()
+        self.addCleanup(parche.stop)
+
+    def crea_notificaciones(self, cantidad: int):
+        """Una de cada tres es directa; las demás van por rol a los internos o a los externos de la orden"""
+        destinos = [
+            {'id_usuario': self.responsables[0]},
+            {'id_rol': self.rol, 'externo': 0},
+            {'id_rol': self.rol_cliente, 'externo': 1},
+        ]
+        Notificaciones.objects.bulk_create(
+            Notificaciones(
+                id_orden=self.ordenes[indice % len(self.ordenes)], titulo=f'Notificación {indice}',
+                texto='Texto', template='mail/notificacion.html', datos={'titulo': f'Notificación {indice}'},
+                fecha_alta=now(), **destinos[indice % len(destinos)],
+            )
+            for indice in range(cantidad)
+        )
+
+    def test_consultas_constantes(self):
+        self.crea_notificaciones(6)
+        with CaptureQueriesContext(connection) as consultas:
+            send_mails()
+
+        self.crea_notificaciones(150)
+        with self.assertNumQueries(len(consultas)):
+            send_mails()
+
+        self.assertEqual(len(self.envio.call_args.args[0]), 150)
+        self.assertEqual(Notificaciones.objects.filter(usuario_modifica=mail_queue.USUARIO_ENVIADO).count(), 156)
+
+    def test_destinatarios_por_rol_sin_repetidos(self):
+        # La tabla de la base real no tiene la restricción única: un usuario puede quedar asignado dos veces
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute('ALTER TABLE "EPMT_USUARIO_ORDEN_SERVICIO" DROP CONSTRAINT "EPMT_USUARIO_ORDEN_UNIQUE"')
+        UsuarioOrdenServicio.objects.create(id_usuario=self.responsables[0], id_orden=self.ordenes[0])
+
+        enviados = []
+        self.envio.side_effect = lambda mensajes: [enviados.append(arma().to) or True for arma in mensajes]
+        Notificaciones.objects.bulk_create(
+            Notificaciones(
+                id_orden=orden, id_rol=self.rol, externo=0, titulo='Por rol', texto='Texto',
+                template='mail/notificacion.html', datos={'titulo': 'Por rol'}, fecha_alta=now(),
+            )
+            for orden in self.ordenes[:2]
+        )
+
+        send_mails()
+
+        # El responsable está en las dos órdenes (y dos veces en la primera): recibe un correo de cada una
+        self.assertEqual(
+            sorted(sorted(destinatarios) for destinatarios in enviados),
+            [['otro@pm.mx', 'responsable@pm.mx']] * 2,
+        )
+
+    def test_no_reclama_sin_liderazgo(self):
+        self.crea_notificaciones(3)
+        with mock.patch('notificaciones.tasks.mail_task.es_lider', return_value=False):
+            send_mails()
+
+        self.envio.assert_not_called()
+        self.assertFalse(Notificaciones.objects.filter(usuario_modifica=mail_queue.USUARIO_ENVIADO).exists())
+
+
+@override_settings(MAIL_DIGEST=True, MAIL_DIGEST_MIN_ITEMS=2, MAIL_DIGEST_WINDOW_MINUTES=15)
+class ResumenCorreosTest(DatosSla, JobTestCase):
+    """Los resúmenes se arman por destinatario, juntan las notificaciones de la ventana y usan el asunto configurado"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.crea_catalogos()
+        for usuario in cls.responsables[:2]:
+            UsuarioOrdenServicio.objects.create(id_usuario=usuario, id_orden=cls.ordenes[0])
+
+    def setUp(self):
+        super().setUp()
+        self.enviados = []
+        parche = mock.patch(
+            'notificaciones.tasks.mail_task.send_mail_messages',
+            side_effect=lambda mensajes: [self.enviados.append(arma()) or True for arma in mensajes],
+        )
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def crea(self, titulo, minutos=20, **destino):
+        return Notificaciones.objects.create(
+            id_orden=self.ordenes[0], titulo=titulo, texto='Texto', template='mail/notificacion.html',
+            datos={'titulo': titulo}, fecha_alta=now() - timedelta(minutes=minutos), **destino,
+        )
+
+    def correos(self) -> list:
+        return sorted((mensaje.to, mensaje.subject) for mensaje in self.enviados)
+
+    def test_resumen_por_destinatario(self):
+        # La directa y la del rol llegan al responsable en un resumen; el otro consultor solo recibe la del rol
+        self.crea('Directa', id_usuario=self.responsables[0])
+        self.crea('Por rol', id_rol=self.rol, externo=0)
+
+        send_mails()
+
+        self.assertEqual(self.correos(), [
+            (['otro@pm.mx'], 'Por rol'),
+            (['responsable@pm.mx'], 'Resumen de 2 notificaciones'),
+        ])
+        self.assertEqual(Notificaciones.objects.filter(usuario_modifica=mail_queue.USUARIO_ENVIADO).count(), 2)
+
+    def test_template_excluido_va_solo(self):
+        self.crea('Primera', id_usuario=self.responsables[0])
+        self.crea('Segunda', id_usuario=self.responsables[0])
+
+        with override_settings(MAIL_DIGEST_EXCLUDE=['mail/notificacion.html']):
+            send_mails()
+
+        self.assertEqual(self.correos(), [(['responsable@pm.mx'], 'Primera'), (['responsable@pm.mx'], 'Segunda')])
+
+    def test_ventana_reclama_recientes_del_destino(self):
+        vencida = self.crea('Vencida', id_usuario=self.responsables[0])
+        reciente = self.crea('Reciente', minutos=1, id_usuario=self.responsables[0])
+        self.crea('De otro usuario', minutos=1, id_usuario=self.responsables[1])
+        self.crea('Por rol', minutos=1, id_rol=self.rol, externo=0)
+
+        self.assertEqual(set(mail_queue.pendientes().values_list('id', flat=True)), {vencida.id, reciente.id})
+
+        send_mails()
+
+        self.assertEqual(self.correos(), [(['responsable@pm.mx'], 'Resumen de 2 notificaciones')])
+
+    @override_settings(MAIL_DIGEST_SUBJECT='Tienes {total} avisos pendientes')
+    def test_render_resumen(self):
+        self.crea('Entregable atrasado', id_usuario=self.responsables[0])
+        self.crea('Entregable aprobado', id_usuario=self.responsables[0])
+
+        send_mails()
+
+        [mensaje] = self.enviados
+        self.assertEqual(mensaje.subject, 'Tienes 2 avisos pendientes')
+        cuerpo = mensaje.alternatives[0][0]
+        self.assertIn('Tienes 2 notificaciones nuevas', cuerpo)
+        self.assertIn('Entregable atrasado', cuerpo)
+        self.assertIn('Entregable aprobado', cuerpo)
+
+
+def nueva_notificacion(**campos) -> Notificaciones:
+    return Notificaciones(
+        **{'titulo': 'Notificación', 'texto': 'Texto', 'template': 'mail/notificacion.html', 'datos': {},
+           'fecha_alta': now(), **campos}
+    )
+
+
+def bandeja() -> set:
+    return set(BandejaNotificacion.objects.values_list('id_notificacion', 'id_usuario'))
+
+
+def contadores() -> dict:
+    return dict(ContadorNotificaciones.objects.values_list('id_usuario', 'visibles'))
+
+
+class BandejaTest(DatosSla, TestCase):
+    """El trigger distribuye cada notificación a la bandeja y al contador de sus destinatarios al insertarla"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.crea_catalogos()
+        for usuario in cls.responsables[:2]:
+            UsuarioOrdenServicio.objects.create(id_usuario=usuario, id_orden=cls.ordenes[0])
+        cls.externo = Usuario.objects.get(email='cliente0@cliente.mx')
+
+    def test_distribuye_al_insertar(self):
+        directa, internos, externos, *_ = Notificaciones.objects.bulk_create([
+            nueva_notificacion(id_usuario=self.responsables[2]),
+            nueva_notificacion(id_rol=self.rol, id_orden=self.ordenes[0], externo=0),
+            nueva_notificacion(id_rol=self.rol_cliente, id_orden=self.ordenes[0], externo=1),
+            # Orden sin usuarios asignados y notificación ya dada de baja: no tienen destinatarios
+            nueva_notificacion(id_rol=self.rol, id_orden=self.ordenes[1], externo=0),
+            nueva_notificacion(id_usuario=self.responsables[0], fecha_baja=now()),
+        ])
+
+        self.assertEqual(bandeja(), {
+            (directa.id, self.responsables[2].id),
+            (internos.id, self.responsables[0].id),
+            (internos.id, self.responsables[1].id),
+            (externos.id, self.externo.id),
+        })
+        self.assertEqual(contadores(), {
+            self.responsables[0].id: 1, self.responsables[1].id: 1, self.responsables[2].id: 1, self.externo.id: 1,
+        })
+
+        nueva_notificacion(id_usuario=self.responsables[2]).save()
+        self.assertEqual(contadores()[self.responsables[2].id], 2)
+
+    def test_se_revierte_con_la_transaccion(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            nueva_notificacion(id_usuario=self.responsables[0]).save()
+            raise RuntimeError('falla el job después de insertar')
+
+        self.assertEqual((bandeja(), contadores()), (set(), {}))
+
+
+class BandejaConcurrenteTest(TransactionTestCase):
+    """Una notificación que se confirma después de otra con id mayor también llega a la bandeja"""
+
+    def setUp(self):
+        ajusta_esquema()
+        rol = Rol.objects.create(rol='Consultor')
+        # Destinatarios distintos: el contador de un mismo usuario serializa las dos transacciones
+        self.lento = Usuario.objects.create(email='lento@pm.mx', id_rol=rol)
+        self.rapido = Usuario.objects.create(email='rapido@pm.mx', id_rol=rol)
+
+    def test_confirmacion_tardia(self):
+        insertada, confirmar = threading.Event(), threading.Event()
+        lenta = nueva_notificacion(id_usuario=self.lento)
+
+        def transaccion_lenta():
+            try:
+                with transaction.atomic():
+                    lenta.save()
+                    insertada.set()
+                    confirmar.wait(5)
+            finally:
+                connection.close()
+
+        hilo = threading.Thread(target=transaccion_lenta)
+        hilo.start()
+        self.addCleanup(hilo.join)
+        self.assertTrue(insertada.wait(5))
+
+        rapida = nueva_notificacion(id_usuario=self.rapido)
+        rapida.save()
+        self.assertEqual(bandeja(), {(rapida.id, self.rapido.id)})
+
+        confirmar.set()
+        hilo.join()
+
+        self.assertLess(lenta.id, rapida.id)
+        self.assertEqual(bandeja(), {(lenta.id, self.lento.id), (rapida.id, self.rapido.id)})
+        self.assertEqual(contadores(), {self.lento.id: 1, self.rapido.id: 1})
+
+
+class ContadoresTest(DatosSla, JobTestCase):
+    """count lee el contador, que se mantiene en la misma transacción al insertar y al dar de baja"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.crea_catalogos()
+        cls.usuario, cls.otro = cls.responsables[:2]
+        for usuario in (cls.usuario, cls.otro):
+            UsuarioOrdenServicio.objects.create(id_usuario=usuario, id_orden=cls.ordenes[0])
+
+        cls.directas = Notificaciones.objects.bulk_create(
+            [nueva_notificacion(id_usuario=cls.usuario) for _ in range(3)]
+        )
+        cls.por_rol = nueva_notificacion(id_rol=cls.rol, id_orden=cls.ordenes[0], externo=0)
+        cls.por_rol.save()
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def count(self) -> int:
+        return self.client.get('/notificaciones/count/').json()['count']
+
+    def test_count_es_una_consulta_al_contador(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.count(), 4)
+        self.assertEqual(contadores(), {self.usuario.id: 4, self.otro.id: 1})
+
+    def test_dismiss_descuenta_a_todos_los_destinatarios(self):
+        ids = [self.directas[0].id, self.por_rol.id]
+        self.assertEqual(self.client.post('/notificaciones/dismiss/', {'ids': ids}, format='json').json()['count'], 2)
+        self.assertEqual(contadores(), {self.usuario.id: 2, self.otro.id: 0})
+
+        # Repetir la petición no vuelve a descontar
+        self.assertEqual(self.client.post('/notificaciones/dismiss/', {'ids': ids}, format='json').json()['count'], 0)
+        self.assertEqual(self.count(), 2)
+
+    def test_partial_update_descuenta_una_vez(self):
+        url = f'/notificaciones/{self.directas[1].id}/'
+        self.assertEqual(self.client.patch(url, {}, format='json').status_code, 200)
+        self.assertEqual(self.count(), 3)
+
+        self.assertEqual(self.client.patch(url, {}, format='json').status_code, 404)
+        self.assertEqual(self.count(), 3)
+
+    def test_baja_de_notificaciones_descuenta(self):
+        Notificaciones.objects.filter(id__in=[self.directas[2].id, self.por_rol.id]).update(
+            fecha_alta=now() - timedelta(days=6)
+        )
+
+        getattr(scheduler_manager, '__baja_de_notificaciones')()
+
+        self.assertEqual(contadores(), {self.usuario.id: 2, self.otro.id: 0})
+
+    def test_reconcilia_solo_los_desviados(self):
+        ContadorNotificaciones.objects.filter(id_usuario=self.otro).update(visibles=99)
+
+        self.assertEqual(reconcilia_contadores(), 1)
+        self.assertEqual(contadores(), {self.usuario.id: 4, self.otro.id: 1})
+        self.assertEqual(reconcilia_contadores(), 0)
+
+
+class DismissTest(DatosSla, TestCase):
+    """dismiss da de baja en un UPDATE solo lo que el usuario ve, descuenta los contadores y valida la entrada"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.crea_catalogos()
+        cls.usuario, cls.otro, _ = cls.responsables
+        UsuarioOrdenServicio.objects.create(id_usuario=cls.usuario, id_orden=cls.ordenes[0])
+        UsuarioOrdenServicio.objects.create(id_usuario=cls.otro, id_orden=cls.ordenes[1])
+
+        (cls.propia, cls.ajena, cls.por_rol, cls.por_rol_ajena, cls.dada_de_baja,
+         cls.posterior) = Notificaciones.objects.bulk_create([
+            nueva_notificacion(id_usuario=cls.usuario),
+            nueva_notificacion(id_usuario=cls.otro),
+            nueva_notificacion(id_rol=cls.rol, id_orden=cls.ordenes[0], externo=0),
+            nueva_notificacion(id_rol=cls.rol, id_orden=cls.ordenes[1], externo=0),
+            nueva_notificacion(id_usuario=cls.usuario, fecha_baja=now(), usuario_baja='otro proceso'),
+            nueva_notificacion(id_usuario=cls.usuario),
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def dismiss(self, datos):
+        return self.client.post('/notificaciones/dismiss/', datos, format='json')
+
+    def vigentes(self) -> set:
+        return set(Notificaciones.objects.filter(fecha_baja__isnull=True).values_list('id', flat=True))
+
+    def da_de_baja_solo_las_visibles(self):
+        todas = [self.propia.id, self.ajena.id, self.por_rol.id, self.por_rol_ajena.id, self.dada_de_baja.id]
+
+        self.assertEqual(self.dismiss({'ids': todas}).json(), {'count': 2})
+
+        self.assertEqual(self.vigentes(), {self.ajena.id, self.por_rol_ajena.id, self.posterior.id})
+        self.assertEqual(
+            set(Notificaciones.objects.filter(usuario_baja=str(self.usuario.id)).values_list('id', flat=True)),
+            {self.propia.id, self.por_rol.id},
+        )
+        self.assertEqual(contadores(), {self.usuario.id: 1, self.otro.id: 2})
+
+    def test_ids(self):
+        self.da_de_baja_solo_las_visibles()
+
+    @override_settings(NOTIFICACIONES_BANDEJA=True)
+    def test_ids_con_bandeja(self):
+        self.da_de_baja_solo_las_visibles()
+
+    def test_hasta_id(self):
+        self.assertEqual(self.dismiss({'hasta_id': self.por_rol_ajena.id}).json(), {'count': 2})
+
+        self.assertEqual(self.vigentes(), {self.ajena.id, self.por_rol_ajena.id, self.posterior.id})
+        self.assertEqual(contadores(), {self.usuario.id: 1, self.otro.id: 2})
+
+    def test_rechaza_entrada_invalida(self):
+        for datos in ({}, {'ids': 'todas'}, {'ids': ['uno']}, {'ids': [None]}, {'hasta_id': 'x'}):
+            with self.subTest(datos=datos):
+                self.assertEqual(self.dismiss(datos).status_code, 400)
+
+        self.assertEqual(len(self.vigentes()), 5)
+        self.assertEqual(contadores(), {self.usuario.id: 3, self.otro.id: 2})
+
+
+@mock.patch('notificaciones.stream.close_old_connections')
+class StreamTest(DatosSla, TestCase):
+    """El stream solo se atiende bajo ASGI y reparte cada notificación nueva una vez a sus destinatarios conectados"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.crea_catalogos()
+        cls.usuario, cls.otro, _ = cls.responsables
+        cls.token = str(AccessToken.for_user(cls.usuario))
+
+    def setUp(self):
+        self.listener = NotificacionesListener()
+        parche = mock.patch('notificaciones.views.listener', self.listener)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def notifica(self, usuario) -> Notificaciones:
+        notificacion = nueva_notificacion(id_usuario=usuario)
+        notificacion.save()
+        return notificacion
+
+    def test_wsgi_responde_501(self, close_old_connections):
+        respuesta = self.client.get('/notificaciones/stream/', {'token': self.token})
+
+        self.assertEqual(respuesta.status_code, 501)
+
+    async def test_token_invalido_401(self, close_old_connections):
+        respuesta = await AsyncClient().get('/notificaciones/stream/', {'token': 'no-es-un-jwt'})
+
+        self.assertEqual(respuesta.status_code, 401)
+
+    async def test_sin_listener_503(self, close_old_connections):
+        respuesta = await AsyncClient().get('/notificaciones/stream/', {'token': self.token})
+
+        self.assertEqual(respuesta.status_code, 503)
+
+    async def test_envia_las_notificaciones_nuevas(self, close_old_connections):
+        self.listener._tarea = asyncio.get_running_loop().create_future()
+        respuesta = await AsyncClient().get('/notificaciones/stream/', {'token': self.token})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+
+        eventos = aiter(respuesta.streaming_content)
+        self.assertEqual(await anext(eventos), b'retry: 5000\n\n')
+
+        notificacion = await sync_to_async(self.notifica)(self.usuario)
+        await self.listener._reparte([f'{notificacion.id},{notificacion.id}'])
+
+        evento = (await anext(eventos)).decode()
+        self.assertTrue(evento.startswith(f'id: {notificacion.id}\nevent: notificacion\ndata: '))
+        self.assertEqual(json.loads(evento.split('data: ', 1)[1])['id'], notificacion.id)
+
+        # El cliente se desconecta: el servidor cancela la tarea que espera el siguiente evento
+        siguiente = asyncio.ensure_future(anext(eventos))
+        await asyncio.sleep(0)
+        siguiente.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await siguiente
+        self.assertEqual(dict(self.listener._suscriptores), {})
+
+    async def test_reparte_una_vez_a_los_suscritos(self, close_old_connections):
+        cola = self.listener.suscribe(self.usuario.id)
+        propia, ajena = [await sync_to_async(self.notifica)(usuario) for usuario in (self.usuario, self.otro)]
+        rango = f'{propia.id},{ajena.id}'
+
+        await self.listener._reparte([rango])
+        # Otra transacción avisa un rango que se traslapa con el anterior
+        await self.listener._reparte([rango, f'{ajena.id},{ajena.id}'])
+
+        self.assertEqual(cola.qsize(), 1)
+        self.assertEqual(cola.get_nowait()['id'], propia.id)
+
+
+class ConListenerTest(SimpleTestCase):
+    """El LISTEN arranca en el loop del servidor con el lifespan de ASGI y se detiene al apagarlo"""
+
+    async def test_lifespan(self):
+        prueba = NotificacionesListener()
+        escuchando = asyncio.Event()
+
+        async def escucha():
+            escuchando.set()
+            await asyncio.Event().wait()
+
+        aplicacion = mock.AsyncMock()
+        mensajes = asyncio.Queue()
+        enviados = []
+
+        async def envia(mensaje):
+            enviados.append(mensaje['type'])
+
+        with mock.patch('notificaciones.stream.listener', prueba), mock.patch.object(prueba, '_escucha', escucha):
+            asgi = con_listener(aplicacion)
+            mensajes.put_nowait({'type': 'lifespan.startup'})
+            servidor = asyncio.create_task(asgi({'type': 'lifespan'}, mensajes.get, envia))
+
+            await asyncio.wait_for(escuchando.wait(), 1)
+            self.assertTrue(prueba.activo)
+            self.assertIs(prueba._tarea.get_loop(), asyncio.get_running_loop())
+
+            mensajes.put_nowait({'type': 'lifespan.shutdown'})
+            await asyncio.wait_for(servidor, 1)
+
+            await asgi({'type': 'http'}, mensajes.get, envia)
+
+        self.assertFalse(prueba.activo)
+        self.assertEqual(enviados, ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+        aplicacion.assert_awaited_once_with({'type': 'http'}, mensajes.get, envia)
+
+
+class PorRangosTest(TestCase):
+    """Cada fila que cumple el predicado se procesa una vez, sin importar los huecos ni lo que llegue en la corrida"""
+
+    @classmethod
+    def setUpTestData(cls):
+        ajusta_esquema()
+        cls.usuario = Usuario.objects.create(email='a@pm.mx', id_rol=Rol.objects.create(rol='Consultor'))
+        cls.ids = [notificacion.id for notificacion in Notificaciones.objects.bulk_create(
+            [nueva_notificacion(id_usuario=cls.usuario) for _ in range(11)]
+        )]
+        # El predicado deja huecos dentro de los rangos e incluye el primero y el último id
+        cls.antiguas = cls.ids[0:2] + cls.ids[5:6] + cls.ids[7:11]
+        Notificaciones.objects.filter(id__in=cls.antiguas).update(fecha_alta=now() - timedelta(days=6))
+
+    def setUp(self):
+        self.rangos = []
+
+    def purga(self, tamano=3):
+        return por_rangos('Prueba', scheduler_manager.notificaciones_por_dar_de_baja(), self.baja, tamano, pausa=0)
+
+    def baja(self, notificaciones):
+        self.rangos.append(sorted(notificaciones.values_list('id', flat=True)))
+        return getattr(scheduler_manager, '__baja_lote')(notificaciones)
+
+    def dadas_de_baja(self) -> list:
+        return sorted(Notificaciones.objects.filter(fecha_baja__isnull=False).values_list('id', flat=True))
+
+    def test_limites_de_los_rangos(self):
+        self.assertEqual(self.purga(), len(self.antiguas))
+
+        # Rangos (min - 1, min + 2], ... hasta el máximo: 11 ids en rangos de 3 son 3 rangos completos y uno parcial
+        self.assertEqual(self.rangos, [self.ids[0:2], self.ids[5:6], self.ids[7:9], self.ids[9:11]])
+        self.assertEqual(self.dadas_de_baja(), self.antiguas)
+        self.assertEqual(self.purga(), 0)
+
+    def test_un_solo_rango(self):
+        self.assertEqual(self.purga(tamano=100), len(self.antiguas))
+        self.assertEqual(self.rangos, [self.antiguas])
+
+    def test_filas_que_llegan_durante_la_purga(self):
+        procesa = self.baja
+        llegadas = []
+
+        def llega_y_procesa(notificaciones):
+            if not llegadas:
+                # Una fila nueva (id mayor al máximo calculado) y una existente que empieza a cumplir el predicado
+                nueva = nueva_notificacion(id_usuario=self.usuario, fecha_alta=now() - timedelta(days=6))
+                nueva.save()
+                llegadas.append(nueva.id)
+                Notificaciones.objects.filter(id=self.ids[3]).update(fecha_alta=now() - timedelta(days=6))
+            return procesa(notificaciones)
+
+        self.baja = llega_y_procesa
+        self.assertEqual(self.purga(), len(self.antiguas) + 1)
+        self.assertEqual(self.dadas_de_baja(), sorted(self.antiguas + [self.ids[3]]))
+
+        # La nueva queda para la siguiente corrida
+        self.baja = procesa
+        self.assertEqual(self.purga(), 1)
+        self.assertEqual(self.dadas_de_baja(), sorted(self.antiguas + [self.ids[3]] + llegadas))
+
+    @mock.patch('notificaciones.tasks.purga.es_lider', side_effect=[True, False])
+    def test_se_detiene_al_perder_el_liderazgo(self, es_lider):
+        self.assertEqual(self.purga(), 2)
+        self.assertEqual(self.dadas_de_baja(), self.ids[0:2])
+
+
+@override_settings(
+    NOTIFICACIONES_PARTICIONADA=True, NOTIFICACIONES_PARTITION_INTERVAL='day', NOTIFICACIONES_PARTITIONS_AHEAD=2,
+    NOTIFICACIONES_RETENTION_DAYS=12,
+)
+class ParticionesTest(JobTestCase):
+    """La tabla particionada tiene llave primaria con STP_ALTA_REGISTRO y sus particiones se crean y vencen por registro"""
+
+    def setUp(self):
+        super().setUp()
+        ajusta_esquema()
+        self.hoy = date.today()
+        self.usuario = Usuario.objects.create(email='a@pm.mx', id_rol=Rol.objects.create(rol='Consultor'))
+        self.vieja, self.reciente = Notificaciones.objects.bulk_create([
+            nueva_notificacion(id_usuario=self.usuario, fecha_alta=now() - timedelta(days=20)),
+            nueva_notificacion(id_usuario=self.usuario),
+        ])
+
+        with connection.cursor() as cursor:
+            # En la base real la bandeja no tiene llave foránea hacia las notificaciones
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute(
+                'SELECT conname FROM pg_constraint WHERE contype = %s AND confrelid = %s::regclass',
+                ['f', '"EPMT_NOTIFICACIONES"']
+            )
+            for (nombre,) in cursor.fetchall():
+                cursor.execute(f'ALTER TABLE "EPMT_BANDEJA_NOTIFICACIONES" DROP CONSTRAINT "{nombre}"')
+
+        self.resultado = convierte_tabla()
+
+    def particion_de(self, notificacion) -> str:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT tableoid::regclass::text FROM "EPMT_NOTIFICACIONES" WHERE "ID_NOTIFICACION" = %s',
+                [notificacion.id]
+            )
+            return cursor.fetchone()[0].strip('"')
+
+    def registradas(self) -> list:
+        return list(ParticionNotificaciones.objects.order_by('fecha_inicio').values_list('fecha_inicio', 'fecha_fin'))
+
+    def test_convierte_con_llave_primaria(self):
+        self.assertEqual(self.resultado['filas'], 2)
+
+        with connection.cursor() as cursor:
+            cursor.execute('''
+                SELECT a.attname
+                FROM pg_index i
+                JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+                WHERE i.indrelid = '"EPMT_NOTIFICACIONES"'::regclass AND i.indisprimary
+                ORDER BY array_position(i.indkey, a.attnum)
+            ''')
+            self.assertEqual([fila[0] for fila in cursor.fetchall()], ['ID_NOTIFICACION', 'STP_ALTA_REGISTRO'])
+
+        # Una partición diaria registrada desde la notificación más antigua hasta dos días adelante, sin huecos
+        self.assertEqual(self.registradas(), [
+            (self.hoy - timedelta(days=dias), self.hoy - timedelta(days=dias - 1)) for dias in range(20, -3, -1)
+        ])
+        self.assertEqual(self.particion_de(self.vieja), f'EPMT_NOTIFICACIONES_P{self.hoy - timedelta(days=20):%Y%m%d}')
+
+        # STP_ALTA_REGISTRO toma el default de la base; fuera de los rangos cae en la partición DEFAULT
+        nueva = Notificaciones.objects.create(
+            id_usuario=self.usuario, titulo='Sin fecha', texto='', template='mail/notificacion.html', datos={}
+        )
+        futura = nueva_notificacion(id_usuario=self.usuario, fecha_alta=now() + timedelta(days=30))
+        futura.save()
+        self.assertEqual(self.particion_de(nueva), f'EPMT_NOTIFICACIONES_P{self.hoy:%Y%m%d}')
+        self.assertEqual(self.particion_de(futura), 'EPMT_NOTIFICACIONES_DEFAULT')
+        self.assertEqual(bandeja(), {(notificacion.id, self.usuario.id) for notificacion in
+                                     (self.vieja, self.reciente, nueva, futura)})
+
+    def test_mantiene_particiones(self):
+        en_tres_dias = now() + timedelta(days=3)
+        with mock.patch('notificaciones.tasks.particiones_task.timezone.now', return_value=en_tres_dias):
+            mantiene_particiones()
+
+        # Vencen las que terminan a más tardar 12 días antes de la fecha de la corrida
+        self.assertEqual(self.registradas(), [
+            (self.hoy - timedelta(days=dias), self.hoy - timedelta(days=dias - 1)) for dias in range(9, -6, -1)
+        ])
+        self.assertEqual(list(Notificaciones.objects.values_list('id', flat=True)), [self.reciente.id])
+        self.assertEqual(bandeja(), {(self.reciente.id, self.usuario.id)})
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT to_regclass(%s)', [f'"EPMT_NOTIFICACIONES_P{self.hoy - timedelta(days=10):%Y%m%d}"'])
+            self.assertIsNone(cursor.fetchone()[0])
+
+    @override_settings(NOTIFICACIONES_PARTITION_INTERVAL='week')
+    def test_particiones_semanales(self):
+        with connection.cursor() as cursor:
+            creadas = crea_particiones(cursor, self.hoy + timedelta(days=10), self.hoy + timedelta(days=20))
+
+        semanas = ParticionNotificaciones.objects.filter(nombre__in=creadas).order_by('fecha_inicio')
+        self.assertIn(len(creadas), (2, 3))
+        for particion in semanas:
+            self.assertEqual(particion.fecha_inicio.weekday(), 0)
+            self.assertEqual(particion.fecha_fin - particion.fecha_inicio, timedelta(days=7))
+
+    def test_eliminacion_por_filas_solo_en_default(self):
+        futura = nueva_notificacion(id_usuario=self.usuario, fecha_alta=now() + timedelta(days=30))
+        futura.save()
+        Notificaciones.objects.filter(id__in=[self.reciente.id, futura.id]).update(fecha_baja=now() - timedelta(days=8))
+
+        self.assertEqual(
+            list(scheduler_manager.notificaciones_por_eliminar().values_list('id', flat=True)), [futura.id]
+        )
+
+
+class EntregaDocumentosTest(DatosSla, JobTestCase):
+    """Cada entregable con entrega de documentos ayer recibe una sola versión mayor, aunque el job se repita"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.crea_catalogos()
+        ayer = date.today() - timedelta(days=1)
+        orden_etapa = OrdenEtapa.objects.create(id_orden=cls.ordenes[0], id_etapa=Etapa.objects.create(nombre='Sprint'))
+        sprint_ayer = OrdenSprint.objects.create(id_orden_etapa=orden_etapa, fecha_entrega_documentos=ayer)
+        sprint_hoy = OrdenSprint.objects.create(id_orden_etapa=orden_etapa, fecha_entrega_documentos=date.today())
+
+        cls.entregable = cls.crea_entregable(sprint_ayer, estatus=3, versiones=[(0, 1), (1, 2), (1, 1)])
+        cls.otra_fecha = cls.crea_entregable(sprint_hoy, estatus=3, versiones=[(0, 1)])
+        cls.cerrado = cls.crea_entregable(sprint_ayer, estatus=7, versiones=[(0, 1)])
+        cls.sin_archivos = cls.crea_entregable(sprint_ayer, estatus=3, versiones=[])
+
+    @classmethod
+    def crea_entregable(cls, sprint, estatus, versiones):
+        entregable = Entregable.objects.create(
+            id_orden=cls.ordenes[0], id_responsable=cls.responsables[0], id_estatus=cls.estatus[estatus],
+            nombre='Entregable', fecha_inicio=date.today(),
+        )
+        EntregableSprint.objects.create(id_entregable=entregable, id_sprint=sprint)
+        for major, minor in versiones:
+            cls.sube_version(entregable, major, minor)
+        return entregable
+
+    @staticmethod
+    def sube_version(entregable, major, minor):
+        return EntregableArchivo.objects.create(
+            id_entregable=entregable, major_version=major, minor_version=minor, nombre=f'v{major}.{minor}.docx',
+            extension='docx', path=f'v{major}.{minor}.docx', file_hash='', sla_actual='', sla_cliente='',
+            usuario_alta='consultor', fecha_alta=now(),
+        )
+
+    def versiones(self, entregable):
+        return list(
+            EntregableArchivo.objects.filter(id_entregable=entregable)
+            .order_by('major_version', 'minor_version').values_list('major_version', 'minor_version', 'usuario_alta')
+        )
+
+    def test_crea_version_mayor_a_partir_de_la_ultima(self):
+        actualiza_version_entregables()
+
+        self.assertEqual(self.versiones(self.entregable), [
+            (0, 1, 'consultor'), (1, 1, 'consultor'), (1, 2, 'consultor'), (2, 0, USUARIO_JOB),
+        ])
+        nueva = EntregableArchivo.objects.get(id_entregable=self.entregable, major_version=2)
+        self.assertEqual((nueva.nombre, nueva.path.name), ('v1.2.docx', 'v1.2.docx'))
+        for entregable in (self.otra_fecha, self.cerrado):
+            self.assertEqual(self.versiones(entregable), [(0, 1, 'consultor')])
+        self.assertEqual(
+            list(VersionEntregaDocumentos.objects.values_list('id_entregable', 'fecha_entrega')),
+            [(self.entregable.id, date.today() - timedelta(days=1))],
+        )
+
+    def test_repetir_no_versiona_de_nuevo(self):
+        actualiza_version_entregables()
+        actualiza_version_entregables()
+
+        self.assertEqual(self.versiones(self.entregable)[-1], (2, 0, USUARIO_JOB))
+        self.assertEqual(len(self.versiones(self.entregable)), 4)
+
+    def test_version_menor_despues_de_la_corrida(self):
+        actualiza_version_entregables()
+        # El consultor sube una corrección sobre la versión que creó el job, y el job vuelve a correr el mismo día
+        self.sube_version(self.entregable, 2, 1)
+        actualiza_version_entregables()
+
+        self.assertEqual(self.versiones(self.entregable)[-2:], [(2, 0, USUARIO_JOB), (2, 1, 'consultor')])
+
+    def test_falla_sin_dejar_marcas(self):
+        with mock.patch.object(EntregableArchivo.objects, 'bulk_create', side_effect=RuntimeError('sin espacio')):
+            with self.assertRaises(RuntimeError):
+                actualiza_version_entregables()
+
+        self.assertFalse(VersionEntregaDocumentos.objects.exists())
+        actualiza_version_entregables()
+        self.assertEqual(self.versiones(self.entregable)[-1], (2, 0, USUARIO_JOB))
+
+
+class BusinessCalendarTest(SimpleTestCase):
+    """Las sumas prefijas cuentan lo mismo que el recorrido día por día de la versión anterior"""
+
+    # Inhábiles en día hábil y en fin de semana, alrededor de dos cambios de año
+    DIAS_INHABILES = {
+        date(2024, 12, 25), date(2024, 12, 28), date(2025, 1, 1), date(2025, 2, 3), date(2025, 5, 1),
+        date(2025, 9, 16), date(2025, 11, 2), date(2025, 12, 25), date(2025, 12, 31), date(2026, 1, 1),
+        date(2026, 1, 3),
+    }
+
+    def fechas(self, inicio, fin, paso):
+        dia = inicio
+        while dia <= fin:
+            yield dia
+            dia += timedelta(days=paso)
+
+    def test_conteos_iguales_al_recorrido_por_dia(self):
+        # El rango inicial es menor que el consultado para que el calendario tenga que crecer
+        calendario = BusinessCalendar(self.DIAS_INHABILES, date(2025, 6, 1), date(2025, 6, 30))
+        inicios = list(self.fechas(date(2024, 12, 1), date(2026, 1, 31), 5))
+
+        for fin in self.fechas(date(2024, 12, 20), date(2026, 2, 15), 9):
+            esperados = [dias_habiles_por_fila(inicio, fin, self.DIAS_INHABILES) for inicio in inicios]
+            self.assertEqual(calendario.business_days_since(inicios, fin), esperados, fin)
+            for inicio, esperado in zip(inicios, esperados):
+                self.assertEqual(calendario.business_days_between(inicio, fin), esperado, (inicio, fin))
+
+    def test_fecha_del_dia_habil(self):
+        calendario = BusinessCalendar(self.DIAS_INHABILES, date(2025, 12, 1), date(2025, 12, 5))
+
+        for inicio in self.fechas(date(2024, 12, 20), date(2026, 1, 5), 4):
+            for n in (1, 2, 5, 10, 30):
+                dia = calendario.date_for_business_day(inicio, n)
+                self.assertEqual(dias_habiles_por_fila(inicio, dia, self.DIAS_INHABILES), n, (inicio, n))
+                self.assertTrue(calendario.es_habil(dia), (inicio, n))
+
+    def test_inicio_nulo_o_posterior(self):
+        calendario = BusinessCalendar(self.DIAS_INHABILES)
+
+        self.assertEqual(
+            calendario.business_days_since([None, date(2026, 1, 5), date(2025, 12, 31)], date(2026, 1, 2)),
+            [None, 0, dias_habiles_por_fila(date(2025, 12, 31), date(2026, 1, 2), self.DIAS_INHABILES)],
+        )
+        self.assertEqual(calendario.business_days_between(date(2026, 1, 5), date(2026, 1, 2)), 0)
+
+
+class TrabajosEnCursoTest(SimpleTestCase):
+    """Al perder el liderazgo se puede esperar a que terminen las tareas que ya estaban corriendo"""
+
+    def test_espera_a_la_tarea_en_curso(self):
+        iniciada, liberar = threading.Event(), threading.Event()
+
+        @instrumenta_job('prueba_en_curso')
+        def tarea():
+            iniciada.set()
+            liberar.wait(5)
+
+        hilo = threading.Thread(target=tarea)
+        hilo.start()
+        self.addCleanup(hilo.join)
+        self.assertTrue(iniciada.wait(5))
+        self.assertFalse(trabajos_en_curso.espera(0.1))
+
+        liberar.set()
+        self.assertTrue(trabajos_en_curso.espera(5))
+
+
+class PaginacionTest(DatosSla, TestCase):
+    """since_id avanza desde el id dado sin saltar notificaciones y count no depende de la página"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.crea_catalogos()
+        cls.usuario = cls.responsables[0]
+        cls.ids = [
+            Notificaciones.objects.create(
+                id_usuario=cls.usuario, titulo=f'Notificación {indice}', texto='', template='mail/notificacion.html',
+                datos={}, fecha_alta=now(),
+            ).id
+            for indice in range(30)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def test_since_id_regresa_las_siguientes(self):
+        respuesta = self.client.get('/notificaciones/', {'since_id': self.ids[4], 'page_size': 10}).json()
+
+        self.assertEqual([notificacion['id'] for notificacion in respuesta['results']], self.ids[5:15][::-1])
+        self.assertEqual(respuesta['next_since_id'], self.ids[14])
+        self.assertIsNone(respuesta['next_cursor'])
+
+        respuesta = self.client.get('/notificaciones/', {'since_id': respuesta['next_since_id'], 'page_size': 20}).json()
+        self.assertEqual([notificacion['id'] for notificacion in respuesta['results']], self.ids[15:][::-1])
+        self.assertIsNone(respuesta['next_since_id'])
+
+    def test_cursor_regresa_las_anteriores(self):
+        respuesta = self.client.get('/notificaciones/', {'cursor': self.ids[20], 'page_size': 10}).json()
+
+        self.assertEqual([notificacion['id'] for notificacion in respuesta['results']], self.ids[10:20][::-1])
+        self.assertEqual(respuesta['next_cursor'], self.ids[10])
+
+    @override_settings(NOTIFICACIONES_PAGE_SIZE=10, NOTIFICACIONES_MAX_PAGE_SIZE=25)
+    def test_pagina_por_defecto_y_tamano_maximo(self):
+        respuesta = self.client.get('/notificaciones/').json()
+
+        self.assertEqual([notificacion['id'] for notificacion in respuesta['results']], self.ids[20:][::-1])
+        self.assertEqual(respuesta['next_cursor'], self.ids[20])
+
+        respuesta = self.client.get('/notificaciones/', {'page_size': 1000}).json()
+        self.assertEqual([notificacion['id'] for notificacion in respuesta['results']], self.ids[5:][::-1])
+        self.assertEqual(respuesta['next_cursor'], self.ids[5])
+
+    def test_count_no_se_acota_a_la_pagina(self):
+        respuesta = self.client.get('/notificaciones/count/', {'page_size': 5}).json()
+
+        self.assertEqual(respuesta['count'], 30)
+
+
+class IndicesParcialesTest(DatosSla, TestCase):
+    """Los predicados de los índices parciales coinciden con el SQL que el código realmente emite"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.crea_catalogos()
+        with connection.cursor() as cursor:
+            for nombre, tabla, definicion in INDICES:
+                cursor.execute(ddl_indice(nombre, tabla, definicion, concurrente=False))
+
+    def test_predicados(self):
+        with connection.cursor() as cursor:
+            for nombre, indices, consulta in consultas_frecuentes(self.responsables[0]):
+                with self.subTest(nombre):
+                    self.assertEqual(predicados_sin_coincidencia(cursor, consulta, indices), [])
+
+    @override_settings(NOTIFICACIONES_BANDEJA=True, NOTIFICACIONES_PAGE_SIZE=3)
+    def test_listados_iguales_a_la_primera_pagina(self):
+        usuario = self.responsables[0]
+        UsuarioOrdenServicio.objects.create(id_usuario=usuario, id_orden=self.ordenes[0])
+        Notificaciones.objects.bulk_create(
+            [nueva_notificacion(id_usuario=usuario) for _ in range(3)]
+            + [nueva_notificacion(id_rol=self.rol, id_orden=self.ordenes[0], externo=0) for _ in range(3)]
+        )
+        cliente = APIClient()
+        cliente.force_authenticate(usuario)
+        pagina = [notificacion['id'] for notificacion in cliente.get('/notificaciones/').json()['results']]
+
+        consultas = {nombre: consulta for nombre, _, consulta in consultas_frecuentes(usuario)}
+        for nombre in ('listado de notificaciones', 'listado de la bandeja'):
+            with self.subTest(nombre):
+                self.assertEqual([notificacion.id for notificacion in consultas[nombre]][:3], pagina)
+
+
+class SMTPConnectionPoolTest(SimpleTestCase):
+    """Las conexiones del pool sobreviven entre lotes y se reabren solo si expiraron o se perdieron"""
+
+    def setUp(self):
+        self.backends = []
+        self.eventos = []
+        patcher = mock.patch('notificaciones.smtp_pool.get_connection', side_effect=self.nuevo_backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def nuevo_backend(self, **kwargs):
+        backend = mock.Mock(connection=None)
+        backend.open.side_effect = lambda: setattr(backend, 'connection', object())
+        backend.send_messages.side_effect = lambda mensajes: self.eventos.append(('envia', mensajes[0].subject)) or 1
+        self.backends.append(backend)
+        return backend
+
+    def test_reutiliza_conexion_entre_lotes(self):
+        pool = SMTPConnectionPool(tamano=1, max_inactividad=60)
+
+        self.assertEqual(pool.send_many([mock.Mock()] * 3), [True] * 3)
+        self.assertEqual(pool.send_many([mock.Mock()] * 2), [True] * 2)
+
+        self.assertEqual(len(self.backends), 1)
+        self.assertEqual(self.backends[0].open.call_count, 1)
+
+    def test_reabre_conexion_inactiva(self):
+        pool = SMTPConnectionPool(tamano=1, max_inactividad=60)
+        pool.send(mock.Mock())
+
+        with mock.patch('notificaciones.smtp_pool.time.monotonic', return_value=pool._todas[0].ultimo_uso + 61):
+            pool.send(mock.Mock())
+
+        self.assertEqual(self.backends[0].open.call_count, 2)
+        self.assertEqual(self.backends[0].close.call_count, 1)
+
+    def test_reintenta_timeout(self):
+        pool = SMTPConnectionPool(tamano=1)
+        pool.send(mock.Mock())
+        self.backends[0].send_messages.side_effect = [socket.timeout('timed out'), 1]
+
+        self.assertTrue(pool.send(mock.Mock()))
+        self.assertEqual(self.backends[0].open.call_count, 2)
+
+    def test_arma_cada_mensaje_al_enviarlo(self):
+        pool = SMTPConnectionPool(tamano=1)
+
+        def arma(numero):
+            self.eventos.append(('arma', numero))
+            return mock.Mock(subject=numero)
+
+        pool.send_many([lambda numero=numero: arma(numero) for numero in range(3)])
+
+        self.assertEqual(
+            self.eventos, [('arma', 0), ('envia', 0), ('arma', 1), ('envia', 1), ('arma', 2), ('envia', 2)]
+        )
+
+
+class SMTPFalso:
+    """Servidor que acepta todo y guarda lo que recibe después de DATA"""
+
+    def __init__(self):
+        self.comandos = []
+        self.datos = b''
+
+    def ehlo_or_helo_if_needed(self):
+        pass
+
+    def mail(self, remitente):
+        self.comandos.append(('mail', remitente))
+        return 250, b'ok'
+
+    def rcpt(self, destinatario):
+        self.comandos.append(('rcpt', destinatario))
+        return 250, b'ok'
+
+    def docmd(self, comando):
+        self.comandos.append((comando, ))
+        return 354, b'adelante'
+
+    def send(self, datos):
+        self.datos += datos
+
+    def getreply(self):
+        return 250, b'en cola'
+
+    def mensaje(self):
+        """Mensaje recibido, sin el punto final y sin el escape de los puntos al inicio de línea"""
+        if not self.datos.endswith(b'\r\n.\r\n'):
+            raise AssertionError('DATA no terminó en CRLF.CRLF')
+        return email.message_from_bytes(re.sub(rb'(?m)^\.\.', b'.', self.datos[:-3]))
+
+
+class AttachmentCacheTest(SimpleTestCase):
+    """Los adjuntos chicos se codifican una vez; los grandes se envían desde el disco sin cargarse en memoria"""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio)
+
+    def archivo(self, nombre, contenido: bytes) -> str:
+        ruta = os.path.join(self.directorio, nombre)
+        with open(ruta, 'wb') as archivo:
+            archivo.write(contenido)
+        return ruta
+
+    def muestra(self, resultado):
+        return REGISTRY.get_sample_value(
+            'notificaciones_mail_cache_total', {'cache': 'adjuntos', 'resultado': resultado}
+        ) or 0
+
+    def test_hit_miss_y_cambio_de_contenido(self):
+        cache = AttachmentCache(max_bytes=1024 * 1024, max_archivo=1024 * 1024)
+        ruta = self.archivo('reporte.pdf', b'%PDF' * 1000)
+        hits, misses = self.muestra('hit'), self.muestra('miss')
+
+        self.assertEqual(cache.part(ruta).get_payload(decode=True), b'%PDF' * 1000)
+        self.assertEqual(cache.part(ruta).get_payload(decode=True), b'%PDF' * 1000)
+        self.assertEqual((self.muestra('hit') - hits, self.muestra('miss') - misses), (1, 1))
+
+        self.archivo('reporte.pdf', b'%PDF-2' * 1000)
+        self.assertEqual(cache.part(ruta).get_payload(decode=True), b'%PDF-2' * 1000)
+        self.assertEqual(self.muestra('miss') - misses, 2)
+
+    def test_expulsa_los_menos_usados_al_pasar_el_limite(self):
+        rutas = [self.archivo(f'{numero}.pdf', bytes([numero]) * 3000) for numero in range(3)]
+        # Cada payload ocupa ~4 KB en base64: caben dos
+        cache = AttachmentCache(max_bytes=9000, max_archivo=1024 * 1024)
+
+        cache.part(rutas[0])
+        cache.part(rutas[1])
+        cache.part(rutas[0])
+        cache.part(rutas[2])
+
+        self.assertEqual([ruta for ruta, _ in cache._partes], [rutas[0], rutas[2]])
+        self.assertEqual(cache._bytes, sum(len(payload) for payload in cache._partes.values()))
+        self.assertLessEqual(cache._bytes, 9000)
+
+    def test_archivo_grande_no_se_guarda_ni_se_codifica(self):
+        contenido = os.urandom(2 * TAMANO_BLOQUE + 123)
+        ruta = self.archivo('plano.dwg', contenido)
+        cache = AttachmentCache(max_archivo=1024)
+
+        with mock.patch('notificaciones.attachment_cache._codifica') as codifica:
+            parte = cache.part(ruta)
+            lineas = b''.join(parte.lineas_base64())
+
+        codifica.assert_not_called()
+        self.assertIsInstance(parte, AdjuntoEnDisco)
+        self.assertFalse(cache._partes)
+        self.assertEqual(parte['Content-Transfer-Encoding'], 'base64')
+        self.assertFalse(lineas.endswith(b'\r\n'))
+        self.assertTrue(all(len(linea) <= 76 for linea in lineas.split(b'\r\n')))
+        self.assertEqual(base64.b64decode(lineas), contenido)
+        # Fuera del pool se codifica completo, igual que antes
+        self.assertEqual(parte.get_payload(decode=True), contenido)
+        self.assertEqual(base64.b64decode(parte.get_payload()), contenido)
+
+    def test_hilos_concurrentes(self):
+        contenidos = [bytes([numero]) * (1000 + numero) for numero in range(6)]
+        rutas = [self.archivo(f'{numero}.pdf', contenido) for numero, contenido in enumerate(contenidos)]
+        cache = AttachmentCache(max_bytes=6000, max_archivo=1024 * 1024)
+        errores = []
+
+        def adjunta():
+            for _ in range(50):
+                for ruta, contenido in zip(rutas, contenidos):
+                    if cache.part(ruta).get_payload(decode=True) != contenido:
+                        errores.append(ruta)
+
+        hilos = [threading.Thread(target=adjunta) for _ in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(set(cache._hashes), set(rutas))
+        self.assertEqual(cache._bytes, sum(len(payload) for payload in cache._partes.values()))
+        self.assertLessEqual(cache._bytes, 6000)
+
+    def test_pool_envia_el_adjunto_grande_desde_el_disco(self):
+        contenido = os.urandom(TAMANO_BLOQUE + 1000)
+        grande = self.archivo('plano.dwg', contenido)
+        chico = self.archivo('logo.pdf', b'%PDF' * 10)
+        cache = AttachmentCache(max_archivo=1024)
+        smtp = SMTPFalso()
+        backend = mock.Mock(connection=smtp)
+
+        mensaje = EmailMultiAlternatives(
+            subject='Planos', body='.linea que empieza con punto\n..y otra', from_email='avisos@x.com',
+            to=['a@x.com', 'b@x.com'],
+        )
+        mensaje.attach(cache.part(grande))
+        mensaje.attach(cache.part(chico))
+
+        with mock.patch('notificaciones.smtp_pool.get_connection', return_value=backend):
+            self.assertTrue(SMTPConnectionPool(tamano=1).send(mensaje))
+
+        backend.send_messages.assert_not_called()
+        self.assertEqual(
+            smtp.comandos, [('mail', 'avisos@x.com'), ('rcpt', 'a@x.com'), ('rcpt', 'b@x.com'), ('data', )]
+        )
+        self.assertIn(b'\r\n..linea que empieza con punto\r\n...y otra', smtp.datos)
+
+        cuerpo, *adjuntos = smtp.mensaje().get_payload()
+        self.assertEqual(cuerpo.get_payload(), '.linea que empieza con punto\n..y otra'.replace('\n', '\r\n'))
+        self.assertEqual(
+            [(adjunto.get_filename(), adjunto.get_payload(decode=True)) for adjunto in adjuntos],
+            [('plano.dwg', contenido), ('logo.pdf', b'%PDF' * 10)],
+        )
+
+
+class MailRendererMetricsTest(SimpleTestCase):
+    """El tiempo de render, los errores y los renders evitados quedan en las métricas por template"""
+
+    def muestra(self, nombre, template):
+        return REGISTRY.get_sample_value(nombre, {'template': template}) or 0
+
+    def test_registra_renders_deduplicados_y_errores(self):
+        template = 'mail/notificacion.html'
+        renders = self.muestra('notificaciones_mail_render_seconds_count', template)
+        deduplicados = self.muestra('notificaciones_mail_render_deduplicated_total', template)
+        errores = self.muestra('notificaciones_mail_render_errors_total', 'mail/no-existe.html')
+
+        cuerpos = MailRenderer().render_batch([
+            mock.Mock(id=1, template=template, datos={'titulo': 'A'}),
+            mock.Mock(id=2, template=template, datos={'titulo': 'A'}),
+            mock.Mock(id=3, template=template, datos={'titulo': 'B'}),
+            mock.Mock(id=4, template='mail/no-existe.html', datos={}),
+        ])
+
+        self.assertEqual(sorted(cuerpos), [1, 2, 3])
+        self.assertEqual(self.muestra('notificaciones_mail_render_seconds_count', template) - renders, 2)
+        self.assertEqual(self.muestra('notificaciones_mail_render_deduplicated_total', template) - deduplicados, 1)
+        self.assertEqual(self.muestra('notificaciones_mail_render_errors_total', 'mail/no-existe.html') - errores, 1)
+
+
+class InlineImageCacheTest(SimpleTestCase):
+    """Las imágenes embebidas se codifican una vez por proceso y de nuevo solo si cambia el archivo"""
+
+    def setUp(self):
+        self.imagenes = os.path.join(settings.BASE_DIR, 'static', 'images')
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir)
+        os.makedirs(os.path.join(self.base_dir, 'static', 'images'))
+        override = override_settings(BASE_DIR=self.base_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        # La cache es del proceso: un nombre distinto por prueba evita depender del orden
+        self.nombre = f'{self.id().rsplit(".", 1)[-1]}.png'
+        self.ruta = os.path.join(self.base_dir, 'static', 'images', self.nombre)
+
+    def copia(self, imagen, mtime_ns):
+        shutil.copyfile(os.path.join(self.imagenes, imagen), self.ruta)
+        os.utime(self.ruta, ns=(mtime_ns, mtime_ns))
+        with open(self.ruta, 'rb') as archivo:
+            return archivo.read()
+
+    def muestra(self, resultado):
+        return REGISTRY.get_sample_value(
+            'notificaciones_mail_cache_total', {'cache': 'imagenes', 'resultado': resultado}
+        ) or 0
+
+    def test_codifica_una_vez(self):
+        contenido = self.copia('logo-pm.png', 1_000_000_000)
+        hits, misses = self.muestra('hit'), self.muestra('miss')
+
+        primera, segunda = inline_image(self.nombre), inline_image(self.nombre)
+
+        self.assertEqual(self.muestra('miss') - misses, 1)
+        self.assertEqual(self.muestra('hit') - hits, 1)
+        for imagen in (primera, segunda):
+            self.assertEqual(imagen.get_content_type(), 'image/png')
+            self.assertEqual(imagen['Content-ID'], f'<{self.nombre}>')
+            self.assertEqual(imagen.get_payload(decode=True), contenido)
+
+    def test_recodifica_si_cambia_el_archivo(self):
+        self.copia('logo-pm.png', 1_000_000_000)
+        inline_image(self.nombre)
+        misses = self.muestra('miss')
+
+        contenido = self.copia('passwd-lock.png', 2_000_000_000)
+        imagen = inline_image(self.nombre)
+
+        self.assertEqual(self.muestra('miss') - misses, 1)
+        self.assertEqual(base64.b64decode(imagen.get_payload()), contenido)
+
+
+class Registros(logging.Handler):
+    def __init__(self, level=logging.NOTSET):
+        super().__init__(level)
+        self.mensajes = []
+
+    def emit(self, record):
+        self.mensajes.append(record.getMessage())
+
+
+class QueueHandlerIniciadoTest(SimpleTestCase):
+    """El handler inicia su listener al recibirlo, lo detiene al cerrarse y lo reemplaza en un hijo de fork"""
+
+    def setUp(self):
+        self.todos, self.avisos = Registros(), Registros(logging.WARNING)
+        self.handler = QueueHandlerIniciado(queue.Queue())
+        # Igual que dictConfig con 'handlers' y 'respect_handler_level'
+        self.handler.listener = QueueListener(self.handler.queue, self.todos, self.avisos, respect_handler_level=True)
+        self.addCleanup(self.handler.close)
+
+        self.logger = logging.getLogger('notificaciones.pruebas.cola')
+        self.logger.addHandler(self.handler)
+        self.addCleanup(self.logger.removeHandler, self.handler)
+        self.logger.setLevel(logging.INFO)
+        self.addCleanup(self.logger.setLevel, logging.NOTSET)
+
+    def test_escribe_al_cerrar_respetando_niveles(self):
+        self.assertIsNotNone(self.handler.listener._thread)
+
+        self.logger.debug('debajo del nivel del logger')
+        self.logger.info('informativo')
+        self.logger.warning('aviso %s', 1)
+        self.handler.close()
+
+        self.assertIsNone(self.handler.listener)
+        self.assertEqual(self.todos.mensajes, ['informativo', 'aviso 1'])
+        self.assertEqual(self.avisos.mensajes, ['aviso 1'])
+
+    def test_hijo_de_fork_usa_cola_y_listener_nuevos(self):
+        cola, listener = self.handler.queue, self.handler.listener
+        # En el hijo el hilo del listener anterior no existe; aquí se detiene a mano
+        self.handler._reinicia_en_hijo()
+        listener.stop()
+
+        self.assertIsNot(self.handler.queue, cola)
+        self.assertIsNot(self.handler.listener, listener)
+        self.assertEqual(self.handler.listener.handlers, (self.todos, self.avisos))
+
+        self.logger.warning('después del fork')
+        self.handler.close()
+        self.assertEqual(self.avisos.mensajes, ['después del fork'])
+
+
+class LogMuestreadoTest(SimpleTestCase):
+    """Los mensajes por fila se resumen salvo que el logger tenga DEBUG activo"""
+
+    logger = logging.getLogger('notificaciones.pruebas.muestreo')
+
+    def registra(self, muestreo):
+        for fila in range(7):
+            muestreo.warning('Sin SLA', 'Sin SLA para %s', fila)
+        muestreo.warning('Sin archivo', 'Entregable %s sin archivo', 10)
+        muestreo.error('Sin usuario', 'Cliente %s sin usuario', 20)
+        muestreo.error('Sin usuario', 'Cliente %s sin usuario', 21)
+        muestreo.resumen()
+
+    def test_primera_avance_y_total(self):
+        with self.assertLogs(self.logger, logging.WARNING) as logs:
+            self.registra(LogMuestreado(self.logger, cada=3))
+
+        self.assertEqual([registro.getMessage() for registro in logs.records], [
+            'Sin SLA para 0',
+            'Sin SLA: 3 filas hasta ahora',
+            'Sin SLA: 6 filas hasta ahora',
+            'Entregable 10 sin archivo',
+            'Cliente 20 sin usuario',
+            'Sin SLA: 7 filas en total',
+            'Sin usuario: 2 filas en total',
+        ])
+        self.assertEqual(logs.records[-1].levelno, logging.ERROR)
+
+    @override_settings(LOG_SAMPLE_EVERY=4)
+    def test_avance_configurable(self):
+        with self.assertLogs(self.logger, logging.WARNING) as logs:
+            self.registra(LogMuestreado(self.logger))
+
+        self.assertIn('Sin SLA: 4 filas hasta ahora', [registro.getMessage() for registro in logs.records])
+
+    def test_detalle_con_debug(self):
+        with self.assertLogs(self.logger, logging.DEBUG) as logs:
+            self.registra(LogMuestreado(self.logger, cada=3))
+
+        self.assertEqual(len(logs.records), 10)
+        self.assertNotIn('filas', ' '.join(registro.getMessage() for registro in logs.records))
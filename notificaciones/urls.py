@@ -1,11 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from notificaciones.views import NotificacionesViewSet
+from notificaciones.views import NotificacionesViewSet, stream_notificaciones
 
 router = DefaultRouter()
 router.register('', NotificacionesViewSet, basename='notificaciones')
 
 urlpatterns = [
+    # Antes del router: su ruta de detalle también atraparía "stream/"
+    path('stream/', stream_notificaciones, name='notificaciones-stream'),
     path('', include(router.urls)),
 ]
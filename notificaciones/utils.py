@@ -1,13 +1,21 @@
+import atexit
 import logging
 import os
 from email.mime.image import MIMEImage
+from email.mime.nonmultipart import MIMENonMultipart
 
 import environ
 from django.core.mail import EmailMultiAlternatives
 from django.conf import settings
 
+from notificaciones.attachment_cache import get_attachment_cache
+from notificaciones.metrics import MAIL_CACHE
+from notificaciones.smtp_pool import SMTPConnectionPool
+
 logger = logging.getLogger(__name__)
 env = environ.Env()
+__smtp_pool = None
+__image_cache = {}
 
 
 def send_mail_html(to, subject, body_html):
@@ -21,32 +29,103 @@ def send_mail_html(to, subject, body_html):
 
 def send_mail_html_attachments(to, subject, body_html, image_names, attachments=None):
     try:
-        mail = EmailMultiAlternatives(subject=subject, to=to)
-        mail.attach_alternative(body_html, 'text/html')
+        __send_mail(build_mail_html_attachments(to, subject, body_html, image_names, attachments))
+    except Exception as e:
+        logger.error(e)
+
+
+def build_mail_html_attachments(to, subject, body_html, image_names, attachments=None) -> EmailMultiAlternatives:
+    mail = EmailMultiAlternatives(subject=subject, to=to)
+    mail.attach_alternative(body_html, 'text/html')
 
-        for image_name in image_names:
-            image_path = os.path.join(settings.BASE_DIR, 'static', 'images', image_name)
-            with open(image_path, 'rb') as img:
-                image = MIMEImage(img.read())
-                image.add_header('Content-ID', '<{}>'.format(image_name))
-                mail.attach(image)
+    for image_name in image_names:
+        mail.attach(inline_image(image_name))
 
-        if attachments:
-            for attachment in attachments:
+    if attachments:
+        cache = get_attachment_cache()
+        for attachment in attachments:
+            part = cache.part(attachment)
+            if part is None:
                 mail.attach_file(attachment)
+            else:
+                mail.attach(part)
 
-        __send_mail(mail)
-    except Exception as e:
-        logger.error(e)
+    return mail
+
+
+def inline_image(image_name) -> MIMENonMultipart:
+    """
+    Imagen embebida (Content-ID) lista para adjuntar.
+
+    El contenido ya codificado en base64 se guarda por proceso, indexado por nombre y mtime del archivo,
+    así que solo se lee y codifica de nuevo cuando el archivo cambia.
+    """
+    image_path = os.path.join(settings.BASE_DIR, 'static', 'images', image_name)
+    mtime = os.stat(image_path).st_mtime_ns
+    cached = __image_cache.get(image_name)
+
+    if cached and cached[0] == mtime:
+        MAIL_CACHE.labels('imagenes', 'hit').inc()
+        _, subtype, payload = cached
+    else:
+        MAIL_CACHE.labels('imagenes', 'miss').inc()
+        with open(image_path, 'rb') as img:
+            encoded = MIMEImage(img.read())
+        subtype, payload = encoded.get_content_subtype(), encoded.get_payload()
+        __image_cache[image_name] = (mtime, subtype, payload)
+
+    image = MIMENonMultipart('image', subtype)
+    image.set_payload(payload)
+    image['Content-Transfer-Encoding'] = 'base64'
+    image.add_header('Content-ID', '<{}>'.format(image_name))
+    return image
+
+
+def send_mail_messages(mails: list) -> list:
+    """
+    Envía los correos por el pool de conexiones SMTP; regresa un bool por correo.
+
+    Cada correo puede venir ya armado o como una función sin argumentos que lo arma al momento de enviarlo.
+    """
+    if __logger_backend():
+        for mail in mails:
+            __log_mail(mail() if callable(mail) else mail)
+        return [True] * len(mails)
+
+    # El pool es del proceso: sus conexiones siguen abiertas para el siguiente lote y la siguiente corrida
+    return get_smtp_pool().send_many(mails)
+
+
+def get_smtp_pool() -> SMTPConnectionPool:
+    global __smtp_pool
+    if __smtp_pool is None:
+        __smtp_pool = SMTPConnectionPool()
+        atexit.register(close_smtp_pool)
+    return __smtp_pool
+
+
+def close_smtp_pool():
+    """Cierra las conexiones SMTP del proceso; se llama al apagar el worker y al salir"""
+    global __smtp_pool
+    if __smtp_pool is not None:
+        __smtp_pool.close()
+        __smtp_pool = None
+
+
+def __logger_backend():
+    email_host = env('EMAIL_HOST', default=None)
+    return not email_host or email_host == 'logger'
+
+
+def __log_mail(mail: EmailMultiAlternatives):
+    logger.info('Sending email: %s to %s', mail.subject, mail.to)
+    logger.debug('Body: %s', mail.alternatives[0][0])
 
 
 def __send_mail(mail: EmailMultiAlternatives):
     try:
-        email_host = env('EMAIL_HOST', default=None)
-
-        if not email_host or email_host == 'logger':
-            logger.info(f'Sending email: {mail.subject} to {mail.to}')
-            logger.debug(f'Body: {mail.alternatives[0][0]}')
+        if __logger_backend():
+            __log_mail(mail)
         else:
             mail.send()
     except Exception as e:
@@ -1,47 +1,114 @@
+import asyncio
+import json
+import time
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils.timezone import now
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from notificaciones.metrics import API_LATENCIA
 from notificaciones.model_serializers import NotificacionesModelSerializer
-from notificaciones.models import Notificaciones, Usuario, UsuarioOrdenServicio
+from notificaciones.models import ContadorNotificaciones, Notificaciones, Usuario, UsuarioOrdenServicio
+from notificaciones.pagination import NotificacionesCursorPagination
+from notificaciones.stream import listener, usuario_del_token
+from notificaciones.tasks.bandeja_task import descuenta_contadores
+from notificaciones.tasks.particiones_task import filtro_vigentes
 
 
 class NotificacionesViewSet(viewsets.ModelViewSet):
     queryset = Notificaciones.objects.filter(fecha_baja__isnull=True).order_by('-id')
     serializer_class = NotificacionesModelSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = NotificacionesCursorPagination
+
+    def dispatch(self, request, *args, **kwargs):
+        inicio = time.perf_counter()
+        response = super().dispatch(request, *args, **kwargs)
+        API_LATENCIA.labels(self.action or 'desconocida', request.method, response.status_code).observe(
+            time.perf_counter() - inicio
+        )
+        return response
 
     def get_queryset(self):
         if self.request.method != 'GET':
             return super().get_queryset()
-            
+
+        if settings.NOTIFICACIONES_BANDEJA:
+            # Con la bandeja materializada el listado es un recorrido del índice (ID_USUARIO, ID_NOTIFICACION)
+            return self._acota(bandeja_de(self.request.user.id).order_by(self._orden()))
+
         req_user = Usuario.objects.get(id=self.request.user.id, fecha_baja__isnull=True)
-        user_notifications = Notificaciones.objects.filter(
-            fecha_baja__isnull=True,
-            id_usuario=req_user.id
-        )
+        user_notifications, role_notifications = notificaciones_del_buzon(req_user)
 
-        if req_user.is_externo == 0:
-            role_notifications = Notificaciones.objects.filter(
-                fecha_baja__isnull=True,
-                id_rol=req_user.id_rol,
-                id_orden__id__in=UsuarioOrdenServicio.objects.filter(
-                    id_orden__fecha_baja__isnull=True,
-                    id_usuario=req_user,
-                ).values_list('id_orden', flat=True)
-            )
-        else:
-            role_notifications = Notificaciones.objects.filter(
-                fecha_baja__isnull=True,
-                id_rol=req_user.id_rol,
-                id_orden__id__in=UsuarioOrdenServicio.objects.filter(
-                    id_orden__fecha_baja__isnull=True,
-                    id_orden__id_proyecto__id_contrato__id_cliente=req_user.id_cliente,
-                ).values_list('id_orden', flat=True)
+        # La paginación se aplica a cada consulta porque un UNION ya no se puede filtrar
+        user_notifications = self._acota(user_notifications)
+        role_notifications = self._acota(role_notifications)
+
+        return user_notifications.union(role_notifications).order_by(self._orden())
+
+    def _acota(self, queryset):
+        """Límites de la página; solo el listado se pagina, count y el detalle usan el buzón completo"""
+        if self.action != 'list':
+            return queryset
+        return self.paginator.acota(queryset, self.request)
+
+    def _orden(self) -> str:
+        return self.paginator.orden(self.request) if self.action == 'list' else '-id'
+
+    def _visibles(self):
+        """Mismas reglas que get_queryset como una sola condición, para usarla dentro de un UPDATE"""
+        if settings.NOTIFICACIONES_BANDEJA:
+            return Q(
+                bandejanotificacion__id_usuario=self.request.user.id,
+                bandejanotificacion__fecha_baja__isnull=True,
             )
 
-        return user_notifications.union(role_notifications).order_by('-id')
+        req_user = Usuario.objects.get(id=self.request.user.id, fecha_baja__isnull=True)
+        return Q(id_usuario=req_user.id) | Q(id_rol=req_user.id_rol, id_orden__id__in=ordenes_visibles(req_user))
+
+    @action(detail=False, methods=['get'])
+    def count(self, request):
+        # Las notificaciones no tienen estado de leída: una notificación se "lee" al darla de baja.
+        # El contador lo suma el trigger de la bandeja al insertar y lo restan las bajas en su misma transacción
+        visibles = ContadorNotificaciones.objects.filter(
+            id_usuario=request.user.id
+        ).values_list('visibles', flat=True).first()
+
+        return Response({'count': visibles or 0})
+
+    @action(detail=False, methods=['post'])
+    def dismiss(self, request):
+        """Da de baja en un solo UPDATE las notificaciones visibles en ``ids`` o con id <= ``hasta_id``"""
+        ids = request.data.get('ids')
+        hasta_id = request.data.get('hasta_id')
+
+        try:
+            if isinstance(ids, list):
+                filtro = Q(id__in=[int(id_notificacion) for id_notificacion in ids])
+            elif hasta_id is not None:
+                filtro = Q(id__lte=int(hasta_id))
+            else:
+                return Response({'detail': 'Se requiere una lista ids o hasta_id'}, 400)
+        except (TypeError, ValueError):
+            return Response({'detail': 'ids y hasta_id deben ser enteros'}, 400)
+
+        notificaciones = Notificaciones.objects.filter(filtro, self._visibles(), filtro_vigentes(), fecha_baja__isnull=True)
+
+        with transaction.atomic():
+            # Los contadores necesitan saber cuáles se dieron de baja
+            ids = list(notificaciones.select_for_update(of=('self',)).values_list('id', flat=True))
+            total = Notificaciones.objects.filter(id__in=ids).update(fecha_baja=now(), usuario_baja=request.user.id)
+            descuenta_contadores(ids)
+
+        return Response({'count': total})
 
     def partial_update(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -50,7 +117,89 @@ class NotificacionesViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance, data=request.data, partial=True)
 
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                # Solo descuenta quien la da de baja primero; una segunda petición ya no la encuentra vigente
+                vigente = Notificaciones.objects.select_for_update().filter(
+                    id=instance.id, fecha_baja__isnull=True
+                ).exists()
+                serializer.save()
+                if vigente:
+                    descuenta_contadores([instance.id])
             return Response(serializer.data)
 
         return Response(serializer.errors, 400)
+
+
+def ordenes_visibles(req_user):
+    if req_user.is_externo == 0:
+        ordenes = UsuarioOrdenServicio.objects.filter(
+            id_orden__fecha_baja__isnull=True,
+            id_usuario=req_user,
+        )
+    else:
+        ordenes = UsuarioOrdenServicio.objects.filter(
+            id_orden__fecha_baja__isnull=True,
+            id_orden__id_proyecto__id_contrato__id_cliente=req_user.id_cliente,
+        )
+
+    return ordenes.values_list('id_orden', flat=True)
+
+
+def notificaciones_del_buzon(req_user) -> tuple:
+    """Notificaciones directas y por rol que ve ``req_user``, sin paginar; el listado las une con UNION"""
+    user_notifications = Notificaciones.objects.filter(
+        filtro_vigentes(),
+        fecha_baja__isnull=True,
+        id_usuario=req_user.id
+    )
+    role_notifications = Notificaciones.objects.filter(
+        filtro_vigentes(),
+        fecha_baja__isnull=True,
+        id_rol=req_user.id_rol,
+        id_orden__id__in=ordenes_visibles(req_user)
+    )
+    return user_notifications, role_notifications
+
+
+def bandeja_de(usuario_id: int):
+    return Notificaciones.objects.filter(
+        filtro_vigentes(),
+        fecha_baja__isnull=True,
+        bandejanotificacion__id_usuario=usuario_id,
+        bandejanotificacion__fecha_baja__isnull=True,
+    )
+
+
+async def stream_notificaciones(request):
+    """Server-Sent Events con las notificaciones nuevas del usuario; solo disponible bajo ASGI"""
+    if not isinstance(request, ASGIRequest):
+        # Bajo WSGI cada stream ocuparía un hilo del worker mientras siga abierto
+        return JsonResponse({'detail': 'El stream requiere el servidor ASGI (start_api --server asgi)'}, status=501)
+
+    usuario_id, expira = await usuario_del_token(request)
+    if usuario_id is None:
+        return JsonResponse({'detail': 'Token inválido o expirado'}, status=401)
+
+    if not listener.activo:
+        return JsonResponse({'detail': 'El stream no está disponible en este proceso'}, status=503)
+
+    cola = listener.suscribe(usuario_id)
+
+    async def eventos():
+        try:
+            yield 'retry: 5000\n\n'
+            # El stream se cierra al expirar el token para que el cliente se reconecte con uno vigente
+            while time.time() < expira:
+                try:
+                    datos = await asyncio.wait_for(cola.get(), timeout=settings.NOTIFICACIONES_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ': ping\n\n'
+                    continue
+                yield f'id: {datos["id"]}\nevent: notificacion\ndata: {json.dumps(datos, cls=DjangoJSONEncoder)}\n\n'
+        finally:
+            listener.cancela(usuario_id, cola)
+
+    response = StreamingHttpResponse(eventos(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response